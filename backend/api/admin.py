@@ -1,3 +1,14 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import EarningsReport, UpcomingEarnings
+
+
+@admin.register(EarningsReport)
+class EarningsReportAdmin(admin.ModelAdmin):
+    list_display = ('symbol', 'date', 'eps_estimate', 'eps_actual', 'surprise_percent')
+    list_filter = ('symbol',)
+
+
+@admin.register(UpcomingEarnings)
+class UpcomingEarningsAdmin(admin.ModelAdmin):
+    list_display = ('symbol', 'date', 'updated_at')
@@ -0,0 +1,144 @@
+"""
+Live bars aggregated from ticks, one open bar per interval and ticker.
+
+Every trade updates the forming bar of each configured interval
+(settings.WS_INTERVALS) in O(1): the bucket comes from a `SessionClock`,
+with the same session rules as the historical charts (api/resample.py),
+and only the fields that changed are published, as a compact delta (see
+api/wire.py). A trade in a new bucket first closes the previous bar.
+Optional indicators (api/indicators.py) are updated with the bar, also in
+O(1), and their changed values ride along in the same delta.
+
+    aggregator = LiveBarAggregator(['1m', '1h'], parse_indicators('sma:20,rsi'))
+    for interval, delta, bar in aggregator.update(utc_ns, price, size):
+        ...  # publish delta to group_name(ticker, interval), record bar
+"""
+import pandas as pd
+
+from .indicators import IndicatorSet
+from .resample import PERIOD_SPECS
+from .sessions import CST_FIRST_HALF_HOUR, NO_BUCKET, SessionClock, SessionTemplate
+from .wire import CLOSED_KEY, DELTA_KEYS, INDICATORS_KEY
+
+_T, _O, _H, _L, _C, _V = DELTA_KEYS.values()
+# Decimales de los indicadores en vivo (los precios llevan 2)
+INDICATOR_DIGITS = 4
+
+
+def interval_template(interval: str) -> SessionTemplate:
+    """
+    Session buckets of a live interval (the chart's own template for 15m and
+    1h, so live and historical bars line up); None for daily bars ('1d').
+    """
+    if interval == '1d':
+        return None
+    spec = PERIOD_SPECS.get(interval)
+    if spec is not None and spec.template is not None:
+        return spec.template
+    unit, count = interval[-1], interval[:-1]
+    if unit not in 'mh' or not count.isdigit():
+        raise ValueError(f"Unsupported live interval: {interval}")
+    return CST_FIRST_HALF_HOUR.with_bucket(int(count) * (60 if unit == 'h' else 1))
+
+
+def day_time(day_start_ns: int, tz: str) -> str:
+    """Local midnight (UTC ns) → 'YYYY-MM-DD', the `time` of historical daily bars."""
+    return pd.Timestamp(day_start_ns, tz='UTC').tz_convert(tz).strftime('%Y-%m-%d')
+
+
+class IntervalBar:
+    """
+    Forming bar of one interval. `time` is labelled like the historical
+    series of the same period (api/resample.py): UTC seconds for intraday
+    bars, 'YYYY-MM-DD' for daily ones.
+    """
+
+    __slots__ = (
+        'interval', 'clock', 'daily', 'bucket', 'time', 'open', 'high', 'low', 'close',
+        'volume', 'indicators', 'values',
+    )
+
+    def __init__(self, interval: str, indicators=()):
+        template = interval_template(interval)
+        self.interval = interval
+        self.daily = template is None
+        self.clock = SessionClock(CST_FIRST_HALF_HOUR if self.daily else template)
+        self.bucket = self.time = None
+        # VWAP: sesión = día local; en barras diarias cada barra es su sesión
+        tz = None if self.daily else self.clock.template.tz
+        self.indicators = IndicatorSet(indicators, tz) if indicators else None
+        self.values = {}
+
+    def as_dict(self) -> dict:
+        bar = {
+            'time': self.time, 'open': self.open, 'high': self.high,
+            'low': self.low, 'close': self.close, 'volume': self.volume,
+        }
+        if self.values:
+            bar['indicators'] = dict(self.values)
+        return bar
+
+    def add_indicators(self, delta: dict):
+        """Update the indicators with the forming bar; changed values go in `delta`."""
+        if self.indicators is None:
+            return
+        changed = {}
+        for name, value in self.indicators.update(self.time, self.as_dict()).items():
+            if value is not None:
+                value = round(value, INDICATOR_DIGITS)
+                if self.values.get(name) != value:
+                    self.values[name] = changed[name] = value
+        if changed:
+            delta[INDICATORS_KEY] = changed
+
+    def update(self, utc_ns: int, price: float, size: int, out: list):
+        label = self.clock.day_label(utc_ns) if self.daily else self.clock.label(utc_ns)
+        if label == NO_BUCKET:
+            return
+        if label != self.bucket:
+            if self.time is not None:
+                closed = {_T: self.time, CLOSED_KEY: 1}
+                out.append((self.interval, closed, self.as_dict()))
+            self.bucket = label
+            if self.daily:
+                time = self.time = day_time(label, self.clock.template.tz)
+            else:
+                time = self.time = label // 10**9
+            self.open = self.high = self.low = self.close = price
+            self.volume = size
+            self.values = {}
+            delta = {_T: time, _O: price, _H: price, _L: price, _C: price, _V: size}
+            self.add_indicators(delta)
+            out.append((self.interval, delta, self.as_dict()))
+            return
+
+        delta = {_T: self.time}
+        if price != self.close:
+            self.close = delta[_C] = price
+            if price > self.high:
+                self.high = delta[_H] = price
+            elif price < self.low:
+                self.low = delta[_L] = price
+        if size:
+            self.volume += size
+            delta[_V] = self.volume
+        if len(delta) > 1:
+            self.add_indicators(delta)
+            out.append((self.interval, delta, self.as_dict()))
+
+
+class LiveBarAggregator:
+    """
+    Forming bars (and indicators, [IndicatorSpec]) of one ticker at every
+    interval.
+    """
+
+    def __init__(self, intervals, indicators=()):
+        self.bars = [IntervalBar(interval, indicators) for interval in intervals]
+
+    def update(self, utc_ns: int, price: float, size: int = 0) -> list:
+        """One trade → [(interval, delta, bar)] for the bars it changed."""
+        out = []
+        for bar in self.bars:
+            bar.update(utc_ns, price, size, out)
+        return out
@@ -0,0 +1,149 @@
+"""
+Minimal async counterpart of DRF's APIView for the ASGI (Daphne) server.
+
+DRF views are synchronous, so under ASGI Django runs each of them through
+sync_to_async(thread_sensitive=True): every slow Yahoo/Finnhub call ends up
+on the same thread. Views built on AsyncAPIView are native coroutines:
+
+- blocking upstream work is offloaded with `run_blocking` to a sized thread
+  pool, with a per-request timeout (→ 504);
+- other exceptions go through DRF's EXCEPTION_HANDLER (APIException,
+  Http404, PermissionDenied → JSON body), and anything it leaves unhandled
+  becomes a JSON 500 instead of Django's HTML error page;
+- when the client disconnects Django cancels the view task, so the awaiting
+  request is dropped instead of rendering a response nobody reads;
+- responses are DRF `Response` objects, negotiated with DRF's content
+  negotiation (Accept / ?format=) and rendered off the event loop;
+  streaming renderers (NDJSON...) are sent chunk by chunk, each chunk
+  rendered in the pool when the previous one has been sent.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .metrics import timed
+from .renderers import RecordsJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.UPSTREAM_MAX_WORKERS, thread_name_prefix='upstream'
+)
+_DEFAULT = object()
+
+
+async def run_blocking(fn, *args, timeout=_DEFAULT, **kwargs):
+    """
+    Run a blocking callable in the shared upstream pool and await it.
+    Raises asyncio.TimeoutError after `timeout` seconds
+    (UPSTREAM_REQUEST_TIMEOUT by default, None = no limit).
+    """
+    if timeout is _DEFAULT:
+        timeout = settings.UPSTREAM_REQUEST_TIMEOUT
+    loop = asyncio.get_running_loop()
+    # Con el contexto de la petición: las etapas medidas en el hilo llegan a
+    # Server-Timing
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(
+        _executor, context.run, functools.partial(fn, *args, **kwargs)
+    )
+    # On timeout only the await is abandoned: a running thread can't be
+    # cancelled, so the call keeps its pool worker until it returns by
+    # itself (bounded by the upstream client's own timeouts). Slow upstreams
+    # can therefore still exhaust UPSTREAM_MAX_WORKERS.
+    return await asyncio.wait_for(future, timeout)
+
+
+class AsyncAPIView(View):
+    renderer_classes = [RecordsJSONRenderer]
+    content_negotiation_class = DefaultContentNegotiation
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Same accessor the DRF views used
+        request.query_params = request.GET
+        try:
+            response = await super().dispatch(request, *args, **kwargs)
+        except asyncio.TimeoutError:
+            response = Response({"error": "Upstream request timed out."}, status=504)
+        except Exception as exc:
+            response = self.handle_exception(request, exc)
+        return await self.finalize_response(request, response)
+
+    def handle_exception(self, request, exc):
+        context = {
+            'view': self, 'args': self.args, 'kwargs': self.kwargs, 'request': request,
+        }
+        response = api_settings.EXCEPTION_HANDLER(exc, context)
+        if response is None:
+            logger.exception("Unhandled error in %s", type(self).__name__)
+            response = Response(
+                {"error": "An unexpected server error occurred."}, status=500
+            )
+        return response
+
+    def select_renderer(self, request):
+        renderers = [renderer() for renderer in self.renderer_classes]
+        try:
+            return self.content_negotiation_class().select_renderer(
+                Request(request), renderers
+            )
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+    @staticmethod
+    def render(renderer, data, media_type, context):
+        with timed('render'):
+            return renderer.render(data, media_type, context)
+
+    @staticmethod
+    def render_next(chunks):
+        with timed('render'):
+            return next(chunks, None)
+
+    async def stream(self, renderer, data, media_type, context):
+        chunks = renderer.render_chunks(data, media_type, context)
+        while True:
+            chunk = await run_blocking(self.render_next, chunks, timeout=None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def finalize_response(self, request, response):
+        if not isinstance(response, Response):
+            return response
+
+        renderer, media_type = self.select_renderer(request)
+        context = {'request': request, 'response': response, 'view': self}
+        content_type = media_type
+        if renderer.charset:
+            content_type = f"{media_type}; charset={renderer.charset}"
+
+        if getattr(renderer, 'streaming', False):
+            rendered = StreamingHttpResponse(
+                self.stream(renderer, response.data, media_type, context),
+                status=response.status_code, content_type=content_type,
+            )
+            # Sin buffer en el proxy (nginx): cada bloque sale al llegar
+            rendered['X-Accel-Buffering'] = 'no'
+        else:
+            content = await run_blocking(
+                self.render, renderer, response.data, media_type, context, timeout=None
+            )
+            rendered = HttpResponse(
+                content, status=response.status_code, content_type=content_type
+            )
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                rendered[header] = value
+        return rendered
@@ -0,0 +1,356 @@
+"""
+Durable bar store: the base series of every ticker (the 1m / 5m / 1d
+downloads of api/resample.py) on local disk, one file per column.
+
+    {BAR_STORE_DIR}/{interval}/{TICKER}/
+        meta.json         {"rows": N, "generation": G,
+                           "first": ns, "last": ns, "updated": s}
+        time.G.bin        UTC nanoseconds (int64), ascending
+        open.G.bin ...    float64 prices, int64 volume
+
+Reads memory-map the column files and return DataFrames whose columns are
+views of the maps: a time range costs two binary searches on the time
+column and no copy, and every worker process shares the same pages
+through the OS page cache, so memory stays flat however many workers
+serve the same years of history.
+
+The store doubles as a cache shared between processes: a series older
+than its TTL (see api/cache.py) gets its tail downloaded and written
+through, and `meta.json` tells every process when that happened.
+`manage.py backfill` bulk-loads series and extends them.
+
+Writes never shrink the files:
+
+- new bars are appended; a download overlapping the stored bars overwrites
+  them in place from its first bar on (the last one is usually still
+  forming), so readers may see the newest bars mid-update;
+- history older than the first stored bar rewrites the series into a new
+  generation of files; `meta.json` is replaced atomically and readers
+  holding maps of the previous generation keep reading them.
+
+Writers of a series are serialized with a lock file (fcntl, where the
+platform has it).
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .cache import DEFAULT_TTL, INTERVAL_TTLS, period_to_timedelta
+from .metrics import Counter
+from .resample import base_arrays
+from .sessions import NS_PER_DAY
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {
+    'time': np.dtype(np.int64),
+    'open': np.dtype(np.float64),
+    'high': np.dtype(np.float64),
+    'low': np.dtype(np.float64),
+    'close': np.dtype(np.float64),
+    'volume': np.dtype(np.int64),
+}
+# Columnas de los frames leídos: los nombres de yfinance que espera el pipeline
+FRAME_COLUMNS = {
+    'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume',
+}
+# Margen de lectura alrededor de ?from=&to=: semanas y buckets completos
+RANGE_MARGIN = pd.Timedelta(days=7).value
+MAX_OPEN_SERIES = 1024
+
+_TICKER_RE = re.compile(r'^[A-Za-z0-9^=_-][A-Za-z0-9^=._-]*$')
+
+
+class BarStore:
+    def __init__(self, root, ttls: dict = None):
+        self.root = Path(root)
+        self.ttls = ttls or INTERVAL_TTLS
+        # (ticker, interval) → (generation, {column: memmap})
+        self._maps = OrderedDict()
+        # Protege _maps y los contadores hits / misses / refreshes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def ttl_for(self, interval: str) -> float:
+        return self.ttls.get(interval, DEFAULT_TTL)
+
+    def series_dir(self, ticker: str, interval: str) -> Path:
+        if not _TICKER_RE.match(ticker) or not _TICKER_RE.match(interval):
+            raise ValueError(f"Invalid series name: {ticker}/{interval}")
+        return self.root / interval / ticker
+
+    def meta(self, ticker: str, interval: str):
+        """The series' meta.json as a dict, None when it is not stored."""
+        try:
+            with open(self.series_dir(ticker, interval) / 'meta.json') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    # Lectura
+
+    def _columns(self, ticker: str, interval: str, meta: dict) -> dict:
+        """Memory maps of the series' columns, cut to the committed rows."""
+        key = (ticker, interval)
+        rows = meta['rows']
+        with self._lock:
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == meta['generation'] \
+                    and len(cached[1]['time']) >= rows:
+                self._maps.move_to_end(key)
+                maps = cached[1]
+            else:
+                directory = self.series_dir(ticker, interval)
+                generation = meta['generation']
+                maps = {
+                    name: np.memmap(
+                        directory / f'{name}.{generation}.bin', dtype, mode='r'
+                    )
+                    for name, dtype in COLUMNS.items()
+                }
+                self._maps[key] = (meta['generation'], maps)
+                while len(self._maps) > MAX_OPEN_SERIES:
+                    self._maps.popitem(last=False)
+        # Tras una caída meta.json puede ir por delante de los datos
+        rows = min(rows, *(len(m) for m in maps.values()))
+        return {name: m[:rows] for name, m in maps.items()}
+
+    def read(self, ticker: str, interval: str, start_ns: int = None,
+             end_ns: int = None, meta: dict = None):
+        """
+        Stored bars with start_ns <= time < end_ns as a yfinance-like frame
+        (naive UTC DatetimeIndex), zero-copy and read-only; None if the
+        series is not stored.
+        """
+        meta = meta or self.meta(ticker, interval)
+        if not meta or not meta['rows']:
+            return None
+        columns = self._columns(ticker, interval, meta)
+        times = columns['time']
+        lo = 0 if start_ns is None else \
+            int(np.searchsorted(times, start_ns, side='left'))
+        hi = len(times) if end_ns is None else \
+            int(np.searchsorted(times, end_ns, side='left'))
+        index = pd.DatetimeIndex(
+            times[lo:hi].view('M8[ns]'), copy=False, name='Datetime'
+        )
+        return pd.DataFrame(
+            {label: columns[name][lo:hi] for name, label in FRAME_COLUMNS.items()},
+            index=index, copy=False,
+        )
+
+    # Escritura
+
+    @contextmanager
+    def _series_lock(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(directory / '.lock', 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _frame_columns(frame: pd.DataFrame) -> dict:
+        """Downloaded frame → {column: array} sorted by time, one bar per time."""
+        utc_ns, arrays = base_arrays(frame)
+        volume = arrays.get('volume')
+        columns = {
+            'time': utc_ns,
+            **{k: arrays[k] for k in ('open', 'high', 'low', 'close')},
+            'volume': np.zeros(len(utc_ns), np.int64) if volume is None else volume,
+        }
+        # Misma marca de tiempo repetida: gana la última
+        last = np.r_[utc_ns[1:] != utc_ns[:-1], True]
+        if last.all():
+            return columns
+        return {name: values[last] for name, values in columns.items()}
+
+    def write(self, ticker: str, interval: str, frame: pd.DataFrame) -> int:
+        """
+        Merge downloaded bars into the series (bars at the same times are
+        replaced) and mark it as updated. Returns the stored bar count.
+        """
+        directory = self.series_dir(ticker, interval)
+        new = self._frame_columns(frame) if not frame.empty else None
+        with self._series_lock(directory):
+            meta = self.meta(ticker, interval) or {'rows': 0, 'generation': 0}
+            rows, generation = meta['rows'], meta['generation']
+            if new is not None and len(new['time']):
+                stored = self._columns(ticker, interval, meta) if rows else None
+                if stored is None or new['time'][0] < stored['time'][0]:
+                    # Serie nueva o historia anterior a la guardada: nueva generación
+                    if stored is not None:
+                        keep = np.searchsorted(
+                            stored['time'], new['time'][-1], side='right'
+                        )
+                        new = {
+                            k: np.concatenate([v, stored[k][keep:]])
+                            for k, v in new.items()
+                        }
+                    generation += 1 if stored is not None else 0
+                    offset = 0
+                else:
+                    offset = int(
+                        np.searchsorted(stored['time'], new['time'][0], side='left')
+                    )
+                    keep = int(
+                        np.searchsorted(stored['time'], new['time'][-1], side='right')
+                    )
+                    # Copia: la cola guardada puede solaparse con lo que se escribe
+                    new = {
+                        k: np.concatenate([v, np.array(stored[k][keep:])])
+                        for k, v in new.items()
+                    }
+                self._write_columns(directory, generation, new, offset)
+                rows = offset + len(new['time'])
+                meta['first'] = int(new['time'][0]) if offset == 0 else meta['first']
+                meta['last'] = int(new['time'][-1])
+            previous = meta['generation']
+            meta.update(rows=rows, generation=generation, updated=time.time())
+            tmp = directory / f'meta.json.{os.getpid()}.{threading.get_ident()}'
+            with open(tmp, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp, directory / 'meta.json')
+            if generation != previous:
+                for name in COLUMNS:
+                    (directory / f'{name}.{previous}.bin').unlink(missing_ok=True)
+        return rows
+
+    @staticmethod
+    def _write_columns(directory: Path, generation: int, columns: dict, offset: int):
+        for name, values in columns.items():
+            path = directory / f'{name}.{generation}.bin'
+            with open(path, 'r+b' if path.exists() else 'wb') as f:
+                f.seek(offset * COLUMNS[name].itemsize)
+                values.tofile(f)
+
+    # Caché compartida entre procesos
+
+    def get_or_fetch_many(self, keys, fetch_many, period: str = None,
+                          start=None, end=None) -> dict:
+        """
+        Same contract as OHLCVCache.get_or_fetch_many, with the store as the
+        cache: missing series are downloaded whole and expired ones get their
+        tail, both written through. `start` / `end` (UTC seconds) bound the
+        bars read (plus a margin for whole weeks and buckets); without them
+        the `period` window before the last bar is read, as downloaded.
+        """
+        now = time.time()
+        missing, expired = [], []
+        for key in keys:
+            meta = self.meta(key[0], key[1])
+            if not meta or not meta['rows']:
+                missing.append(key)
+            elif now - meta['updated'] >= self.ttl_for(key[1]):
+                expired.append((key, meta))
+        with self._lock:
+            self.hits += len(keys) - len(missing) - len(expired)
+            self.misses += len(missing)
+            self.refreshes += len(expired)
+
+        if missing:
+            fetched = fetch_many(missing, None)
+            for key in missing:
+                frame = fetched.get(key)
+                if frame is not None and not frame.empty:
+                    self.write(key[0], key[1], frame)
+
+        if expired:
+            since = pd.Timestamp(min(meta['last'] for _, meta in expired), tz='UTC')
+            try:
+                tails = fetch_many([key for key, _ in expired], since)
+            except Exception as e:
+                logger.warning(
+                    "Bar store tail refresh failed for %d series, "
+                    "serving stored bars: %s",
+                    len(expired), e,
+                )
+                tails = None
+            if tails is not None:
+                for key, _ in expired:
+                    self.write(key[0], key[1], tails.get(key, pd.DataFrame()))
+
+        frames = {}
+        window = period_to_timedelta(period)
+        for key in keys:
+            meta = self.meta(key[0], key[1])
+            if start is not None or end is not None:
+                start_ns = None if start is None else start * 10**9 - RANGE_MARGIN
+                end_ns = None if end is None else end * 10**9 + RANGE_MARGIN
+            else:
+                # Días completos, como las descargas de `period`
+                start_ns = None if window is None or not meta else \
+                    (meta['last'] - window.value) // NS_PER_DAY * NS_PER_DAY
+                end_ns = None
+            frame = self.read(key[0], key[1], start_ns, end_ns, meta=meta)
+            frames[key] = pd.DataFrame() if frame is None else frame
+        return frames
+
+    def get_or_fetch(self, key, fetch, period: str = None, start=None, end=None):
+        """
+        Single-key `get_or_fetch_many`; `fetch(start)` as in
+        OHLCVCache.get_or_fetch.
+        """
+        return self.get_or_fetch_many(
+            [key], lambda keys, since: {key: fetch(since)}, period, start, end,
+        )[key]
+
+
+_UNSET = object()
+_store = _UNSET
+_store_lock = threading.Lock()
+
+
+def get_bar_store():
+    """The configured store (settings.BAR_STORE_DIR), None when disabled."""
+    global _store
+    if _store is _UNSET:
+        with _store_lock:
+            if _store is _UNSET:
+                root = settings.BAR_STORE_DIR
+                _store = BarStore(root) if root else None
+    return _store
+
+
+def set_bar_store(store):
+    """Swap the active store (None disables it; benchmarks, tests)."""
+    global _store
+    _store = store
+
+
+def _lookups():
+    store = _store
+    if not isinstance(store, BarStore):
+        return {('hit',): 0, ('refresh',): 0, ('miss',): 0}
+    return {
+        ('hit',): store.hits, ('refresh',): store.refreshes, ('miss',): store.misses,
+    }
+
+
+BAR_STORE_LOOKUPS = Counter(
+    'bar_store_lookups_total',
+    'Bar store lookups: hit (fresh), refresh (expired, tail re-fetched) or miss',
+    ['result'], callback=_lookups,
+)
@@ -0,0 +1,287 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from django.conf import settings
+
+from .metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached series is considered fresh, per yfinance interval.
+# Intraday bars go stale quickly; daily/weekly history barely moves.
+INTERVAL_TTLS = {
+    '1m': 30,
+    '2m': 45,
+    '5m': 60,
+    '15m': 120,
+    '30m': 300,
+    '60m': 300,
+    '1h': 300,
+    '1d': 15 * 60,
+    '5d': 60 * 60,
+    '1wk': 60 * 60,
+    '1mo': 6 * 60 * 60,
+}
+DEFAULT_TTL = 60
+
+
+def period_to_timedelta(period: str):
+    """
+    Translate a yfinance period ('7d', '60d', '5y', 'max') into a Timedelta.
+    Returns None for 'max' / unknown periods (no trimming).
+    """
+    if not period or period == 'max':
+        return None
+    unit = period[-1]
+    try:
+        n = int(period[:-1])
+    except ValueError:
+        return None
+    if unit == 'd':
+        return pd.Timedelta(days=n)
+    if unit == 'y':
+        return pd.Timedelta(days=365 * n)
+    if period.endswith('mo'):
+        return pd.Timedelta(days=31 * int(period[:-2]))
+    return None
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class _Entry:
+    __slots__ = ('frame', 'nbytes', 'fetched_at', 'window')
+
+    def __init__(self, frame, window):
+        self.frame = frame
+        self.nbytes = frame_nbytes(frame)
+        self.fetched_at = time.monotonic()
+        self.window = window
+
+
+class OHLCVCache:
+    """
+    In-process LRU of OHLCV frames keyed by (ticker, interval, auto_adjust).
+
+    - Entries are evicted least-recently-used first once the total frame
+      memory exceeds `max_bytes`.
+    - Each interval has its own TTL. An expired entry is not re-downloaded
+      in full: only the bars from the last cached one onwards are fetched
+      and spliced onto the tail (the last bar is usually still forming).
+    - Cached frames are shared between requests and must be treated as
+      read-only by callers.
+    """
+
+    def __init__(self, max_bytes: int, ttls: dict = None):
+        self.max_bytes = max_bytes
+        self.ttls = ttls or INTERVAL_TTLS
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def ttl_for(self, interval: str) -> float:
+        return self.ttls.get(interval, DEFAULT_TTL)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def peek(self, key):
+        """Return the cached frame for `key` regardless of age (or None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.frame if entry else None
+
+    def put(self, key, frame: pd.DataFrame, window=None):
+        entry = _Entry(frame, window)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            self._evict_locked()
+
+    def _evict_locked(self):
+        # Always keep the entry that was just inserted, even if it alone is
+        # larger than the budget.
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            logger.debug("OHLCV cache evicted %s (%d bytes)", key, entry.nbytes)
+
+    def get_or_fetch(self, key, fetch, period: str = None):
+        """
+        Return the frame for `key` = (ticker, interval, auto_adjust).
+
+        `fetch(start)` downloads bars: with start=None the full `period`
+        window, otherwise only bars at or after `start`. It must return a
+        DataFrame indexed by a DatetimeIndex (empty on no data).
+        """
+        interval = key[1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                age = time.monotonic() - entry.fetched_at
+                if age < self.ttl_for(interval):
+                    self.hits += 1
+                    return entry.frame
+                self.refreshes += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            frame = fetch(None)
+            if not frame.empty:
+                self.put(key, frame, window=period_to_timedelta(period))
+            return frame
+
+        try:
+            frame = self._refresh_tail(entry, fetch)
+        except Exception as e:
+            logger.warning(
+                "OHLCV tail refresh failed for %s, serving stale: %s", key, e
+            )
+            return entry.frame
+        self.put(key, frame, window=entry.window)
+        return frame
+
+    def get_or_fetch_many(self, keys, fetch_many, period: str = None) -> dict:
+        """
+        `get_or_fetch` for many keys at once, with grouped downloads: the
+        missing keys are fetched by one `fetch_many(keys, None)` call and the
+        expired ones refreshed by one `fetch_many(keys, start)`, from the
+        oldest of their last bars. `fetch_many` returns {key: DataFrame};
+        keys it leaves out have no data. Returns {key: DataFrame}.
+        """
+        frames, missing, expired = {}, [], []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    missing.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                if now - entry.fetched_at < self.ttl_for(key[1]):
+                    frames[key] = entry.frame
+                else:
+                    expired.append((key, entry))
+            # Counters are read by /metrics while worker threads update them
+            self.hits += len(frames)
+            self.misses += len(missing)
+            self.refreshes += len(expired)
+
+        if missing:
+            fetched = fetch_many(missing, None)
+            window = period_to_timedelta(period)
+            for key in missing:
+                frame = fetched.get(key)
+                if frame is None:
+                    frame = pd.DataFrame()
+                elif not frame.empty:
+                    self.put(key, frame, window=window)
+                frames[key] = frame
+
+        if expired:
+            start = min(entry.frame.index[-1] for _, entry in expired)
+            try:
+                tails = fetch_many([key for key, _ in expired], start)
+            except Exception as e:
+                logger.warning(
+                    "OHLCV tail refresh failed for %d series, serving stale: %s",
+                    len(expired), e,
+                )
+                tails = None
+            for key, entry in expired:
+                if tails is None:
+                    frames[key] = entry.frame
+                    continue
+                frame = self._splice_tail(entry, tails.get(key, pd.DataFrame()))
+                self.put(key, frame, window=entry.window)
+                frames[key] = frame
+        return frames
+
+    @classmethod
+    def _refresh_tail(cls, entry: _Entry, fetch) -> pd.DataFrame:
+        return cls._splice_tail(entry, fetch(entry.frame.index[-1]))
+
+    @staticmethod
+    def _splice_tail(entry: _Entry, tail: pd.DataFrame) -> pd.DataFrame:
+        cached = entry.frame
+        if tail.empty:
+            return cached
+
+        # Bars from the first one of the tail onwards are replaced by the fresh
+        # download.
+        head = cached[cached.index < tail.index[0]]
+        merged = pd.concat([head, tail[cached.columns.intersection(tail.columns)]])
+        merged = merged[~merged.index.duplicated(keep='last')]
+
+        if entry.window is not None:
+            cutoff = merged.index[-1] - entry.window
+            merged = merged[merged.index >= cutoff]
+        return merged
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ohlcv_cache() -> OHLCVCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OHLCVCache(
+                    max_bytes=getattr(
+                        settings, 'MARKET_DATA_CACHE_MAX_BYTES', 256 * 1024 * 1024
+                    )
+                )
+    return _cache
+
+
+def _hit_ratio() -> float:
+    cache = get_ohlcv_cache()
+    lookups = cache.hits + cache.misses + cache.refreshes
+    return cache.hits / lookups if lookups else 0.0
+
+
+OHLCV_CACHE_LOOKUPS = Counter(
+    'ohlcv_cache_lookups_total',
+    'OHLCV cache lookups: hit (fresh), refresh (expired, tail re-fetched) or miss',
+    ['result'],
+    callback=lambda: {
+        ('hit',): get_ohlcv_cache().hits,
+        ('refresh',): get_ohlcv_cache().refreshes,
+        ('miss',): get_ohlcv_cache().misses,
+    },
+)
+OHLCV_CACHE_HIT_RATIO = Gauge(
+    'ohlcv_cache_hit_ratio', 'Fresh hits over all OHLCV cache lookups',
+    callback=_hit_ratio,
+)
+OHLCV_CACHE_BYTES = Gauge(
+    'ohlcv_cache_bytes', 'Memory of the cached OHLCV frames',
+    callback=lambda: get_ohlcv_cache().nbytes,
+)
+OHLCV_CACHE_ENTRIES = Gauge(
+    'ohlcv_cache_entries', 'Cached OHLCV series',
+    callback=lambda: len(get_ohlcv_cache()),
+)
@@ -1,24 +1,328 @@
-import json
+import asyncio
 import logging
+import weakref
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .livebuffer import get_bar_buffer
+from .metrics import Counter, Gauge
+from .wire import (
+    JSON_SUBPROTOCOL,
+    MSGPACK_SUBPROTOCOL,
+    TICKER_RE,
+    decode_control,
+    encode_control,
+    ensure_encoded,
+    full_event,
+    group_name,
+    json_frame,
+    msgpack_frame,
+)
 
 logger = logging.getLogger(__name__)
 
-class TickerConsumer(AsyncWebsocketConsumer):
+# Cierre para clientes que no consumen a tiempo (4000-4999: códigos de aplicación)
+CLOSE_SLOW_CONSUMER = 4008
+
+# Colas de las conexiones abiertas, leídas solo al consultar /metrics
+_open_queues = weakref.WeakSet()
+
+WS_CONNECTIONS = Gauge('ws_connections', 'Open WebSocket connections', ['endpoint'])
+WS_CONNECTIONS_TOTAL = Counter(
+    'ws_connections_total', 'Accepted WebSocket connections', ['endpoint'],
+)
+WS_FRAMES_SENT = Counter('ws_frames_sent_total', 'Update frames sent', ['endpoint'])
+WS_BARS_DROPPED = Counter(
+    'ws_bars_dropped_total', 'Pending bar updates dropped for lack of space',
+)
+WS_SLOW_CONSUMERS = Counter(
+    'ws_slow_consumers_total', 'Connections closed for not acknowledging in time',
+)
+WS_PENDING = Gauge(
+    'ws_pending_updates', 'Bar updates waiting for the next flush, all connections',
+    callback=lambda: sum(len(queue.pending) for queue in list(_open_queues)),
+)
+WS_UNACKED = Gauge(
+    'ws_unacked_frames', 'Frames sent and not yet acknowledged, all connections',
+    callback=lambda: sum(queue.in_flight for queue in list(_open_queues)),
+)
+
+
+class OutboundQueue:
+    """
+    Per-connection conflation and backpressure.
+
+    Updates are keyed by (ticker, interval, bar time): between two flushes
+    only the latest state of each bar is kept (see `full_event` for deltas),
+    so memory is bounded by `max_pending` bars and outbound frames by `rate`
+    flushes per second, however fast the producer publishes. `max_pending`
+    grows with the number of subscribed streams (`set_streams`), so a healthy
+    client with many subscriptions is not conflated away.
+
+    Outbound bytes are bounded too, acks or not: a flush of N bytes delays
+    the next one by at least N / `max_bytes_rate` seconds, and the updates
+    arriving meanwhile are conflated as above. A client that never acks (and
+    whose link can't be observed from here) gets at most that byte rate.
+
+    Clients may also acknowledge frames ({"type": "ack", "seq": N}). While more
+    than `window` frames are unacknowledged the rate is halved at every
+    flush, down to `min_rate`; a client still twice the window behind at the
+    minimum rate is `stalled` and gets dropped. As acks catch up the rate
+    doubles back to the requested one.
+    """
+
+    def __init__(self, rate: float, max_pending: int, window: int,
+                 min_rate: float = 1.0, max_bytes_rate: float = None):
+        self.requested_rate = self.rate = rate
+        self.base_pending = self.max_pending = max_pending
+        self.max_bytes_rate = max_bytes_rate
+        self.window = window
+        self.min_rate = min(min_rate, rate)
+        self.pending = {}
+        # Streams con barras descartadas: el próximo delta va completo
+        self.stale = set()
+        self.seq = 0
+        self.acked = None  # None hasta que el cliente envía su primer ack
+        self.dropped = 0
+        self.next_flush = 0.0
+
+    def set_rate(self, rate: float):
+        self.requested_rate = self.rate = rate
+        self.min_rate = min(self.min_rate, rate)
+
+    def set_streams(self, count: int):
+        """Room for the forming bar and the one just closed of `count` streams."""
+        self.max_pending = max(self.base_pending, 2 * count)
+
+    def push(self, key, payload):
+        """Queue the update of bar `key` = (ticker, interval, time)."""
+        stream = key[:-1]
+        if key in self.pending or stream in self.stale:
+            self.stale.discard(stream)
+            payload = full_event(payload)
+        elif len(self.pending) >= self.max_pending:
+            # Sin espacio: se descarta la barra más antigua
+            evicted = next(iter(self.pending))
+            self.pending.pop(evicted)
+            self.stale.add(evicted[:-1])
+            self.dropped += 1
+            WS_BARS_DROPPED.inc()
+        self.pending[key] = payload
+
+    def delay(self, now: float) -> float:
+        """Seconds until the next flush is allowed."""
+        return max(0.0, self.next_flush - now)
+
+    def drain(self, now: float) -> list:
+        """Pending payloads (oldest bar first) as [(seq, payload)]."""
+        frames = []
+        for payload in self.pending.values():
+            self.seq += 1
+            frames.append((self.seq, payload))
+        self.pending.clear()
+        self.next_flush = now + 1 / self.rate
+        return frames
+
+    def sent(self, nbytes: int, now: float):
+        """Account the bytes of the last flush against `max_bytes_rate`."""
+        if self.max_bytes_rate:
+            self.next_flush = max(self.next_flush, now + nbytes / self.max_bytes_rate)
+
+    @property
+    def in_flight(self) -> int:
+        return 0 if self.acked is None else self.seq - self.acked
+
+    def ack(self, seq: int):
+        self.acked = max(self.acked or 0, min(seq, self.seq))
+        if self.in_flight <= self.window // 4 and self.rate < self.requested_rate:
+            self.rate = min(self.requested_rate, self.rate * 2)
+
+    def check_backpressure(self) -> bool:
+        """Downgrade the rate if the client is behind; True when it is stalled."""
+        if self.in_flight <= self.window:
+            return False
+        if self.rate > self.min_rate:
+            self.rate = max(self.min_rate, self.rate / 2)
+            return False
+        return self.in_flight > 2 * self.window
+
+
+def clamp_rate(value) -> float:
+    """Client-requested updates per second, within the server limits."""
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return settings.WS_DEFAULT_MAX_RATE
+    return min(max(rate, settings.WS_MIN_RATE), settings.WS_MAX_RATE)
+
+
+class LiveConsumer(AsyncWebsocketConsumer):
+    """
+    Common part of the live consumers: subprotocol negotiation (JSON or
+    msgpack frames), conflation / backpressure through an OutboundQueue and
+    the control messages shared by every endpoint:
+
+        {"type": "ack", "seq": N}
+        {"type": "configure", "max_rate": R}
+    """
+
+    # Etiqueta 'endpoint' de las métricas
+    endpoint = 'live'
+
+    def setup_connection(self):
+        # Tasa máxima de envío elegida por el cliente: ?max_rate=<mensajes/s>
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        self.outbound = OutboundQueue(
+            rate=clamp_rate(params.get('max_rate', [settings.WS_DEFAULT_MAX_RATE])[0]),
+            max_pending=settings.WS_MAX_PENDING_BARS,
+            window=settings.WS_ACK_WINDOW,
+            min_rate=settings.WS_MIN_RATE,
+            max_bytes_rate=settings.WS_MAX_BYTES_RATE,
+        )
+        self.flush_task = None
+        self.closing = False
+        self.accepted = False
+        _open_queues.add(self.outbound)
+
+        # Subprotocolo 'msgpack' → frames binarios; si no, JSON en texto
+        subprotocols = self.scope.get('subprotocols') or []
+        self.binary = MSGPACK_SUBPROTOCOL in subprotocols
+        if self.binary:
+            return MSGPACK_SUBPROTOCOL
+        return JSON_SUBPROTOCOL if JSON_SUBPROTOCOL in subprotocols else None
+
+    async def dispatch(self, message):
+        # channels cierra las conexiones viejas de la BD (un salto a un hilo,
+        # serializado entre todos los consumers) antes de cada mensaje; las
+        # actualizaciones en vivo no usan la BD, así que van directas
+        if message['type'] == 'ticker_update':
+            await self.ticker_update(message)
+        else:
+            await super().dispatch(message)
+
+    async def accept(self, subprotocol=None, headers=None):
+        await super().accept(subprotocol, headers)
+        self.accepted = True
+        WS_CONNECTIONS.inc(endpoint=self.endpoint)
+        WS_CONNECTIONS_TOTAL.inc(endpoint=self.endpoint)
+
+    async def websocket_disconnect(self, message):
+        if getattr(self, 'accepted', False):
+            self.accepted = False
+            WS_CONNECTIONS.dec(endpoint=self.endpoint)
+        await super().websocket_disconnect(message)
+
+    def stop_flushing(self):
+        self.closing = True
+        if getattr(self, 'flush_task', None) is not None:
+            self.flush_task.cancel()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        data = decode_control(text_data, bytes_data)
+        if data is None:
+            return
+        if data.get('type') == 'ack' and isinstance(data.get('seq'), int):
+            self.outbound.ack(data['seq'])
+        elif data.get('type') == 'configure' and 'max_rate' in data:
+            self.outbound.set_rate(clamp_rate(data['max_rate']))
+        else:
+            await self.handle_command(data)
+
+    async def handle_command(self, data: dict):
+        """Endpoint-specific control messages."""
+
+    async def send_control(self, message: dict):
+        await self.send(**encode_control(message, self.binary))
+
+    async def send_snapshot(self, ticker: str, interval: str = None):
+        """Recent bars of the stream in one frame, before its incremental updates."""
+        try:
+            bars = await get_bar_buffer().snapshot(ticker, interval)
+        except Exception as e:
+            logger.warning(f"Snapshot of {ticker}/{interval} not available: {e}")
+            return
+        await self.send_control({
+            'type': 'snapshot', 'ticker': ticker, 'interval': interval, 'bars': bars,
+        })
+
+    def frame_fields(self, event: dict):
+        """Extra fields of the update frames (None = only type/seq/payload)."""
+        return None
+
+    async def ticker_update(self, event):
+        if self.closing:
+            return
+        # El publicador ya serializó el payload (api/wire.py): aquí solo se reenvía
+        event = ensure_encoded(event)
+        # Solo se guarda el último estado de cada barra hasta el próximo envío
+        key = (event.get('ticker'), event.get('interval'), event['time'])
+        self.outbound.push(key, event)
+        if self.flush_task is not None:
+            return
+        delay = self.outbound.delay(asyncio.get_running_loop().time())
+        if delay:
+            self.flush_task = asyncio.create_task(self.flush_later(delay))
+        else:
+            await self.flush()
+
+    async def flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if self.closing:
+            return
+        if self.outbound.check_backpressure():
+            logger.warning(
+                f"Slow consumer {self.channel_name}: "
+                f"{self.outbound.in_flight} frames unacknowledged, closing"
+            )
+            self.closing = True
+            WS_SLOW_CONSUMERS.inc()
+            await self.close(code=CLOSE_SLOW_CONSUMER)
+            return
+        now = asyncio.get_running_loop().time()
+        frames = self.outbound.drain(now)
+        if frames:
+            WS_FRAMES_SENT.inc(len(frames), endpoint=self.endpoint)
+        nbytes = 0
+        for seq, event in frames:
+            extra = self.frame_fields(event)
+            if self.binary:
+                frame = msgpack_frame('ticker.update', seq, event['msgpack'], extra)
+                await self.send(bytes_data=frame)
+            else:
+                frame = json_frame('ticker.update', seq, event['json'], extra)
+                await self.send(text_data=frame)
+            nbytes += len(frame)
+        self.outbound.sent(nbytes, now)
+
+
+class TickerConsumer(LiveConsumer):
+    """One ticker per connection: ws/ticks/<ticker>/"""
+
+    endpoint = 'ticks'
+
     async def connect(self):
         try:
             logger.info("--- WebSocket CONNECTING... ---")
             self.ticker = self.scope['url_route']['kwargs']['ticker']
-            self.room_group_name = f'ticker_{self.ticker}'
+            self.room_group_name = group_name(self.ticker)
             logger.info(f"Ticker: {self.ticker}, Group: {self.room_group_name}")
 
+            subprotocol = self.setup_connection()
+
             await self.channel_layer.group_add(
                 self.room_group_name,
                 self.channel_name
             )
 
-            await self.accept()
+            await self.accept(subprotocol)
             logger.info("--- WebSocket CONNECTED successfully ---")
+            await self.send_snapshot(self.ticker)
 
         except Exception as e:
             logger.error(f"!!! WebSocket connect FAILED: {e}", exc_info=True)
@@ -26,14 +330,104 @@ class TickerConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         logger.warning(f"--- WebSocket DISCONNECTED, code: {close_code} ---")
+        self.stop_flushing()
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    async def ticker_update(self, event):
-        logger.info(f"Sending message to group {self.room_group_name}")
-        await self.send(text_data=json.dumps({
-            'type': 'ticker.update',
-            'payload': event['message']
-        }))
\ No newline at end of file
+
+class StreamConsumer(LiveConsumer):
+    """
+    Many tickers / intervals over one connection: ws/stream/
+
+        {"type": "subscribe", "tickers": ["SPY", "QQQ"], "intervals": ["1m"]}
+        {"type": "unsubscribe", "tickers": ["QQQ"]}
+
+    Without "intervals" the raw ticker stream is used. Group membership is
+    updated incrementally (only the added / removed pairs touch the channel
+    layer) and every update frame names its ticker and interval.
+    """
+
+    endpoint = 'stream'
+
+    async def connect(self):
+        self.subscriptions = set()
+        subprotocol = self.setup_connection()
+        await self.accept(subprotocol)
+
+    async def disconnect(self, close_code):
+        self.stop_flushing()
+        for ticker, interval in self.subscriptions:
+            await self.channel_layer.group_discard(
+                group_name(ticker, interval), self.channel_name
+            )
+        self.subscriptions.clear()
+
+    def frame_fields(self, event: dict):
+        return {'ticker': event.get('ticker'), 'interval': event.get('interval')}
+
+    def parse_pairs(self, data: dict):
+        tickers = data.get('tickers') or []
+        intervals = data.get('intervals') or [None]
+        if not isinstance(tickers, list) or not isinstance(intervals, list):
+            raise ValueError("'tickers' and 'intervals' must be lists")
+        pairs = set()
+        for ticker in tickers:
+            ticker = str(ticker).upper()
+            if not TICKER_RE.match(ticker):
+                raise ValueError(f"Invalid ticker: {ticker}")
+            for interval in intervals:
+                if interval is not None and interval not in settings.WS_INTERVALS:
+                    raise ValueError(f"Invalid interval: {interval}")
+                pairs.add((ticker, interval))
+        return pairs
+
+    async def handle_command(self, data: dict):
+        command = data.get('type')
+        if command not in ('subscribe', 'unsubscribe'):
+            await self.send_control(
+                {'type': 'error', 'error': f"Unknown message type: {command}"}
+            )
+            return
+        try:
+            pairs = self.parse_pairs(data)
+        except ValueError as e:
+            await self.send_control({'type': 'error', 'error': str(e)})
+            return
+
+        if command == 'subscribe':
+            added = pairs - self.subscriptions
+            limit = settings.WS_MAX_SUBSCRIPTIONS
+            if len(self.subscriptions) + len(added) > limit:
+                await self.send_control({
+                    'type': 'error',
+                    'error': f"Too many subscriptions (max {limit})",
+                })
+                return
+            for ticker, interval in added:
+                await self.channel_layer.group_add(
+                    group_name(ticker, interval), self.channel_name
+                )
+            self.subscriptions |= added
+        else:
+            removed = pairs & self.subscriptions
+            for ticker, interval in removed:
+                await self.channel_layer.group_discard(
+                    group_name(ticker, interval), self.channel_name
+                )
+            self.subscriptions -= removed
+        self.outbound.set_streams(len(self.subscriptions))
+
+        await self.send_control({
+            'type': 'subscriptions',
+            'subscriptions': [
+                {'ticker': ticker, 'interval': interval}
+                for ticker, interval in sorted(
+                    self.subscriptions, key=lambda p: (p[0], p[1] or '')
+                )
+            ],
+        })
+        if command == 'subscribe':
+            for ticker, interval in sorted(added, key=lambda p: (p[0], p[1] or '')):
+                await self.send_snapshot(ticker, interval)
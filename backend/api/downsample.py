@@ -0,0 +1,158 @@
+"""
+Range slicing and server-side downsampling of chart series.
+
+- slice_series: keep bars in [from, to) and/or only the last `limit` bars.
+- decimate_ohlc: merge runs of adjacent bars (first/max/min/last/sum), so
+  candles keep their true extremes.
+- lttb: Largest-Triangle-Three-Buckets over the close, for line charts;
+  keeps the selected bars untouched.
+"""
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+
+# Range of pandas' nanosecond timestamps (~1677-09-22 .. 2262-04-11), which
+# every bound ends up compared against
+MIN_TIME = int(pd.Timestamp.min.ceil('s').timestamp())
+MAX_TIME = int(pd.Timestamp.max.floor('s').timestamp())
+
+
+def parse_time_param(value):
+    """
+    Query param → UTC epoch seconds. Accepts epoch seconds or an ISO date /
+    datetime ('2024-01-31', '2024-01-31T14:30:00Z'). Raises ValueError, also
+    for non-finite numbers and times outside MIN_TIME..MAX_TIME.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is not None:
+        if not math.isfinite(number):
+            raise ValueError(f"invalid time {value!r}")
+        seconds = int(number)
+    else:
+        try:
+            ts = pd.Timestamp(value)
+        except OverflowError:
+            raise ValueError(f"time {value!r} out of range") from None
+        if ts is pd.NaT:
+            raise ValueError(f"invalid time {value!r}")
+        if ts.tzinfo is None:
+            ts = ts.tz_localize('UTC')
+        seconds = int(ts.timestamp())
+    if not MIN_TIME <= seconds <= MAX_TIME:
+        raise ValueError(f"time {value!r} out of range")
+    return seconds
+
+
+def _bound_for(times: np.ndarray, seconds: int):
+    # Daily/weekly series carry 'YYYY-MM-DD' strings, which sort like dates
+    if times.dtype.kind in 'OUS':
+        return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%d')
+    return seconds
+
+
+def slice_series(df: pd.DataFrame, start=None, end=None, limit=None) -> pd.DataFrame:
+    """Bars with start <= time < end (epoch seconds), then the last `limit`."""
+    times = df['time'].to_numpy()
+    lo, hi = 0, len(times)
+    if start is not None:
+        lo = int(np.searchsorted(times, _bound_for(times, start), side='left'))
+    if end is not None:
+        hi = int(np.searchsorted(times, _bound_for(times, end), side='left'))
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    if lo == 0 and hi == len(times):
+        return df
+    return df.iloc[lo:max(lo, hi)].reset_index(drop=True)
+
+
+def decimate_ohlc(df: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """Merge adjacent bars so at most `max_points` remain."""
+    n = len(df)
+    if n <= max_points:
+        return df
+    group = -(-n // max_points)  # ceil
+    starts = np.arange(0, n, group)
+    ends = np.r_[starts[1:], n] - 1
+
+    out = {
+        'time': df['time'].to_numpy()[starts],
+        'open': df['open'].to_numpy()[starts],
+        'high': np.fmax.reduceat(df['high'].to_numpy(dtype=np.float64), starts),
+        'low': np.fmin.reduceat(df['low'].to_numpy(dtype=np.float64), starts),
+        'close': df['close'].to_numpy()[ends],
+    }
+    if 'volume' in df.columns:
+        out['volume'] = np.add.reduceat(df['volume'].to_numpy(), starts)
+    return pd.DataFrame(out)
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+    x is taken as the bar index, so gaps (nights, weekends) don't skew it.
+
+    The next-bucket averages and the triangle terms of every candidate are
+    computed up front with NumPy; only the choice of each bucket's point,
+    which depends on the previous one, is left in the loop.
+    """
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts, stops = edges[:-1], edges[1:]
+    nxt_stops = np.r_[edges[2:], n]
+
+    # Average of the next bucket is the third triangle vertex
+    finite = np.isfinite(y)
+    sums = np.add.reduceat(np.where(finite, y, 0.0), stops)
+    counts = np.add.reduceat(finite.astype(np.int64), stops)
+    cy = np.full(len(sums), np.nan)
+    np.divide(sums, counts, out=cy, where=counts > 0)
+    cx = (stops + nxt_stops - 1) / 2.0
+
+    # Candidates of each bucket as rows padded to the widest bucket. With the
+    # previous point a = (ax, ay) the doubled triangle area of a candidate
+    # (x, y) is |ax*(y - cy) + ay*(cx - x) + (x*cy - cx*y)|.
+    cols = starts[:, None] + np.arange(int((stops - starts).max()))
+    valid = cols < stops[:, None]
+    cols = np.minimum(cols, n - 1)
+    valid &= finite[cols]
+    xs, ys = cols.astype(np.float64), y[cols]
+    cx, cy = cx[:, None], cy[:, None]
+    terms = np.stack([ys - cy, cx - xs, xs * cy - cx * ys], axis=-1)
+    # Padding and NaN closes get area 0, so they are never preferred
+    terms[~valid] = 0.0
+
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i, lo in enumerate(starts.tolist()):
+        area = np.abs(terms[i] @ np.array((a, y[a], 1.0)))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def lttb(df: pd.DataFrame, max_points: int, column: str = 'close') -> pd.DataFrame:
+    if len(df) <= max_points:
+        return df
+    idx = lttb_indices(df[column].to_numpy(), max_points)
+    return df.iloc[idx].reset_index(drop=True)
+
+
+def downsample(df: pd.DataFrame, max_points: int, mode: str = 'ohlc') -> pd.DataFrame:
+    if mode == 'line':
+        return lttb(df, max_points)
+    return decimate_ohlc(df, max_points)
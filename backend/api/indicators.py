@@ -0,0 +1,518 @@
+"""
+Technical indicators computed on the server.
+
+Two implementations of the same formulas:
+
+- vectorized functions over whole series (NumPy, plus pandas' compiled
+  `ewm` for the recursive averages), used by /api/indicators on the cached
+  chart series;
+- incremental states that update in O(1) per trade, used by the live bar
+  aggregator (api/aggregator.py) so interval streams carry indicator values
+  next to the bars.
+
+Indicators are requested as comma-separated specs, `name[:param...]`:
+
+    sma:20  ema:50  rsi:14  macd:12:26:9  bb:20:2  atr:14  vwap
+
+Averages follow the usual charting conventions: EMA and Wilder's smoothing
+(RSI, ATR) are seeded with the simple average of their first window, and
+Bollinger Bands use the population standard deviation. VWAP restarts every
+session day (every bar on daily and weekly series) and uses the typical
+price (high + low + close) / 3. Values are NaN (None on the wire) while an
+indicator is warming up.
+"""
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from .sessions import NS_PER_DAY, local_ns
+
+MAX_INDICATORS = 16
+MAX_WINDOW = 1000
+
+
+# Cálculo vectorizado (series completas)
+
+def _smoothed(x: np.ndarray, n: int, alpha: float) -> np.ndarray:
+    """Exponential average seeded with the mean of the first `n` values."""
+    out = np.full(len(x), np.nan)
+    if len(x) < n:
+        return out
+    seeded = np.concatenate([[x[:n].mean()], x[n:]])
+    out[n - 1:] = pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+def sma(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        total = np.cumsum(np.concatenate([[0.0], x]))
+        out[n - 1:] = (total[n:] - total[:-n]) / n
+    return out
+
+
+def ema(x: np.ndarray, n: int) -> np.ndarray:
+    return _smoothed(x, n, 2 / (n + 1))
+
+
+def rsi(close: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(len(close), np.nan)
+    change = np.diff(close)
+    gain = _smoothed(np.maximum(change, 0.0), n, 1 / n)
+    loss = _smoothed(np.maximum(-change, 0.0), n, 1 / n)
+    out[1:] = _rsi_value(gain, loss)
+    return out
+
+
+def _rsi_value(gain, loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100 - 100 / (1 + gain / loss)
+    # Sin pérdidas: 100 (50 si tampoco hubo ganancias)
+    return np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), value)
+
+
+def macd(close: np.ndarray, fast: int, slow: int, signal: int):
+    """(macd, signal, histogram); the signal line starts with the MACD line."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = np.full(len(close), np.nan)
+    start = max(fast, slow) - 1
+    if len(close) > start:
+        signal_line[start:] = ema(line[start:], signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close: np.ndarray, n: int, k: float):
+    """
+    (upper, middle, lower). The rolling variance comes from running sums of
+    the closes and their squares, shifted by the first close (as `_Window`
+    does live) so large prices don't cancel out: O(len) memory for any `n`.
+    """
+    middle = sma(close, n)
+    std = np.full(len(close), np.nan)
+    if len(close) >= n:
+        d = close - close[0]
+        total = np.cumsum(np.concatenate([[0.0], d]))
+        squares = np.cumsum(np.concatenate([[0.0], d * d]))
+        mean = (total[n:] - total[:-n]) / n
+        variance = (squares[n:] - squares[:-n]) / n - mean * mean
+        std[n - 1:] = np.sqrt(np.maximum(variance, 0.0))
+    return middle + k * std, middle, middle - k * std
+
+
+def true_range(high, low, close) -> np.ndarray:
+    prev = np.concatenate([[np.nan], close[:-1]])
+    # fmax: la primera barra (sin cierre previo) usa solo high - low
+    return np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+
+
+def atr(high, low, close, n: int) -> np.ndarray:
+    return _smoothed(true_range(high, low, close), n, 1 / n)
+
+
+def vwap(high, low, close, volume, session: np.ndarray) -> np.ndarray:
+    """Volume-weighted typical price, cumulative within each `session` label."""
+    pv = (high + low + close) / 3 * volume
+    starts = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+    lengths = np.diff(np.r_[starts, len(session)])
+
+    def running(values):
+        # Suma acumulada que vuelve a empezar en cada sesión
+        total = np.cumsum(values)
+        offset = np.r_[0.0, total[starts[1:] - 1]]
+        return total - np.repeat(offset, lengths)
+
+    cum_v = running(volume)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(cum_v > 0, running(pv) / cum_v, np.nan)
+
+
+def session_days(times: np.ndarray, tz: str) -> np.ndarray:
+    """
+    Session label of each bar: the local date for intraday series (UTC
+    seconds), the bar itself for daily / weekly ones ('YYYY-MM-DD').
+    """
+    if times.dtype.kind in 'OUS':
+        return np.arange(len(times))
+    return local_ns(times.astype(np.int64) * 10**9, tz) // NS_PER_DAY
+
+
+# Estado incremental (barras en vivo)
+
+class _Smoother:
+    """Incremental `_smoothed`: commit() closed values, peek() the forming one."""
+
+    __slots__ = ('n', 'alpha', 'count', 'total', 'value')
+
+    def __init__(self, n: int, alpha: float):
+        self.n = n
+        self.alpha = alpha
+        self.count = 0
+        self.total = 0.0
+        self.value = None
+
+    def peek(self, x: float):
+        if self.value is not None:
+            return self.value + self.alpha * (x - self.value)
+        if self.count == self.n - 1:
+            return (self.total + x) / self.n
+        return None
+
+    def commit(self, x: float):
+        value = self.peek(x)
+        if self.value is None and value is None:
+            self.count += 1
+            self.total += x
+        else:
+            self.value = value
+
+
+class _Window:
+    """Last `n - 1` closed values, with running sums shifted by the first one."""
+
+    __slots__ = ('n', 'values', 'shift', 'total', 'squares')
+
+    def __init__(self, n: int):
+        self.n = n
+        self.values = deque()
+        self.shift = None
+        self.total = self.squares = 0.0
+
+    def peek(self, x: float):
+        """(mean, population std) including `x`, or None while warming up."""
+        if len(self.values) < self.n - 1:
+            return None
+        d = x - (x if self.shift is None else self.shift)
+        mean = (self.total + d) / self.n
+        variance = max((self.squares + d * d) / self.n - mean * mean, 0.0)
+        return mean + (x if self.shift is None else self.shift), variance ** 0.5
+
+    def commit(self, x: float):
+        if self.n == 1:
+            return
+        if self.shift is None:
+            self.shift = x
+        d = x - self.shift
+        self.values.append(d)
+        self.total += d
+        self.squares += d * d
+        if len(self.values) >= self.n:
+            old = self.values.popleft()
+            self.total -= old
+            self.squares -= old * old
+
+
+class IncrementalIndicator:
+    """
+    Live value of one indicator. `update(time, bar)` is called on every
+    change of the forming bar; when `time` moves on, the previous bar is
+    committed first. Returns {column: value or None}.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.time = None
+        self.bar = None
+
+    def update(self, time, bar: dict) -> dict:
+        if time != self.time:
+            if self.bar is not None:
+                self.commit(self.bar)
+            self.time = time
+            self.start(time)
+        self.bar = bar
+        return self.value(bar)
+
+    def start(self, time):
+        """A new bar begins."""
+
+    def commit(self, bar: dict):
+        raise NotImplementedError
+
+    def value(self, bar: dict) -> dict:
+        raise NotImplementedError
+
+
+class SMAState(IncrementalIndicator):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.window = _Window(spec.params[0])
+
+    def commit(self, bar):
+        self.window.commit(bar['close'])
+
+    def value(self, bar):
+        stats = self.window.peek(bar['close'])
+        return {self.spec.name: None if stats is None else stats[0]}
+
+
+class EMAState(IncrementalIndicator):
+    def __init__(self, spec):
+        super().__init__(spec)
+        n = spec.params[0]
+        self.ema = _Smoother(n, 2 / (n + 1))
+
+    def commit(self, bar):
+        self.ema.commit(bar['close'])
+
+    def value(self, bar):
+        return {self.spec.name: self.ema.peek(bar['close'])}
+
+
+class RSIState(IncrementalIndicator):
+    def __init__(self, spec):
+        super().__init__(spec)
+        n = spec.params[0]
+        self.gain = _Smoother(n, 1 / n)
+        self.loss = _Smoother(n, 1 / n)
+        self.prev_close = None
+
+    def commit(self, bar):
+        if self.prev_close is not None:
+            change = bar['close'] - self.prev_close
+            self.gain.commit(max(change, 0.0))
+            self.loss.commit(max(-change, 0.0))
+        self.prev_close = bar['close']
+
+    def value(self, bar):
+        if self.prev_close is None:
+            return {self.spec.name: None}
+        change = bar['close'] - self.prev_close
+        gain = self.gain.peek(max(change, 0.0))
+        loss = self.loss.peek(max(-change, 0.0))
+        if gain is None:
+            return {self.spec.name: None}
+        if loss == 0:
+            return {self.spec.name: 50.0 if gain == 0 else 100.0}
+        return {self.spec.name: 100 - 100 / (1 + gain / loss)}
+
+
+class MACDState(IncrementalIndicator):
+    def __init__(self, spec):
+        super().__init__(spec)
+        fast, slow, signal = spec.params
+        self.fast = _Smoother(fast, 2 / (fast + 1))
+        self.slow = _Smoother(slow, 2 / (slow + 1))
+        self.signal = _Smoother(signal, 2 / (signal + 1))
+
+    def line(self, close: float):
+        fast, slow = self.fast.peek(close), self.slow.peek(close)
+        return None if fast is None or slow is None else fast - slow
+
+    def commit(self, bar):
+        line = self.line(bar['close'])
+        if line is not None:
+            self.signal.commit(line)
+        self.fast.commit(bar['close'])
+        self.slow.commit(bar['close'])
+
+    def value(self, bar):
+        line = self.line(bar['close'])
+        signal = None if line is None else self.signal.peek(line)
+        name = self.spec.name
+        return {
+            name: line,
+            f'{name}_signal': signal,
+            f'{name}_hist': None if signal is None else line - signal,
+        }
+
+
+class BollingerState(IncrementalIndicator):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.window = _Window(spec.params[0])
+
+    def commit(self, bar):
+        self.window.commit(bar['close'])
+
+    def value(self, bar):
+        name = self.spec.name
+        stats = self.window.peek(bar['close'])
+        if stats is None:
+            return dict.fromkeys(self.spec.columns)
+        mean, std = stats
+        k = self.spec.params[1]
+        return {
+            f'{name}_upper': mean + k * std,
+            f'{name}_mid': mean,
+            f'{name}_lower': mean - k * std,
+        }
+
+
+class ATRState(IncrementalIndicator):
+    def __init__(self, spec):
+        super().__init__(spec)
+        n = spec.params[0]
+        self.atr = _Smoother(n, 1 / n)
+        self.prev_close = None
+
+    def true_range(self, bar):
+        high, low = bar['high'], bar['low']
+        if self.prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def commit(self, bar):
+        self.atr.commit(self.true_range(bar))
+        self.prev_close = bar['close']
+
+    def value(self, bar):
+        return {self.spec.name: self.atr.peek(self.true_range(bar))}
+
+
+class VWAPState(IncrementalIndicator):
+    """`time` in UTC seconds; `tz=None` makes every bar its own session (daily bars)."""
+
+    def __init__(self, spec, tz: str = None):
+        super().__init__(spec)
+        self.zone = None if tz is None else ZoneInfo(tz)
+        self.session = None
+        self.pv = self.volume = 0.0
+
+    def start(self, time):
+        if self.zone is None:
+            session = time
+        else:
+            moment = datetime.fromtimestamp(time, timezone.utc)
+            session = moment.astimezone(self.zone).date()
+        if session != self.session:
+            self.session = session
+            self.pv = self.volume = 0.0
+
+    @staticmethod
+    def _pv(bar):
+        return (bar['high'] + bar['low'] + bar['close']) / 3 * bar['volume']
+
+    def commit(self, bar):
+        self.pv += self._pv(bar)
+        self.volume += bar['volume']
+
+    def value(self, bar):
+        volume = self.volume + bar['volume']
+        value = (self.pv + self._pv(bar)) / volume if volume > 0 else None
+        return {self.spec.name: value}
+
+
+# Especificaciones ('sma:20', 'macd:12:26:9'...)
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    kind: str
+    params: tuple
+
+    @property
+    def name(self) -> str:
+        # 'bb:20:2.5' → 'bb_20_2p5' (nombres de columna sin puntos)
+        return '_'.join([self.kind, *(f'{p:g}'.replace('.', 'p') for p in self.params)])
+
+    @property
+    def columns(self) -> list:
+        return [self.name + suffix for suffix in INDICATORS[self.kind].suffixes]
+
+    def compute(self, df: pd.DataFrame, tz: str) -> dict:
+        """
+        {column: array} over a chart series (time, open, high, low, close,
+        [volume]).
+        """
+        arrays = {c: df[c].to_numpy(dtype=np.float64) for c in ('high', 'low', 'close')}
+        if self.kind == 'vwap':
+            if 'volume' not in df.columns:
+                return {self.name: np.full(len(df), np.nan)}
+            session = session_days(df['time'].to_numpy(), tz)
+            volume = df['volume'].to_numpy(dtype=np.float64)
+            return {self.name: vwap(
+                arrays['high'], arrays['low'], arrays['close'], volume, session
+            )}
+        if self.kind == 'atr':
+            values = atr(arrays['high'], arrays['low'], arrays['close'], *self.params)
+        else:
+            values = INDICATORS[self.kind].function(arrays['close'], *self.params)
+        if not isinstance(values, tuple):
+            values = (values,)
+        return dict(zip(self.columns, values))
+
+    def state(self, tz: str = None) -> IncrementalIndicator:
+        if self.kind == 'vwap':
+            return VWAPState(self, tz)
+        return INDICATORS[self.kind].state(self)
+
+
+@dataclass(frozen=True)
+class _Kind:
+    function: object
+    state: type
+    defaults: tuple
+    suffixes: tuple = ('',)
+
+
+INDICATORS = {
+    'sma': _Kind(sma, SMAState, (20,)),
+    'ema': _Kind(ema, EMAState, (20,)),
+    'rsi': _Kind(rsi, RSIState, (14,)),
+    'macd': _Kind(macd, MACDState, (12, 26, 9), ('', '_signal', '_hist')),
+    'bb': _Kind(bollinger, BollingerState, (20, 2), ('_upper', '_mid', '_lower')),
+    'atr': _Kind(atr, ATRState, (14,)),
+    'vwap': _Kind(vwap, VWAPState, ()),
+}
+
+
+def parse_indicators(text: str) -> list:
+    """
+    'sma:20,rsi:14' → [IndicatorSpec]; missing params take the defaults.
+    Raises ValueError.
+    """
+    specs = []
+    for item in (text or '').split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        kind, *params = item.split(':')
+        if kind not in INDICATORS:
+            raise ValueError(f"Unknown indicator: {kind}")
+        defaults = INDICATORS[kind].defaults
+        if len(params) > len(defaults):
+            raise ValueError(f"Too many parameters for {kind}: {item}")
+        try:
+            values = [
+                float(p) if kind == 'bb' and i == 1 else int(p)
+                for i, p in enumerate(params)
+            ]
+        except ValueError:
+            raise ValueError(f"Invalid parameters: {item}") from None
+        values += defaults[len(values):]
+        windows = values[:1] if kind == 'bb' else values
+        if any(not 1 <= w <= MAX_WINDOW for w in windows) \
+                or (kind == 'bb' and values[1] <= 0):
+            raise ValueError(
+                f"Parameters out of range (windows 1-{MAX_WINDOW}): {item}"
+            )
+        spec = IndicatorSpec(kind, tuple(values))
+        if spec not in specs:
+            specs.append(spec)
+    if len(specs) > MAX_INDICATORS:
+        raise ValueError(f"Too many indicators (max {MAX_INDICATORS})")
+    return specs
+
+
+def compute_indicators(df: pd.DataFrame, specs, tz: str) -> pd.DataFrame:
+    """time + the columns of every spec, over the whole series."""
+    out = {'time': df['time'].to_numpy()}
+    for spec in specs:
+        out.update(spec.compute(df, tz))
+    return pd.DataFrame(out)
+
+
+class IndicatorSet:
+    """Incremental states of several indicators over one live bar stream."""
+
+    def __init__(self, specs, tz: str = None):
+        self.states = [spec.state(tz) for spec in specs]
+
+    def update(self, time, bar: dict) -> dict:
+        values = {}
+        for state in self.states:
+            values.update(state.update(time, bar))
+        return values
@@ -0,0 +1,204 @@
+"""
+Recent bars of every live stream, for the snapshot sent on connect.
+
+Publishers `record` each update; consumers read a `snapshot` of the last
+LIVE_BUFFER_SIZE bars of a (ticker, interval) right after subscribing and
+send it as one frame before the incremental updates. An update for the
+bar that is still forming replaces it; a bar older than the last one (a
+replay starting over) resets the buffer.
+
+Backends (settings.LIVE_BUFFER_BACKEND):
+
+- RedisBarBuffer: shared by the publisher and every Daphne process; one
+  capped list per stream, updated with a Lua script in a single pipeline
+  per publish batch.
+- InMemoryBarBuffer: NumPy ring buffers in this process (publisher and
+  consumers in the same process: benchmarks, load tests, development).
+"""
+import threading
+
+import msgpack
+import numpy as np
+import redis.asyncio as redis
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+BAR_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+_PRICE_FIELDS = BAR_FIELDS[1:5]
+
+
+def time_key(time) -> int:
+    """
+    Orderable integer of a bar time: UTC seconds as they are, 'YYYY-MM-DD'
+    (daily bars) as days since the epoch.
+    """
+    if isinstance(time, str):
+        return int(np.datetime64(time, 'D').astype(np.int64))
+    return int(time)
+
+
+def _bar_updates(updates):
+    """
+    [(ticker, interval, payload)] → [((ticker, interval), bar)] in order,
+    keeping only the last of consecutive updates to the same bar.
+    """
+    bars, last = [], {}
+    for ticker, interval, payload in updates:
+        if not isinstance(payload, dict) or payload.get('time') is None:
+            continue
+        key = (ticker, interval)
+        i = last.get(key)
+        if i is not None and bars[i][1]['time'] == payload['time']:
+            bars[i] = (key, payload)
+        else:
+            last[key] = len(bars)
+            bars.append((key, payload))
+    return bars
+
+
+class BarBuffer:
+    async def record(self, updates):
+        """Store [(ticker, interval, payload)], in publish order."""
+        raise NotImplementedError
+
+    async def snapshot(self, ticker: str, interval: str = None) -> dict:
+        """Last bars of the stream as columns {field: [values]} (oldest first)."""
+        raise NotImplementedError
+
+
+class BarRing:
+    """
+    Fixed-size ring of OHLCV bars stored in NumPy arrays. Daily bars
+    ('YYYY-MM-DD' times) are kept as day numbers and given back as dates.
+    """
+
+    __slots__ = ('times', 'values', 'start', 'count', 'dates')
+
+    def __init__(self, size: int):
+        self.times = np.zeros(size, dtype=np.int64)
+        self.values = np.zeros((size, 5), dtype=np.float64)
+        self.start = 0
+        self.count = 0
+        self.dates = False
+
+    def __len__(self):
+        return self.count
+
+    def update(self, bar: dict):
+        size = len(self.times)
+        self.dates = isinstance(bar['time'], str)
+        time = time_key(bar['time'])
+        if self.count:
+            last = (self.start + self.count - 1) % size
+            if time == self.times[last]:
+                self.values[last] = [bar.get(f, np.nan) for f in BAR_FIELDS[1:]]
+                return
+            if time < self.times[last]:
+                self.start = self.count = 0
+        slot = (self.start + self.count) % size
+        if self.count == size:
+            self.start = (self.start + 1) % size
+        else:
+            self.count += 1
+        self.times[slot] = time
+        self.values[slot] = [bar.get(f, np.nan) for f in BAR_FIELDS[1:]]
+
+    def columns(self) -> dict:
+        order = (self.start + np.arange(self.count)) % len(self.times)
+        values = self.values[order]
+        times = self.times[order]
+        if self.dates:
+            times = np.datetime_as_string(times.astype('M8[D]'))
+        columns = {'time': times.tolist()}
+        for i, name in enumerate(_PRICE_FIELDS):
+            columns[name] = values[:, i].tolist()
+        columns['volume'] = np.nan_to_num(values[:, 4]).astype(np.int64).tolist()
+        return columns
+
+
+class InMemoryBarBuffer(BarBuffer):
+    def __init__(self, size: int = None):
+        self.size = size or settings.LIVE_BUFFER_SIZE
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    async def record(self, updates):
+        with self._lock:
+            for key, bar in _bar_updates(updates):
+                ring = self._rings.get(key)
+                if ring is None:
+                    ring = self._rings[key] = BarRing(self.size)
+                ring.update(bar)
+
+    async def snapshot(self, ticker: str, interval: str = None) -> dict:
+        with self._lock:
+            ring = self._rings.get((ticker, interval))
+            return ring.columns() if ring is not None else {f: [] for f in BAR_FIELDS}
+
+
+# KEYS: lista de barras, última hora registrada. ARGV: hora, barra, tamaño
+_RECORD_SCRIPT = """
+local last = redis.call('GET', KEYS[2])
+local time = tonumber(ARGV[1])
+if last and tonumber(last) == time and redis.call('LLEN', KEYS[1]) > 0 then
+    redis.call('LSET', KEYS[1], -1, ARGV[2])
+    return 0
+end
+if last and tonumber(last) > time then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('RPUSH', KEYS[1], ARGV[2])
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[3]), -1)
+redis.call('SET', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+class RedisBarBuffer(BarBuffer):
+    def __init__(self, size: int = None, host: str = None, port: int = 6379):
+        self.size = size or settings.LIVE_BUFFER_SIZE
+        self.redis = redis.Redis(host=host or settings.REDIS_HOST, port=port)
+        self._record = self.redis.register_script(_RECORD_SCRIPT)
+
+    @staticmethod
+    def key(ticker: str, interval: str = None) -> str:
+        return f'bars:{ticker}:{interval or "raw"}'
+
+    async def record(self, updates):
+        bars = _bar_updates(updates)
+        if not bars:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for (ticker, interval), bar in bars:
+                key = self.key(ticker, interval)
+                packed = msgpack.packb([bar.get(f) for f in BAR_FIELDS])
+                await self._record(
+                    keys=[key, f'{key}:last'],
+                    args=[time_key(bar['time']), packed, self.size],
+                    client=pipe,
+                )
+            await pipe.execute()
+
+    async def snapshot(self, ticker: str, interval: str = None) -> dict:
+        rows = await self.redis.lrange(self.key(ticker, interval), 0, -1)
+        bars = [msgpack.unpackb(row) for row in rows]
+        return {f: [bar[i] for bar in bars] for i, f in enumerate(BAR_FIELDS)}
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_bar_buffer() -> BarBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = import_string(settings.LIVE_BUFFER_BACKEND)()
+    return _buffer
+
+
+def set_bar_buffer(buffer: BarBuffer):
+    """Swap the active buffer (benchmarks, load tests)."""
+    global _buffer
+    _buffer = buffer
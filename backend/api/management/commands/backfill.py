@@ -0,0 +1,107 @@
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from api.barstore import get_bar_store
+from api.resample import BASE_SERIES
+from api.views import download_ohlcv_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Carga y amplía el almacén de barras en disco (BAR_STORE_DIR): descarga '
+        'agrupada de las series base (1m, 5m, 1d) de los tickers; las series ya '
+        'guardadas solo descargan las barras nuevas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tickers', required=True, help='Tickers separados por comas.'
+        )
+        parser.add_argument(
+            '--intervals', default=','.join(BASE_SERIES),
+            help=f'Series base a cargar (por defecto {",".join(BASE_SERIES)}).',
+        )
+        parser.add_argument(
+            '--chunk', type=int, default=20,
+            help='Tickers por descarga agrupada.',
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Descargar el periodo completo también de las series ya guardadas.',
+        )
+        parser.add_argument(
+            '--every', type=float, default=0,
+            help='Repetir cada N segundos (0 = una sola pasada).',
+        )
+
+    def handle(self, *args, **options):
+        store = get_bar_store()
+        if store is None:
+            raise CommandError(
+                'El almacén de barras está desactivado (BAR_STORE_DIR vacío).'
+            )
+        tickers = []
+        for ticker in options['tickers'].split(','):
+            ticker = ticker.strip().upper()
+            if ticker and ticker not in tickers:
+                tickers.append(ticker)
+        intervals = [i.strip() for i in options['intervals'].split(',') if i.strip()]
+        unknown = [i for i in intervals if i not in BASE_SERIES]
+        if unknown:
+            raise CommandError(f"Series base desconocidas: {', '.join(unknown)}")
+        if not tickers or options['chunk'] < 1:
+            raise CommandError('Indica al menos un ticker y un --chunk mayor que 0.')
+
+        full = options['full']
+        while True:
+            started = time.monotonic()
+            for interval in intervals:
+                chunk = options['chunk']
+                for i in range(0, len(tickers), chunk):
+                    self.backfill(store, tickers[i:i + chunk], interval, full)
+            self.stdout.write(self.style.SUCCESS(
+                f'Pasada completada en {time.monotonic() - started:.1f}s ({store.root})'
+            ))
+            if options['every'] <= 0:
+                return
+            # Las pasadas siguientes solo amplían las series
+            full = False
+            time.sleep(options['every'])
+
+    def backfill(self, store, tickers, interval, full):
+        params = BASE_SERIES[interval]
+        metas = {ticker: store.meta(ticker, interval) for ticker in tickers}
+        stored = [t for t in tickers if not full and metas[t] and metas[t]['rows']]
+        new = [t for t in tickers if t not in stored]
+
+        # 1. Series nuevas: periodo completo. 2. Guardadas: desde su última barra
+        downloads = []
+        if new:
+            downloads.append((new, None))
+        if stored:
+            since = min(metas[t]['last'] for t in stored)
+            downloads.append((stored, since))
+        for group, since in downloads:
+            start = None if since is None else pd.Timestamp(since, tz='UTC')
+            try:
+                frames = download_ohlcv_many(group, params, start=start)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(
+                    f'{interval} {group[0]}..{group[-1]}: error en la descarga: {e}'
+                ))
+                continue
+            for ticker in group:
+                frame = frames.get(ticker, pd.DataFrame())
+                if frame.empty and since is None:
+                    self.stdout.write(
+                        self.style.WARNING(f'{interval} {ticker}: sin datos')
+                    )
+                    continue
+                before = metas[ticker]['rows'] if metas[ticker] else 0
+                # Sin barras nuevas también se marca como actualizada
+                rows = store.write(ticker, interval, frame)
+                self.stdout.write(
+                    f'{interval} {ticker}: {rows} barras ({rows - before:+d})'
+                )
@@ -0,0 +1,300 @@
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+from channels.layers import InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.barstore import BarStore, set_bar_store
+from api.cache import get_ohlcv_cache
+from api.downsample import downsample
+from api.livebuffer import InMemoryBarBuffer, set_bar_buffer
+from api.providers import SyntheticProvider, set_provider
+from api.renderers import SERIES_RENDERERS
+from api.reports import build_response, fetch_earnings_concurrently
+from api.resample import BASE_SERIES, PERIOD_SPECS, base_arrays, derive_period
+from api.routing import websocket_urlpatterns
+from api.symbols import add_symbols, get_symbol_index
+from api.views import aggregate_cst_onehour_first_halfhour, download_ohlcv
+from api.wire import update_event
+
+# Fecha fija: los datos sintéticos son idénticos entre ejecuciones
+ANCHOR = datetime(2025, 6, 27)
+TICKER = 'SPY'
+
+
+def measure(fn, iterations, setup=None, items=1):
+    """
+    Ejecuta `fn` `iterations` veces y devuelve latencias (ms) p50/p95/p99,
+    throughput (ops/s e items/s) y el pico de memoria asignada de una
+    ejecución aparte con tracemalloc (que distorsiona los tiempos).
+    """
+    if setup:
+        setup()
+    fn()  # calentamiento
+
+    timings = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = np.asarray(timings)
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+    total = timings.sum()
+    return {
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'ops_per_s': round(len(timings) / total, 1) if total else None,
+        'items_per_s': round(len(timings) * items / total) if total else None,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def synthetic_symbols(count=20000):
+    rng = np.random.default_rng(0)
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    words = [
+        'Holdings', 'Corp', 'Energy', 'Capital', 'Systems', 'Pharma', 'Bank', 'Group',
+    ]
+    items = []
+    for i in range(count):
+        symbol = ''.join(rng.choice(letters, rng.integers(1, 5)))
+        name = ' '.join(rng.choice(words, 2))
+        items.append({
+            'symbol': f'{symbol}{i}', 'displaySymbol': f'{symbol}{i}',
+            'description': f'{symbol} {name}', 'type': 'Common Stock',
+        })
+    return items
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark sin red (proveedor sintético): latencias p50/p95/p99, memoria '
+        'y throughput de transformaciones, endpoints y WebSocket para varios tamaños.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='5,30,120',
+            help='Días de historia sintética por serie, separados por comas.',
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=20, help='Repeticiones por caso.'
+        )
+        parser.add_argument(
+            '--only', default='transforms,http,ws',
+            help='Grupos a ejecutar: transforms, http, ws.',
+        )
+        parser.add_argument('--json', action='store_true', help='Salida en JSON.')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        groups = {g.strip() for g in options['only'].split(',')}
+        self.iterations = options['iterations']
+        self.results = []
+        self.as_json = options['json']
+
+        if 'http' in groups:
+            # Índice de símbolos sintético: sin snapshot ni refresco desde Finnhub
+            add_symbols(synthetic_symbols())
+
+        # Caché en memoria; los casos del almacén en disco usan un directorio temporal
+        set_bar_store(None)
+
+        # Los print()/logs de las vistas y el consumer no deben ensuciar la tabla
+        logging.disable(logging.WARNING)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for days in sizes:
+                set_provider(SyntheticProvider(days=days, anchor=ANCHOR))
+                get_ohlcv_cache().clear()
+                if 'transforms' in groups:
+                    self.bench_transforms(days)
+                if 'http' in groups:
+                    self.bench_http(days)
+            if 'ws' in groups:
+                self.bench_websocket()
+        logging.disable(logging.NOTSET)
+
+        if self.as_json:
+            self.stdout.write(json.dumps(self.results, indent=2))
+
+    def record(self, case, size, rows, fn, setup=None, items=None):
+        try:
+            stats = measure(fn, self.iterations, setup, items or rows or 1)
+        except Exception as e:
+            self.stderr.write(self.style.WARNING(f'{case} [{size}]: {e}'))
+            return
+        self.report(case, size, rows, stats)
+
+    def report(self, case, size, rows, stats):
+        self.results.append({'case': case, 'size': size, 'rows': rows, **stats})
+        if not self.as_json:
+            self.stdout.write(
+                f"{case:<38} {size:>10} {rows:>8}  "
+                f"p50 {stats['p50_ms']:>9.3f}ms  p95 {stats['p95_ms']:>9.3f}ms  "
+                f"p99 {stats['p99_ms']:>9.3f}ms  {stats['items_per_s']:>10}/s  "
+                f"{stats['peak_kib']:>10} KiB"
+            )
+
+    def bench_transforms(self, days):
+        size = f'{days}d'
+        bases = {
+            base: download_ohlcv(TICKER, params) for base, params in BASE_SERIES.items()
+        }
+
+        for base, frame in bases.items():
+            self.record(f'base_arrays {base}', size, len(frame),
+                        lambda frame=frame: base_arrays(frame))
+
+        five = bases['5m']
+        self.record('aggregate_cst_onehour_first_halfhour', size, len(five),
+                    lambda: aggregate_cst_onehour_first_halfhour(five))
+
+        for period, spec in PERIOD_SPECS.items():
+            base = bases[spec.base]
+            self.record(f'derive_period {period}', size, len(base),
+                        lambda base=base, spec=spec: derive_period(base, spec))
+
+        series = derive_period(bases['1m'], PERIOD_SPECS['1m'])
+        for renderer_class in SERIES_RENDERERS:
+            renderer = renderer_class()
+            self.record(f'render {renderer.format}', size, len(series),
+                        lambda renderer=renderer: renderer.render(series))
+        for mode in ('ohlc', 'line'):
+            self.record(f'downsample {mode} 1000', size, len(series),
+                        lambda mode=mode: downsample(series, 1000, mode))
+
+    def bench_http(self, days):
+        size = f'{days}d'
+        client = Client(HTTP_HOST='localhost')
+        cache = get_ohlcv_cache()
+
+        def get(path, **params):
+            response = client.get(path, params)
+            if response.status_code != 200:
+                raise RuntimeError(f'{path} -> HTTP {response.status_code}')
+            return response
+
+        for period in PERIOD_SPECS:
+            response = get('/api/market-data', period=period, format='columns')
+            rows = len(json.loads(response.content)['time'])
+            self.record(f'GET market-data {period} (cold)', size, rows,
+                        lambda period=period: get('/api/market-data', period=period),
+                        setup=cache.clear)
+            self.record(f'GET market-data {period} (warm)', size, rows,
+                        lambda period=period: get('/api/market-data', period=period))
+            self.record(f'GET market-data {period} columns', size, rows,
+                        lambda period=period: get('/api/market-data', period=period,
+                                                  format='columns'))
+
+        with tempfile.TemporaryDirectory() as root:
+            set_bar_store(BarStore(root))
+            try:
+                for period in PERIOD_SPECS:
+                    # Primera petición: descarga y escritura en el almacén
+                    response = get('/api/market-data', period=period, format='columns')
+                    rows = len(json.loads(response.content)['time'])
+                    request = functools.partial(get, '/api/market-data', period=period)
+                    # Instancia nueva: sin mapas abiertos (las páginas siguen en la
+                    # caché del SO)
+                    self.record(f'GET market-data {period} (store)', size, rows,
+                                request, setup=lambda: set_bar_store(BarStore(root)))
+                    self.record(f'GET market-data {period} (store, mapped)', size, rows,
+                                request)
+            finally:
+                set_bar_store(None)
+
+        watchlist = settings.REPORTS_WATCHLIST
+        self.record(
+            'reports fetch + build (live)', size, len(watchlist),
+            lambda: build_response([
+                (d['symbol'], d['upcoming'], d['history'])
+                for d in fetch_earnings_concurrently(watchlist, ANCHOR)[0]
+            ]),
+        )
+        self.record('GET reports', size, len(watchlist), lambda: get('/api/reports/'))
+
+        index_size = len(get_symbol_index())
+        for query in ('AB', 'energy', 'holdngs'):
+            self.record(f'GET symbol-search q={query}', size, index_size,
+                        lambda query=query: get('/api/symbol-search', q=query), items=1)
+
+    def bench_websocket(self, subscribers=(1, 10, 100), messages=200):
+        """
+        Latencia group_send → recepción por cliente, con la capa en memoria.
+        Los mensajes se espacian según WS_MAX_RATE para no medir la conflación.
+        """
+        channel_layers.set('default', InMemoryChannelLayer())
+        set_bar_buffer(InMemoryBarBuffer())
+        application = URLRouter(websocket_urlpatterns)
+        path = f'/ws/ticks/{TICKER}/?max_rate={settings.WS_MAX_RATE:g}'
+        spacing = 1 / settings.WS_MAX_RATE
+
+        async def run(count):
+            clients = [WebsocketCommunicator(application, path) for _ in range(count)]
+            for communicator in clients:
+                connected, _ = await communicator.connect()
+                assert connected
+                await communicator.receive_from(timeout=5)  # snapshot
+            layer = channel_layers['default']
+
+            timings = []
+            tracemalloc.start()
+            for i in range(messages):
+                await asyncio.sleep(spacing)
+                sent = time.perf_counter()
+                await layer.group_send(f'ticker_{TICKER}', update_event(
+                    {'time': 1_700_000_000 + i, 'open': 1.0, 'high': 1.0,
+                     'low': 1.0, 'close': 1.0, 'volume': 1},
+                ))
+                for communicator in clients:
+                    await communicator.receive_from(timeout=5)
+                timings.append(time.perf_counter() - sent)
+            total = sum(timings)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            for communicator in clients:
+                await communicator.disconnect()
+            return np.asarray(timings), total, peak
+
+        for count in subscribers:
+            try:
+                timings, total, peak = asyncio.run(run(count))
+            except Exception as e:
+                self.stderr.write(self.style.WARNING(f'websocket [{count}]: {e}'))
+                continue
+            p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+            stats = {
+                'p50_ms': round(p50, 3), 'p95_ms': round(p95, 3),
+                'p99_ms': round(p99, 3),
+                'ops_per_s': round(messages / total, 1),
+                'items_per_s': round(messages * count / total),
+                'peak_kib': round(peak / 1024, 1),
+            }
+            self.report('ws group_send -> receive', f'{count} clients', messages, stats)
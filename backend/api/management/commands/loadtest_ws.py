@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import resource
+import time
+import tracemalloc
+from datetime import datetime
+
+import msgpack
+import numpy as np
+from channels.layers import InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.livebuffer import InMemoryBarBuffer, set_bar_buffer
+from api.providers import SyntheticProvider, split_download
+from api.routing import websocket_urlpatterns
+from api.simulator import CandleSeries, MarketSimulator, TickStream
+from api.wire import MSGPACK_SUBPROTOCOL
+
+# Fecha fija: los datos sintéticos son idénticos entre ejecuciones
+ANCHOR = datetime(2025, 6, 27)
+# Conexiones abiertas / cerradas a la vez
+CONNECT_BATCH = 200
+
+
+class LoadTestChannelLayer(InMemoryChannelLayer):
+    """
+    InMemoryChannelLayer scans every channel and group for expired messages
+    on each receive, O(connections) per delivery, which at thousands of
+    connections would be the bottleneck being measured. Here the scan runs
+    at most once per second; sends and group fan-out are unchanged.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.next_clean = 0.0
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now >= self.next_clean:
+            self.next_clean = now + 1
+            super()._clean_expired()
+
+
+class Client:
+    """Simulated WebSocket client: records the delivery latency of every frame."""
+
+    def __init__(self, application, path, symbol, binary, endpoint):
+        subprotocols = [MSGPACK_SUBPROTOCOL] if binary else None
+        self.communicator = WebsocketCommunicator(
+            application, path, subprotocols=subprotocols
+        )
+        self.symbol = symbol
+        self.binary = binary
+        self.endpoint = endpoint
+        self.latencies = []
+        self.frames = 0
+        self.bytes = 0
+
+    def decode(self, message):
+        if self.binary:
+            data = message['bytes']
+            self.bytes += len(data)
+            return msgpack.unpackb(data)
+        self.bytes += len(message['text'])
+        return json.loads(message['text'])
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect(timeout=30)
+        if not connected:
+            raise CommandError(f'Conexión rechazada ({self.symbol})')
+        if self.endpoint == 'stream':
+            subscribe = {'type': 'subscribe', 'tickers': [self.symbol]}
+            if self.binary:
+                await self.communicator.send_to(bytes_data=msgpack.packb(subscribe))
+            else:
+                await self.communicator.send_to(text_data=json.dumps(subscribe))
+            await self.communicator.receive_output(timeout=30)  # subscriptions
+        await self.communicator.receive_output(timeout=30)  # snapshot
+
+    async def listen(self):
+        while True:
+            message = await self.communicator.receive_output(timeout=None)
+            if message['type'] != 'websocket.send':
+                return
+            frame = self.decode(message)
+            received = time.time()
+            payload = frame.get('payload') if isinstance(frame, dict) else None
+            if payload and 'ts' in payload:
+                self.latencies.append(received - payload['ts'])
+            self.frames += 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de WebSocket en proceso y sin red: miles de clientes '
+        'simulados sobre muchos tickers, latencia publicación → entrega '
+        'p50/p99/p999, mensajes por segundo y memoria por conexión.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients', type=int, default=1000, help='Conexiones simuladas.'
+        )
+        parser.add_argument(
+            '--tickers', type=int, default=50,
+            help='Tickers distintos; los clientes se reparten entre ellos.',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=10,
+            help='Ticks publicados por segundo y ticker.',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10, help='Segundos de publicación.'
+        )
+        parser.add_argument(
+            '--max-rate', type=float, default=None,
+            help='?max_rate de cada cliente (por defecto WS_MAX_RATE).',
+        )
+        parser.add_argument(
+            '--endpoint', choices=['ticks', 'stream'], default='ticks',
+            help=(
+                'ticks: ws/ticks/<ticker>/ (TickerConsumer). '
+                'stream: ws/stream/ con una suscripción.'
+            ),
+        )
+        parser.add_argument(
+            '--protocol', choices=['json', 'msgpack'], default='json',
+            help='Formato de los frames (subprotocolo).',
+        )
+        parser.add_argument(
+            '--layer', choices=['memory', 'redis'], default='memory',
+            help=(
+                'memory: capa en memoria del proceso. '
+                'redis: CHANNEL_LAYERS de settings (Redis local).'
+            ),
+        )
+        parser.add_argument('--json', action='store_true', help='Salida en JSON.')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['tickers'] < 1 or options['rate'] <= 0:
+            raise CommandError('--clients, --tickers y --rate deben ser mayores que 0.')
+
+        if options['layer'] == 'memory':
+            channel_layers.set('default', LoadTestChannelLayer())
+        set_bar_buffer(InMemoryBarBuffer())
+
+        # Los logs del consumer (conexiones, desconexiones) no deben ensuciar
+        # el resultado
+        logging.disable(logging.WARNING)
+        try:
+            stats = asyncio.run(self.run(options))
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+        self.stdout.write(
+            f"{stats['clients']} clientes, {stats['tickers']} tickers, "
+            f"{stats['published']} mensajes publicados en {stats['duration_s']}s "
+            f"({stats['late']} retrasos del publicador)"
+        )
+        self.stdout.write(
+            f"entregados {stats['frames']} frames ({stats['frames_per_s']}/s, "
+            f"{stats['mib_per_s']} MiB/s)"
+        )
+        self.stdout.write(
+            f"latencia p50 {stats['p50_ms']}ms  p99 {stats['p99_ms']}ms  "
+            f"p999 {stats['p999_ms']}ms  máx {stats['max_ms']}ms"
+        )
+        self.stdout.write(
+            f"memoria {stats['kib_per_connection']} KiB/conexión, "
+            f"RSS máx del proceso {stats['max_rss_mib']} MiB"
+        )
+
+    def load_streams(self, tickers: int, rate: float):
+        symbols = [f'T{i:04d}' for i in range(tickers)]
+        data = SyntheticProvider(anchor=ANCHOR).download(
+            symbols, period='1y', interval='1d'
+        )
+        return [
+            TickStream(0.0, symbol, 1 / rate, CandleSeries.from_frame(symbol, frame))
+            for symbol, frame in split_download(data, symbols).items()
+        ]
+
+    async def run(self, options):
+        streams = self.load_streams(options['tickers'], options['rate'])
+        symbols = [stream.symbol for stream in streams]
+        max_rate = options['max_rate'] or settings.WS_MAX_RATE
+        binary = options['protocol'] == 'msgpack'
+        application = URLRouter(websocket_urlpatterns)
+
+        def path(symbol):
+            route = f'ticks/{symbol}' if options['endpoint'] == 'ticks' else 'stream'
+            return f'/ws/{route}/?max_rate={max_rate:g}'
+
+        clients = []
+        for i in range(options['clients']):
+            symbol = symbols[i % len(symbols)]
+            clients.append(
+                Client(application, path(symbol), symbol, binary, options['endpoint'])
+            )
+
+        # 1. Memoria de las conexiones abiertas (y sus snapshots), sin tráfico
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        for i in range(0, len(clients), CONNECT_BATCH):
+            await asyncio.gather(*(c.connect() for c in clients[i:i + CONNECT_BATCH]))
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # 2. Publicación a la tasa pedida mientras todos los clientes escuchan
+        listeners = [asyncio.create_task(c.listen()) for c in clients]
+        simulator = MarketSimulator(channel_layers['default'], streams, seed=0)
+        # Primer bloque de ticks de cada ticker generado antes de medir
+        for stream in streams:
+            stream.next_message(simulator.rng)
+            stream.position = 0
+        started = time.perf_counter()
+        await simulator.run(duration=options['duration'])
+        # Margen para los frames en cola y los envíos diferidos por la conflación
+        await asyncio.sleep(2 / max_rate + 0.5)
+        elapsed = time.perf_counter() - started
+
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        for i in range(0, len(clients), CONNECT_BATCH):
+            await asyncio.gather(
+                *(c.communicator.disconnect() for c in clients[i:i + CONNECT_BATCH]),
+                return_exceptions=True,
+            )
+
+        latencies = np.concatenate([np.asarray(c.latencies) for c in clients]) * 1000
+        frames = sum(c.frames for c in clients)
+        if len(latencies):
+            p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9])
+            worst = latencies.max()
+        else:
+            p50 = p99 = p999 = worst = float('nan')
+        return {
+            'clients': len(clients),
+            'tickers': len(streams),
+            'endpoint': options['endpoint'],
+            'protocol': options['protocol'],
+            'layer': options['layer'],
+            'duration_s': round(elapsed, 2),
+            'published': simulator.sent,
+            'late': simulator.late,
+            'frames': frames,
+            'frames_per_s': round(frames / elapsed),
+            'mib_per_s': round(sum(c.bytes for c in clients) / elapsed / 2**20, 2),
+            'p50_ms': round(p50, 3),
+            'p99_ms': round(p99, 3),
+            'p999_ms': round(p999, 3),
+            'max_ms': round(worst, 3),
+            'kib_per_connection': round((after - before) / len(clients) / 1024, 1),
+            # ru_maxrss en KiB en Linux
+            'max_rss_mib': round(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+            ),
+        }
@@ -0,0 +1,52 @@
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.reports import fetch_earnings_concurrently, store_earnings
+
+
+class Command(BaseCommand):
+    help = (
+        'Descarga los reportes de ganancias de la watchlist y los guarda en la '
+        'base de datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Segundos entre refrescos. 0 = refrescar una sola vez y salir.',
+        )
+        parser.add_argument(
+            '--symbols', default='',
+            help='Lista separada por comas (por defecto REPORTS_WATCHLIST).',
+        )
+
+    def handle(self, *args, **options):
+        symbols = [
+            s.strip().upper() for s in options['symbols'].split(',') if s.strip()
+        ]
+        symbols = symbols or settings.REPORTS_WATCHLIST
+        interval = options['interval']
+
+        while True:
+            self.refresh(symbols)
+            if interval <= 0:
+                break
+            time.sleep(interval)
+
+    def refresh(self, symbols):
+        started = time.monotonic()
+        self.stdout.write(self.style.HTTP_INFO(
+            f'Refrescando reportes de {len(symbols)} símbolos...'
+        ))
+        results, failed = fetch_earnings_concurrently(symbols, datetime.now())
+        store_earnings(results)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} símbolos guardados en {elapsed:.1f}s.'
+        ))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Fallaron: {", ".join(failed)}'))
@@ -1,83 +1,197 @@
 import asyncio
 import os
-import random
 import time
-import pandas as pd
-import yfinance as yf
-from django.core.management.base import BaseCommand
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from channels.layers import get_channel_layer
 
+from api.aggregator import LiveBarAggregator, interval_template
+from api.indicators import parse_indicators
+from api.livebuffer import get_bar_buffer
+from api.providers import split_download
+from api.simulator import CandleSeries, MarketSimulator, TickerStream, TickStream
+from api.upstream import get_upstream_client
+
+
+def parse_rates(value: str) -> dict:
+    """'SPY=5,QQQ=0.5' → {'SPY': 5.0, 'QQQ': 0.5}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        symbol, _, rate = item.partition('=')
+        try:
+            rates[symbol.strip().upper()] = float(rate)
+        except ValueError:
+            raise CommandError(
+                f"Tasa inválida: '{item}' (formato TICKER=velas_por_segundo)"
+            )
+    return rates
+
 
 class Command(BaseCommand):
-    help = 'Inicia un simulador de mercado realista basado en datos históricos de ticker seleccionado.'
+    help = (
+        'Inicia un simulador de mercado realista basado en datos históricos de '
+        'los tickers seleccionados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tickers', default=os.environ.get('TICKER_SYMBOL', 'SPY'),
+            help='Tickers separados por comas (por defecto TICKER_SYMBOL o SPY).',
+        )
+        parser.add_argument(
+            '--mode', choices=['candles', 'ticks'], default='candles',
+            help=(
+                'candles: una vela completa por mensaje. '
+                'ticks: operaciones sintéticas dentro de cada vela.'
+            ),
+        )
+        parser.add_argument(
+            '--ticks-per-bar', type=int, default=100,
+            help='Operaciones sintéticas por vela en modo ticks (mínimo 4).',
+        )
+        parser.add_argument(
+            '--intervals', default=','.join(settings.WS_INTERVALS),
+            help=(
+                'Intervalos agregados en vivo a partir de los ticks '
+                '(modo ticks; vacío = ninguno).'
+            ),
+        )
+        parser.add_argument(
+            '--indicators', default=settings.WS_INDICATORS,
+            help=(
+                'Indicadores calculados en vivo con cada intervalo, '
+                'p. ej. sma:20,rsi:14,vwap (modo ticks).'
+            ),
+        )
+        parser.add_argument(
+            '--rate', type=float, default=1.0,
+            help=(
+                'Mensajes por segundo de cada ticker: velas, o ticks en modo ticks '
+                '(por defecto 1).'
+            ),
+        )
+        parser.add_argument(
+            '--rates', default='',
+            help='Tasas por ticker, p. ej. SPY=5,QQQ=0.5 (sobrescriben --rate).',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=100,
+            help='Máximo de group_send simultáneos hacia la capa de canales.',
+        )
+        parser.add_argument(
+            '--report-every', type=float, default=10,
+            help='Segundos entre resúmenes de mensajes enviados (0 = sin resumen).',
+        )
 
     def handle(self, *args, **options):
-        ticker = os.environ.get("TICKER_SYMBOL", "SPY")
-        self.stdout.write(self.style.SUCCESS('Iniciando simulador de mercado realista...'))
-        asyncio.run(self.start_simulation(ticker))
-
-    async def start_simulation(self, ticker: str):
-        channel_layer = get_channel_layer()
-
-        while True:  # Loop infinito de simulación
-            self.stdout.write(self.style.HTTP_INFO(f'Descargando datos históricos de {ticker} (último año)...'))
-
-            # 1. Descargar datos históricos reales de ticker para el último año
-            spy_data = yf.download(ticker, period='1y', interval='1d')
-
-            if spy_data.empty:
-                self.stdout.write(self.style.ERROR('No se pudieron descargar los datos. Reintentando en 30 segundos...'))
-                await asyncio.sleep(30)
-                continue
-
-            # 2. Preparar los datos
-            spy_data.reset_index(inplace=True)
-
-            # Aplanar columnas si es MultiIndex
-            if isinstance(spy_data.columns, pd.MultiIndex):
-                spy_data.columns = spy_data.columns.get_level_values(0)
-
-            # Pasar nombres a minúsculas
-            spy_data.columns = spy_data.columns.str.lower()
-
-            # Asegurar numéricos en OHLC
-            for col in ['open', 'high', 'low', 'close']:
-                if col in spy_data.columns:
-                    spy_data[col] = pd.to_numeric(spy_data[col], errors='coerce')
-
-            # Convertir fecha a timestamp (UTC en segundos)
-            spy_data['timestamp'] = spy_data['date'].apply(lambda date: int(time.mktime(date.timetuple())))
-
-            self.stdout.write(self.style.SUCCESS(f'Datos descargados. Iniciando replay de {len(spy_data)} velas...'))
-
-            # 3. Iterar sobre los datos históricos y enviarlos
-            for _, row in spy_data.iterrows():
-                # Simular "jitter" sobre el precio de cierre
-                jitter = random.uniform(-0.0005, 0.0005)
-                live_close_price = round(row['close'] * (1 + jitter), 2)
-
-                # Construir objeto de la vela
-                candle_data = {
-                    'time': row['timestamp'],
-                    'open': round(row['open'], 2),
-                    'high': round(max(row['high'], live_close_price), 2),
-                    'low': round(min(row['low'], live_close_price), 2),
-                    'close': live_close_price,
-                    'volume': int(row['volume']) if 'volume' in row else 0
-                }
-
-                # Enviar al grupo del ticker
-                await channel_layer.group_send(
-                    f'ticker_{ticker}',
-                    {
-                        'type': 'ticker_update',
-                        'message': candle_data
-                    }
-                )
-
-                #print(f"Sent candle: {candle_data}")
-
-                # Esperar 1 segundo antes de la siguiente vela
-                await asyncio.sleep(1)
-
-            self.stdout.write(self.style.WARNING('Replay del año completado. Reiniciando...'))
+        tickers = [
+            t.strip().upper() for t in options['tickers'].split(',') if t.strip()
+        ]
+        rates = parse_rates(options['rates'])
+        rates = {ticker: rates.get(ticker, options['rate']) for ticker in tickers}
+        if any(rate <= 0 for rate in rates.values()):
+            raise CommandError('Las tasas deben ser mayores que 0.')
+        if options['mode'] == 'ticks' and options['ticks_per_bar'] < 4:
+            raise CommandError('--ticks-per-bar debe ser al menos 4.')
+        intervals = [i.strip() for i in options['intervals'].split(',') if i.strip()]
+        for interval in intervals:
+            try:
+                interval_template(interval)
+            except ValueError:
+                raise CommandError(f"Intervalo no soportado: '{interval}'")
+        try:
+            indicators = parse_indicators(options['indicators'])
+        except ValueError as e:
+            raise CommandError(f'Indicadores inválidos: {e}')
+
+        self.mode = options['mode']
+        self.ticks_per_bar = options['ticks_per_bar']
+        self.intervals = intervals
+        self.indicators = indicators
+        self.stdout.write(
+            self.style.SUCCESS('Iniciando simulador de mercado realista...')
+        )
+        asyncio.run(self.start_simulation(
+            rates, options['concurrency'], options['report_every']
+        ))
+
+    def build_stream(self, symbol: str, rate: float,
+                     series: CandleSeries) -> TickerStream:
+        if self.mode == 'ticks':
+            # Velas 1m/15m/1h/1d en vivo (con sus indicadores), publicadas como
+            # deltas en ticker_<T>_<intervalo>
+            aggregator = None
+            if self.intervals:
+                aggregator = LiveBarAggregator(self.intervals, self.indicators)
+            return TickStream(
+                0.0, symbol, 1 / rate, series,
+                ticks_per_bar=self.ticks_per_bar, aggregator=aggregator,
+            )
+        return TickerStream(0.0, symbol, 1 / rate, series)
+
+    def load_series(self, tickers) -> dict:
+        # 1. Descargar en una sola llamada el último año de todos los tickers
+        data = get_upstream_client().download(
+            tickers, period='1y', interval='1d', group_by='column', progress=False
+        )
+        if data.empty:
+            return {}
+        # 2. Pasar cada ticker a arrays de NumPy una sola vez
+        return {
+            symbol: CandleSeries.from_frame(symbol, frame)
+            for symbol, frame in split_download(data, tickers).items()
+        }
+
+    async def start_simulation(self, rates: dict, concurrency: int,
+                               report_every: float):
+        tickers = list(rates)
+        while True:
+            self.stdout.write(self.style.HTTP_INFO(
+                f'Descargando datos históricos de {len(tickers)} tickers '
+                '(último año)...'
+            ))
+            series = await asyncio.to_thread(self.load_series, tickers)
+            if series:
+                break
+            self.stdout.write(self.style.ERROR(
+                'No se pudieron descargar los datos. Reintentando en 30 segundos...'
+            ))
+            await asyncio.sleep(30)
+
+        missing = sorted(set(tickers) - set(series))
+        if missing:
+            self.stdout.write(
+                self.style.WARNING(f'Sin datos para: {", ".join(missing)}')
+            )
+
+        streams = [
+            self.build_stream(symbol, rates[symbol], candles)
+            for symbol, candles in series.items()
+        ]
+        total_rate = sum(rates[symbol] for symbol in series)
+        unit = 'ticks' if self.mode == 'ticks' else 'velas'
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos descargados. Replay de {len(streams)} tickers a '
+            f'{total_rate:g} {unit}/s en total...'
+        ))
+
+        simulator = MarketSimulator(
+            get_channel_layer(), streams, concurrency=concurrency,
+            buffer=get_bar_buffer(),
+        )
+        if report_every > 0:
+            asyncio.create_task(self.report(simulator, report_every))
+        await simulator.run()
+
+    async def report(self, simulator: MarketSimulator, every: float):
+        last_sent, last_time = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(every)
+            now = time.monotonic()
+            rate = (simulator.sent - last_sent) / (now - last_time)
+            self.stdout.write(
+                f'{simulator.sent} mensajes enviados '
+                f'({rate:.0f}/s, retrasos: {simulator.late})'
+            )
+            last_sent, last_time = simulator.sent, now
@@ -0,0 +1,187 @@
+"""
+Process metrics in the Prometheus text format, served at /metrics.
+
+Counters, gauges and histograms are declared at module level next to the
+code they measure. Gauges and counters may instead take a `callback` that
+reads existing state at scrape time (cache hits, open connections...), so
+the hot path pays nothing for them.
+
+`timed(stage)` measures one stage of a request (upstream fetch, pandas
+transform, rendering): the duration goes to the `app_stage_seconds`
+histogram and, during an HTTP request, to that request's `Server-Timing`
+header (see ServerTimingMiddleware).
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra='') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels=(), callback=None,
+                 registry=REGISTRY):
+        """
+        `callback()` returns the current value, or {label values tuple: value}
+        for labelled metrics; it replaces inc()/set().
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def values(self) -> dict:
+        if self.callback is None:
+            with self._lock:
+                values = dict(self._values)
+            # Sin etiquetas la serie existe desde el arranque (0)
+            return values if values or self.labelnames else {(): 0}
+        value = self.callback()
+        return value if isinstance(value, dict) else {(): value}
+
+    def render(self):
+        for key, value in sorted(self.values().items()):
+            yield f'{self.name}{_labels(self.labelnames, key)} {_number(value)}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS,
+                 registry=REGISTRY):
+        super().__init__(name, help, labels, registry=registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            states = {key: (list(c), s, n) for key, (c, s, n) in self._values.items()}
+        for key, (counts, total, count) in sorted(states.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                bucket = _labels(self.labelnames, key, f'le="{_number(bound)}"')
+                yield f'{self.name}_bucket{bucket} {cumulative}'
+            labels = _labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_number(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+STAGE_SECONDS = Histogram(
+    'app_stage_seconds', 'Time spent in each stage of a request', ['stage'],
+)
+
+# Etapas medidas de la petición HTTP en curso (para Server-Timing)
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def start_request_timings() -> contextvars.Token:
+    return _request_timings.set([])
+
+
+def request_timings(token: contextvars.Token) -> list:
+    """[(stage, seconds)] recorded since `start_request_timings`; ends the request."""
+    timings = _request_timings.get()
+    _request_timings.reset(token)
+    return timings or []
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
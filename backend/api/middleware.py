@@ -0,0 +1,189 @@
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .metrics import (
+    Counter, Histogram, request_timings, start_request_timings, timed,
+)
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Binary formats (msgpack / Arrow) are already compact: only text is compressed
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/vnd.columns+json', 'application/x-ndjson', 'text/',
+)
+MIN_COMPRESS_LENGTH = 200
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by view, method and status',
+    ['view', 'method', 'status'],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by view', ['view'],
+)
+
+
+class ServerTimingMiddleware:
+    """
+    Stage timings of each request (`timed` in api/metrics.py: upstream,
+    transform, render, compress...) as a Server-Timing header, plus request
+    counts and latency histograms for /metrics.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, started = start_request_timings(), time.perf_counter()
+        response = self.get_response(request)
+        timings = request_timings(token)
+        return self.process_response(request, response, timings, started)
+
+    async def __acall__(self, request):
+        token, started = start_request_timings(), time.perf_counter()
+        response = await self.get_response(request)
+        timings = request_timings(token)
+        return self.process_response(request, response, timings, started)
+
+    def process_response(self, request, response, timings, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        HTTP_REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        HTTP_REQUEST_SECONDS.observe(elapsed, view=view)
+
+        # Una entrada por etapa (sumando repeticiones) y el total de la petición
+        stages = {}
+        for stage, seconds in timings:
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        stages['total'] = elapsed
+        response['Server-Timing'] = ', '.join(
+            f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in stages.items()
+        )
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Brotli (when installed) or gzip compression for JSON/text responses,
+    negotiated through Accept-Encoding.
+
+    Streaming responses (ndjson) are compressed as one stream, flushed after
+    every chunk so each one still goes out as soon as it is rendered.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Async views stay on the event loop instead of the sync thread
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    @staticmethod
+    def negotiate(request):
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if response.streaming:
+            return self.compress_stream(request, response)
+        if len(response.content) < MIN_COMPRESS_LENGTH:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request)
+        if encoding is None:
+            return response
+        with timed('compress'):
+            if encoding == 'br':
+                content = brotli.compress(response.content, quality=5)
+            else:
+                content = compress_string(response.content)
+
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compress_stream(self, request, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request)
+        if encoding is None:
+            return response
+        compress, finish = stream_compressor(encoding)
+        if response.is_async:
+            async def content(chunks=response.streaming_content):
+                async for chunk in chunks:
+                    data = compress(chunk)
+                    if data:
+                        yield data
+                yield finish()
+        else:
+            def content(chunks=response.streaming_content):
+                for chunk in chunks:
+                    data = compress(chunk)
+                    if data:
+                        yield data
+                yield finish()
+        response.streaming_content = content()
+        if response.has_header('Content-Length'):
+            del response['Content-Length']
+        response['Content-Encoding'] = encoding
+        return response
+
+
+def stream_compressor(encoding: str):
+    """
+    (compress, finish) for a streamed body: `compress(chunk)` returns the
+    chunk's compressed bytes flushed to a byte boundary, `finish()` the end
+    of the stream. The compression context is kept across chunks.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        return (
+            lambda chunk: compressor.process(chunk) + compressor.flush(),
+            compressor.finish,
+        )
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (
+        lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
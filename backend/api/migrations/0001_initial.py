@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningsReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=16)),
+                ('date', models.DateField()),
+                ('eps_estimate', models.FloatField(null=True)),
+                ('eps_actual', models.FloatField(null=True)),
+                ('surprise_percent', models.FloatField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['symbol', '-date'],
+                'indexes': [models.Index(fields=['symbol', '-date'], name='earnings_symbol_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('symbol', 'date'), name='unique_earnings_report')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UpcomingEarnings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=16, unique=True)),
+                ('date', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['symbol', 'date'], name='upcoming_symbol_date_idx')],
+            },
+        ),
+    ]
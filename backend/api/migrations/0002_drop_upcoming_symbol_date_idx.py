@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='upcomingearnings',
+            name='upcoming_symbol_date_idx',
+        ),
+    ]
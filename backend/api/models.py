@@ -1,3 +1,40 @@
 from django.db import models
 
-# Create your models here.
+
+class EarningsReport(models.Model):
+    """Reporte de ganancias ya publicado (EPS estimado vs. real)."""
+
+    symbol = models.CharField(max_length=16)
+    date = models.DateField()
+    eps_estimate = models.FloatField(null=True)
+    eps_actual = models.FloatField(null=True)
+    surprise_percent = models.FloatField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol', '-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['symbol', 'date'], name='unique_earnings_report'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['symbol', '-date'], name='earnings_symbol_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} {self.date}"
+
+
+class UpcomingEarnings(models.Model):
+    """Próxima fecha de reporte de ganancias de un símbolo."""
+
+    symbol = models.CharField(max_length=16, unique=True)
+    date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.symbol} {self.date}"
@@ -0,0 +1,214 @@
+"""
+Market-data providers.
+
+Everything that talks to Yahoo goes through the provider selected by
+settings.MARKET_DATA_PROVIDER (a dotted path):
+
+- YahooProvider: the real thing (yfinance).
+- SyntheticProvider: deterministic, offline OHLCV in the same shape as
+  `yf.download` (MultiIndex columns, 'Datetime'/'Date' index), with
+  configurable size and sessions. Used by the benchmark command and for
+  local development without network.
+"""
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .cache import period_to_timedelta
+
+INTERVAL_MINUTES = {
+    '1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90, '1h': 60,
+}
+DAILY_FREQ = {'1d': 'B', '5d': '5B', '1wk': 'W-MON', '1mo': 'MS'}
+INTRADAY_HISTORY_DAYS = 60
+YF_COLUMNS = ['Adj Close', 'Close', 'High', 'Low', 'Open', 'Volume']
+
+
+class MarketDataProvider:
+    """Interface: `download` mirrors yf.download, `ticker` mirrors yf.Ticker."""
+
+    def download(self, tickers, period=None, interval='1d', start=None, **kwargs):
+        raise NotImplementedError
+
+    def ticker(self, symbol: str):
+        raise NotImplementedError
+
+
+class YahooProvider(MarketDataProvider):
+    def download(self, tickers, period=None, interval='1d', start=None, **kwargs):
+        if start is None:
+            kwargs['period'] = period
+        else:
+            kwargs['start'] = start
+        return yf.download(tickers, interval=interval, **kwargs)
+
+    def ticker(self, symbol: str):
+        return yf.Ticker(symbol)
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Random-walk OHLCV, seeded by (ticker, interval) so the same request
+    always returns the same bars.
+
+    - session: regular hours in `tz` for intraday bars (weekdays only)
+    - days: overrides the history length for every period (benchmark sizes);
+      otherwise intraday bars cover INTRADAY_HISTORY_DAYS and daily bars
+      `max_history_days`, and `period` picks the tail of that history
+    - anchor: last session day (defaults to today)
+    """
+
+    def __init__(self, tz='America/New_York', session_open='09:30',
+                 session_close='16:00', days=None, anchor=None,
+                 max_history_days=365 * 30):
+        self.tz = tz
+        self.session_open = pd.Timedelta(f'{session_open}:00')
+        self.session_close = pd.Timedelta(f'{session_close}:00')
+        self.days = days
+        self.anchor = pd.Timestamp(anchor or datetime.now().date())
+        self.max_history_days = max_history_days
+        self._indexes = {}
+
+    def _index(self, interval: str) -> pd.DatetimeIndex:
+        """Full history for `interval`; periods and tail refreshes are slices of it."""
+        # Business-day ranges are slow to build: one per interval is enough
+        index = self._indexes.get(interval)
+        if index is None:
+            index = self._indexes[interval] = self._build_index(interval)
+        return index
+
+    def _build_index(self, interval: str) -> pd.DatetimeIndex:
+        if interval in DAILY_FREQ:
+            days = self.days or self.max_history_days
+            return pd.date_range(
+                self.anchor - pd.Timedelta(days=days), self.anchor,
+                freq=DAILY_FREQ[interval], name='Date', unit='ns',
+            )
+
+        days = self.days or INTRADAY_HISTORY_DAYS
+        step = pd.Timedelta(minutes=INTERVAL_MINUTES[interval])
+        sessions = pd.bdate_range(self.anchor - pd.Timedelta(days=days), self.anchor)
+        offsets = np.arange(
+            self.session_open.value, self.session_close.value, step.value
+        )
+        stamps = (sessions.as_unit('ns').asi8[:, None] + offsets[None, :]).ravel()
+        index = pd.DatetimeIndex(stamps.view('M8[ns]')).tz_localize(self.tz)
+        index.name = 'Datetime'
+        return index
+
+    def frame(self, symbol: str, interval: str = '1d', period=None, start=None):
+        """Single-ticker frame with flat yfinance column names."""
+        index = self._index(interval)
+        n = len(index)
+        rng = np.random.default_rng(zlib.crc32(f'{symbol}|{interval}'.encode()))
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.002, n)))
+        open_ = np.r_[close[:1], close[:-1]] * (1 + rng.normal(0, 0.0005, n))
+        spread = np.abs(rng.normal(0, 0.001, n)) * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        volume = rng.integers(1_000, 1_000_000, n)
+        data = pd.DataFrame({
+            'Adj Close': close, 'Close': close, 'High': high,
+            'Low': low, 'Open': open_, 'Volume': volume,
+        }, index=index)[YF_COLUMNS]
+
+        window = None
+        if start is None and self.days is None:
+            window = period_to_timedelta(period)
+        if window is not None:
+            start = self.anchor + pd.Timedelta(days=1) - window
+        if start is not None:
+            start = pd.Timestamp(start)
+            if index.tz is None:
+                start = start.tz_localize(None).normalize()
+            elif start.tzinfo is None:
+                start = start.tz_localize('UTC')
+            data = data[index >= start]
+        return data
+
+    def download(self, tickers, period=None, interval='1d', start=None, **kwargs):
+        symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+        frames = {s: self.frame(s, interval, period, start) for s in symbols}
+        # Same layout as yf.download: (Price, Ticker) column MultiIndex
+        data = pd.concat(frames, axis=1, names=['Ticker', 'Price'])
+        return data.swaplevel(0, 1, axis=1)
+
+    def ticker(self, symbol: str):
+        return SyntheticTicker(symbol, self.anchor)
+
+
+class SyntheticTicker:
+    """Minimal yf.Ticker stand-in for the earnings reports."""
+
+    calendar = None
+
+    def __init__(self, symbol: str, anchor: pd.Timestamp):
+        self.symbol = symbol
+        self._seed = zlib.crc32(symbol.encode())
+        self._anchor = anchor
+
+    @property
+    def info(self):
+        upcoming = self._anchor + timedelta(days=self._seed % 90 + 1)
+        return {'symbol': self.symbol, 'earningsTimestamp': int(upcoming.timestamp())}
+
+    @property
+    def earnings_dates(self):
+        rng = np.random.default_rng(self._seed)
+        index = pd.date_range(
+            end=self._anchor, periods=12, freq='QS', tz='America/New_York'
+        )
+        estimate = rng.uniform(0.5, 3.0, len(index))
+        return pd.DataFrame({
+            'EPS Estimate': estimate,
+            'Reported EPS': estimate * rng.uniform(0.85, 1.2, len(index)),
+        }, index=index)
+
+
+def split_download(data: pd.DataFrame, tickers=()) -> dict:
+    """
+    Grouped `yf.download` frame ((Price, Ticker) columns) → {symbol: frame}.
+    Some yfinance versions return flat columns when a single ticker was
+    requested: pass the requested `tickers` so that frame is accepted too.
+    """
+    if not isinstance(data.columns, pd.MultiIndex):
+        if isinstance(tickers, str):
+            tickers = tickers.split()
+        if len(tickers) != 1:
+            raise ValueError(
+                'Expected a grouped download with (Price, Ticker) columns.'
+            )
+        frame = data.dropna(how='all')
+        return {tickers[0]: frame} if frame['Close'].notna().any() else {}
+    frames = {}
+    for symbol in data.columns.get_level_values(-1).unique():
+        # Filas de otros tickers (fechas sin datos de este) fuera
+        frame = data.xs(symbol, axis=1, level=-1).dropna(how='all')
+        if frame['Close'].notna().any():
+            frames[symbol] = frame
+    return frames
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> MarketDataProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = import_string(settings.MARKET_DATA_PROVIDER)()
+    return _provider
+
+
+def set_provider(provider: MarketDataProvider):
+    """Swap the active provider (benchmarks, local development)."""
+    global _provider
+    _provider = provider
@@ -0,0 +1,207 @@
+"""
+Renderers for OHLCV series.
+
+Views hand a DataFrame to `Response`; the renderer picked by DRF's content
+negotiation (Accept header or ?format=) serializes it straight from the
+column arrays:
+
+    records  application/json                     [{"time":..,"open":..}, ...]
+    columns  application/vnd.columns+json         {"time":[..],"open":[..]}
+    msgpack  application/msgpack                  columns, msgpack encoded
+    arrow    application/vnd.apache.arrow.stream  Arrow IPC stream (needs pyarrow)
+
+Streaming formats send the series in chunks of MARKET_DATA_STREAM_CHUNK
+bars, each converted only when the client is ready for it (see
+AsyncAPIView), so long histories start arriving at once and the
+serialized response is never held in memory whole:
+
+    ndjson          application/x-ndjson             one columns object per line
+    msgpack-stream  application/vnd.msgpack-stream   4-byte big-endian length
+                                                     + msgpack columns
+
+ndjson is compressed on the fly by CompressionMiddleware, one flush per
+chunk.
+
+DataFrames nested in dicts (the batch endpoint's {"series": {ticker: df}})
+are converted the same way; Arrow puts them in one long table with a
+`ticker` column. Plain dicts/lists (errors, non-series payloads) are
+rendered as usual; in the streaming formats they are a single chunk, and
+the batch payload is its metadata chunk followed by each ticker's chunks
+(with a `ticker` field).
+"""
+import json
+import struct
+
+import msgpack
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional dependency
+    pa = None
+
+
+def _value_list(values: np.ndarray) -> list:
+    if values.dtype.kind == 'f':
+        nan = np.isnan(values)
+        if nan.any():
+            values = np.where(nan, None, values)
+    return values.tolist()
+
+
+def column_lists(df: pd.DataFrame) -> dict:
+    """DataFrame → {column: list}, with NaN as None so it stays valid JSON."""
+    return {str(name): _value_list(df[name].to_numpy()) for name in df.columns}
+
+
+def column_chunks(df: pd.DataFrame, rows: int):
+    """`column_lists` of each run of `rows` bars, converted one chunk at a time."""
+    arrays = {str(name): df[name].to_numpy() for name in df.columns}
+    for start in range(0, len(df), rows):
+        yield {
+            name: _value_list(values[start:start + rows])
+            for name, values in arrays.items()
+        }
+
+
+def record_lists(df: pd.DataFrame) -> list:
+    columns = column_lists(df)
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def convert_frames(data, convert):
+    """`convert` every DataFrame in `data`, at the top level or inside dicts."""
+    if isinstance(data, pd.DataFrame):
+        return convert(data)
+    if isinstance(data, dict):
+        return {key: convert_frames(value, convert) for key, value in data.items()}
+    return data
+
+
+class RecordsJSONRenderer(JSONRenderer):
+    """Row-oriented JSON, the historical format of /api/market-data."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = convert_frames(data, record_lists)
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class ColumnarJSONRenderer(BaseRenderer):
+    media_type = 'application/vnd.columns+json'
+    format = 'columns'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = convert_frames(data, column_lists)
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+class MsgpackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = convert_frames(data, column_lists)
+        return msgpack.packb(data, use_bin_type=True)
+
+
+class ArrowRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, pd.DataFrame):
+            table = pa.Table.from_pandas(data, preserve_index=False)
+        elif isinstance(data, dict) and isinstance(data.get('series'), dict):
+            table = self.long_table(data)
+        elif isinstance(data, dict):
+            table = pa.Table.from_pylist([data])
+        else:
+            table = pa.Table.from_pylist(list(data))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def long_table(data: dict):
+        """{ticker: df} series as one table with a leading `ticker` column;
+        the other keys go to the schema metadata as JSON."""
+        frames = [df.assign(ticker=ticker) for ticker, df in data['series'].items()]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            df = df[['ticker', *df.columns.drop('ticker')]]
+        else:
+            df = pd.DataFrame({'ticker': []})
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = {
+            key: json.dumps(value) for key, value in data.items() if key != 'series'
+        }
+        return table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), **metadata}
+        )
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Base of the chunked formats: `render_chunks` yields the encoded chunks
+    and AsyncAPIView sends them as a streaming response.
+    """
+    charset = None
+    streaming = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.render_chunks(data, accepted_media_type, renderer_context))
+
+    def render_chunks(self, data, accepted_media_type=None,
+                      renderer_context=None):
+        rows = settings.MARKET_DATA_STREAM_CHUNK
+        if isinstance(data, pd.DataFrame):
+            for chunk in column_chunks(data, rows):
+                yield self.encode(chunk)
+        elif isinstance(data, dict) and isinstance(data.get('series'), dict):
+            yield self.encode(
+                {key: value for key, value in data.items() if key != 'series'}
+            )
+            for ticker, df in data['series'].items():
+                for chunk in column_chunks(df, rows):
+                    yield self.encode({'ticker': ticker, **chunk})
+        else:
+            yield self.encode(data)
+
+    def encode(self, chunk) -> bytes:
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def encode(self, chunk) -> bytes:
+        return json.dumps(chunk, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class MsgpackStreamRenderer(StreamingRenderer):
+    media_type = 'application/vnd.msgpack-stream'
+    format = 'msgpack-stream'
+    render_style = 'binary'
+
+    def encode(self, chunk) -> bytes:
+        payload = msgpack.packb(chunk, use_bin_type=True)
+        return struct.pack('>I', len(payload)) + payload
+
+
+SERIES_RENDERERS = [
+    RecordsJSONRenderer, ColumnarJSONRenderer, MsgpackRenderer,
+    NDJSONRenderer, MsgpackStreamRenderer,
+]
+if pa is not None:
+    SERIES_RENDERERS.append(ArrowRenderer)
@@ -0,0 +1,296 @@
+"""
+Reportes de ganancias: descarga desde Yahoo, formato para el frontend y
+almacenamiento en la base de datos (modelos EarningsReport / UpcomingEarnings).
+"""
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .models import EarningsReport, UpcomingEarnings
+from .providers import get_provider
+
+HISTORY_SIZE = 10
+
+MESES_ES = {
+    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
+    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre",
+    12: "Diciembre",
+}
+
+
+def format_date_es(dt_object):
+    """Formatea una fecha al estilo 'Julio 20 - 2025'."""
+    if not isinstance(dt_object, (date, pd.Timestamp)):
+        return None
+    month_name = MESES_ES.get(dt_object.month, '')
+    return f"{month_name} {dt_object.day} - {dt_object.year}"
+
+
+def to_float_or_none(value):
+    """Convierte un valor a float de forma segura; None si falla o es NaN."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def fetch_ticker_earnings(ticker_symbol: str, hoy: datetime):
+    """
+    Descarga de Yahoo el próximo reporte y el historial de un ticker.
+    Devuelve {'symbol', 'upcoming' (datetime o None), 'history' [{date, eps_*}]}
+    con fechas reales (sin formatear), o None si no hay datos.
+    """
+    print(f"Obteniendo datos de reportes para {ticker_symbol}...")
+    ticker = get_provider().ticker(ticker_symbol)
+
+    # ticker.info hace una llamada a Yahoo: la leemos una sola vez
+    info = ticker.info
+    if not isinstance(info, dict) or 'symbol' not in info:
+        print(
+            f" --> No se pudo obtener información básica para {ticker_symbol}. "
+            "Saltando."
+        )
+        return None
+
+    upcoming_report_date_obj = None
+
+    # Intento #1: Usar ticker.calendar
+    calendar = ticker.calendar
+    if isinstance(calendar, pd.DataFrame) and not calendar.empty \
+            and 'Earnings Date' in calendar.columns:
+        earnings_date = calendar['Earnings Date'][0]
+        if isinstance(earnings_date, pd.Timestamp):
+            upcoming_report_date_obj = earnings_date.to_pydatetime()
+
+    # Intento #2: Usar ticker.info como respaldo
+    if not upcoming_report_date_obj and 'earningsTimestamp' in info:
+        timestamp = info['earningsTimestamp']
+        if timestamp:
+            upcoming_report_date_obj = datetime.fromtimestamp(timestamp)
+
+    if upcoming_report_date_obj and upcoming_report_date_obj.tzinfo is not None:
+        upcoming_report_date_obj = upcoming_report_date_obj.replace(tzinfo=None)
+    if upcoming_report_date_obj and upcoming_report_date_obj <= hoy:
+        upcoming_report_date_obj = None
+
+    # Obtener el historial de reportes
+    earnings_history = ticker.earnings_dates
+    history = []
+    if isinstance(earnings_history, pd.DataFrame) and not earnings_history.empty:
+        # Nos aseguramos de que las columnas clave existan antes de dropear NAs
+        required_cols = ['Reported EPS', 'EPS Estimate']
+        if all(col in earnings_history.columns for col in required_cols):
+            history_df = earnings_history.dropna(subset=required_cols, how='any') \
+                .sort_index(ascending=False)
+            for report_date, row in history_df.head(HISTORY_SIZE).iterrows():
+                eps_estimate = to_float_or_none(row.get('EPS Estimate'))
+                eps_actual = to_float_or_none(row.get('Reported EPS'))
+                surprise_percent = None
+
+                if eps_estimate is not None and eps_actual is not None \
+                        and eps_estimate != 0:
+                    surprise_percent = (
+                        (eps_actual - eps_estimate) / abs(eps_estimate) * 100
+                    )
+
+                history.append({
+                    'date': report_date.to_pydatetime().date(),
+                    'eps_estimate': eps_estimate,
+                    'eps_actual': eps_actual,
+                    'surprise_percent': surprise_percent
+                })
+
+    if not (upcoming_report_date_obj or history):
+        return None
+    return {
+        'symbol': ticker_symbol, 'upcoming': upcoming_report_date_obj,
+        'history': history,
+    }
+
+
+def build_report(symbol: str, upcoming, history: list) -> dict:
+    """Da formato (fechas en español) a los datos de un ticker para la respuesta."""
+    past_reports = [
+        {
+            'date': format_date_es(item['date']),
+            'eps_estimate': item['eps_estimate'],
+            'eps_actual': item['eps_actual'],
+            'surprise_percent': item['surprise_percent'],
+        }
+        for item in history
+    ]
+    return {
+        'symbol': symbol,
+        'upcoming_report_date': format_date_es(upcoming) if upcoming else None,
+        'last_report': past_reports[0] if past_reports else None,
+        'previous_reports': past_reports[1:] if len(past_reports) > 1 else []
+    }
+
+
+def build_response(entries: list, failed: list = ()) -> dict:
+    """
+    entries: [(symbol, upcoming, history)] en el orden de la watchlist.
+    Los próximos reportes se ordenan por la fecha real, no por el texto.
+    """
+    reports = []
+    upcoming = []
+    for symbol, upcoming_date, history in entries:
+        report = build_report(symbol, upcoming_date, history)
+        reports.append(report)
+        if upcoming_date:
+            upcoming.append((upcoming_date, report))
+    upcoming.sort(key=lambda item: item[0])
+    return {
+        'upcoming_reports': [report for _, report in upcoming],
+        'past_reports': reports,
+        'failed': list(failed),
+    }
+
+
+# Pool compartido y acotado para las llamadas a Yahoo de los reportes
+_reports_executor = ThreadPoolExecutor(
+    max_workers=settings.REPORTS_MAX_WORKERS, thread_name_prefix='reports'
+)
+
+
+def reports_budget(n_symbols: int, timeout: float = None) -> float:
+    """
+    Tiempo máximo de fetch_earnings_concurrently para `n_symbols`: con más
+    tickers que hilos se ejecutan por tandas y cada tanda tiene su `timeout`.
+    """
+    timeout = settings.REPORTS_TICKER_TIMEOUT if timeout is None else timeout
+    return math.ceil(max(n_symbols, 1) / settings.REPORTS_MAX_WORKERS) * timeout
+
+
+def fetch_earnings_concurrently(symbols, hoy: datetime, timeout: float = None):
+    """
+    Consulta todos los tickers en paralelo. Cada ticker tiene `timeout`
+    segundos desde que empieza a ejecutarse, no desde que entra en la cola
+    del pool: con más tickers que hilos los que esperan no heredan el tiempo
+    ya consumido por la primera tanda. Devuelve (datos, fallidos).
+    """
+    timeout = settings.REPORTS_TICKER_TIMEOUT if timeout is None else timeout
+    started = {}
+
+    def run(symbol):
+        started[symbol] = time.monotonic()
+        return fetch_ticker_earnings(symbol, hoy)
+
+    futures = {symbol: _reports_executor.submit(run, symbol) for symbol in symbols}
+    pending = dict(futures)
+    timed_out = []
+    try:
+        while pending:
+            now = time.monotonic()
+            for symbol, future in list(pending.items()):
+                if future.done():
+                    del pending[symbol]
+                elif symbol in started and now - started[symbol] >= timeout:
+                    # El hilo no se puede interrumpir: se deja terminar solo
+                    del pending[symbol]
+                    timed_out.append(symbol)
+            if not pending:
+                break
+            deadlines = [
+                started[symbol] + timeout for symbol in pending if symbol in started
+            ]
+            # Sin ninguno en marcha todavía: se despierta cuando se libere un hilo
+            wait(
+                pending.values(),
+                timeout=max(min(deadlines) - now, 0) if deadlines else timeout,
+                return_when=FIRST_COMPLETED,
+            )
+    finally:
+        # Si algo interrumpe la espera, los que siguen en la cola no llegan a ejecutarse
+        for future in pending.values():
+            future.cancel()
+
+    results = []
+    failed = []
+    for ticker_symbol, future in futures.items():
+        if ticker_symbol in timed_out:
+            print(f"Timeout obteniendo datos para {ticker_symbol}")
+            failed.append(ticker_symbol)
+            continue
+        try:
+            data = future.result()
+        except Exception as e:
+            print(f"Error obteniendo datos para {ticker_symbol}: {e}")
+            failed.append(ticker_symbol)
+            continue
+        if data:
+            results.append(data)
+    return results, failed
+
+
+def store_earnings(results: list):
+    """Guarda (upsert en bloque) lo descargado por fetch_earnings_concurrently."""
+    history_rows = [
+        EarningsReport(symbol=data['symbol'], **item)
+        for data in results
+        for item in data['history']
+    ]
+    upcoming_rows = [
+        UpcomingEarnings(symbol=data['symbol'], date=data['upcoming'].date())
+        for data in results
+        if data['upcoming']
+    ]
+    with transaction.atomic():
+        EarningsReport.objects.bulk_create(
+            history_rows,
+            update_conflicts=True,
+            unique_fields=['symbol', 'date'],
+            update_fields=[
+                'eps_estimate', 'eps_actual', 'surprise_percent', 'updated_at',
+            ],
+        )
+        # Sin próximo reporte → se borra el que hubiera quedado guardado
+        UpcomingEarnings.objects.filter(
+            symbol__in=[data['symbol'] for data in results if not data['upcoming']]
+        ).delete()
+        UpcomingEarnings.objects.bulk_create(
+            upcoming_rows,
+            update_conflicts=True,
+            unique_fields=['symbol'],
+            update_fields=['date', 'updated_at'],
+        )
+
+
+def load_entries_from_store(symbols, today: date):
+    """
+    Lee de la base de datos los reportes de `symbols` (en ese orden).
+    Devuelve None si todavía no se ha cargado nada (refresh_earnings).
+    """
+    history = {}
+    rows = (
+        EarningsReport.objects
+        .filter(symbol__in=symbols)
+        .order_by('symbol', '-date')
+        .values('symbol', 'date', 'eps_estimate', 'eps_actual', 'surprise_percent')
+    )
+    for row in rows:
+        items = history.setdefault(row.pop('symbol'), [])
+        if len(items) < HISTORY_SIZE:
+            items.append(row)
+
+    # Solo se guarda el día: un reporte de hoy sigue listado hasta que acaba
+    # el día (en vivo se descarta en cuanto pasa la hora, `> hoy`)
+    upcoming = dict(
+        UpcomingEarnings.objects
+        .filter(symbol__in=symbols, date__gte=today)
+        .values_list('symbol', 'date')
+    )
+    if not history and not upcoming:
+        return None
+    return [
+        (symbol, upcoming.get(symbol), history.get(symbol, []))
+        for symbol in symbols
+        if symbol in upcoming or symbol in history
+    ]
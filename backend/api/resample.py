@@ -0,0 +1,188 @@
+"""
+Derive every chart period from a few cached base series per ticker.
+
+Yahoo limits how far back each interval goes (1m: 7d, 5m: 60d), so a ticker
+has at most three base series:
+
+    '1m' → 1m bars, 7 days      (only for the 1m chart)
+    '5m' → 5m bars, 60 days     (15m and 1h charts, session bucketed)
+    '1d' → daily bars, max      (1d chart = last 5y, 1w chart = weekly roll-up)
+
+Switching between periods that share a base costs no upstream round trip.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .sessions import (
+    CST_FIRST_HALF_HOUR,
+    NS_PER_DAY,
+    SessionTemplate,
+    aggregate_ohlcv,
+    to_utc_ns,
+)
+
+BASE_SERIES = {
+    '1m': {'period': '7d', 'interval': '1m'},
+    '5m': {'period': '60d', 'interval': '5m'},
+    '1d': {'period': 'max', 'interval': '1d'},
+}
+
+OHLCV_COLS = ['open', 'high', 'low', 'close', 'volume']
+
+
+@dataclass(frozen=True)
+class PeriodSpec:
+    """
+    How a UI period is built from its base series.
+
+    - template: session buckets for intraday periods (None = base bars as-is)
+    - weekly: roll daily bars up into weeks starting on Monday
+    - window: keep only the most recent part of the base series
+    """
+    base: str
+    template: SessionTemplate = None
+    weekly: bool = False
+    window: pd.Timedelta = None
+
+    @property
+    def daily(self) -> bool:
+        return self.base == '1d'
+
+
+PERIOD_SPECS = {
+    '1m': PeriodSpec(base='1m'),
+    '15m': PeriodSpec(base='5m', template=CST_FIRST_HALF_HOUR.with_bucket(15)),
+    '1h': PeriodSpec(base='5m', template=CST_FIRST_HALF_HOUR),
+    '1d': PeriodSpec(base='1d', window=pd.Timedelta(days=5 * 365)),
+    '1w': PeriodSpec(base='1d', weekly=True),
+}
+
+
+def get_period_spec(period: str) -> PeriodSpec:
+    return PERIOD_SPECS.get(period, PERIOD_SPECS['1d'])
+
+
+def base_arrays(df: pd.DataFrame, dropna: bool = False):
+    """
+    Normalization stage of every downloaded frame (chart periods, the bar
+    store, the replay simulator) → (utc_ns, {col: array}):
+
+    - columns: yfinance or lowercase names, flat or one ticker's
+      (Price, Ticker) MultiIndex, looked up case-insensitively;
+    - time: the DatetimeIndex or a 'Datetime' / 'Date' column as int64 UTC
+      nanoseconds (naive = UTC), sorted ascending;
+    - prices as float64 and volume as int64 (missing = 0), coerced in one
+      conversion of the whole frame; missing volume is left out.
+
+    `dropna` drops the bars without a close. Raises ValueError when the
+    frame has no datetimes or OHLC columns.
+    """
+    names = _column_names(df.columns)
+    positions = {name: i for i, name in enumerate(names)}
+    missing = [name for name in OHLCV_COLS[:4] if name not in positions]
+    if missing:
+        raise ValueError(f"Missing OHLC columns: {', '.join(missing)}")
+    wanted = [name for name in OHLCV_COLS if name in positions]
+
+    if isinstance(df.index, pd.DatetimeIndex):
+        utc_ns = to_utc_ns(df.index)
+    elif 'datetime' in positions or 'date' in positions:
+        utc_ns = to_utc_ns(df.iloc[:, positions.get('datetime', positions.get('date'))])
+    elif not len(df):
+        utc_ns = np.empty(0, dtype=np.int64)
+    else:
+        raise ValueError("No datetime column or DatetimeIndex found.")
+
+    try:
+        values = df.to_numpy(dtype=np.float64, na_value=np.nan).T
+        # Filas contiguas: una por columna pedida
+        values = values[[positions[name] for name in wanted]]
+    except (TypeError, ValueError):
+        # Texto u objetos (CSV, JSON...): conversión columna a columna
+        values = [
+            pd.to_numeric(df.iloc[:, positions[name]], errors='coerce')
+            .to_numpy(dtype=np.float64, na_value=np.nan)
+            for name in wanted
+        ]
+    arrays = dict(zip(wanted, values))
+    if 'volume' in arrays:
+        arrays['volume'] = np.nan_to_num(arrays['volume']).astype(np.int64)
+
+    keep = ~np.isnan(arrays['close']) if dropna else None
+    if keep is not None and not keep.all():
+        utc_ns = utc_ns[keep]
+        arrays = {k: v[keep] for k, v in arrays.items()}
+    if len(utc_ns) > 1 and not np.all(utc_ns[1:] >= utc_ns[:-1]):
+        order = np.argsort(utc_ns, kind='stable')
+        utc_ns = utc_ns[order]
+        arrays = {k: v[order] for k, v in arrays.items()}
+    return utc_ns, arrays
+
+
+def _column_names(columns) -> list:
+    """Lowercase column names; for a MultiIndex, those of the level holding 'close'."""
+    if not isinstance(columns, pd.MultiIndex):
+        return [str(c).lower() for c in columns]
+    for level in range(columns.nlevels):
+        names = [str(c).lower() for c in columns.get_level_values(level)]
+        if 'close' in names:
+            if names.count('close') > 1:
+                raise ValueError(
+                    "Several tickers in one frame: split the download first."
+                )
+            return names
+    return []
+
+
+def rollup_weekly(utc_ns: np.ndarray, arrays: dict):
+    """Daily bars → weekly bars labelled with the Monday of each week."""
+    days = utc_ns // NS_PER_DAY
+    # 1970-01-01 was a Thursday: shift so weeks start on Monday
+    week = days - (days + 3) % 7
+    starts = np.flatnonzero(np.r_[True, week[1:] != week[:-1]])
+    ends = np.r_[starts[1:], len(week)] - 1
+
+    out = {
+        'open': arrays['open'][starts],
+        'high': np.fmax.reduceat(arrays['high'], starts),
+        'low': np.fmin.reduceat(arrays['low'], starts),
+        'close': arrays['close'][ends],
+    }
+    if 'volume' in arrays:
+        out['volume'] = np.add.reduceat(arrays['volume'], starts)
+    return week[starts] * NS_PER_DAY, out
+
+
+def derive_period(df: pd.DataFrame, spec: PeriodSpec) -> pd.DataFrame:
+    """
+    Build the chart series for `spec` from its cached base frame.
+    Output columns: time, open, high, low, close, [volume]; `time` is UTC
+    seconds for intraday periods and 'YYYY-MM-DD' for daily/weekly ones.
+    """
+    utc_ns, arrays = base_arrays(df)
+
+    if spec.window is not None and len(utc_ns):
+        start = np.searchsorted(utc_ns, utc_ns[-1] - spec.window.value)
+        utc_ns = utc_ns[start:]
+        arrays = {k: v[start:] for k, v in arrays.items()}
+
+    if spec.template is not None:
+        out = aggregate_ohlcv(
+            utc_ns, arrays['open'], arrays['high'], arrays['low'], arrays['close'],
+            arrays.get('volume'), template=spec.template,
+        )
+        utc_ns = out.pop('time')
+        arrays = out
+    elif spec.weekly and len(utc_ns):
+        utc_ns, arrays = rollup_weekly(utc_ns, arrays)
+
+    if spec.daily:
+        time = np.asarray(pd.DatetimeIndex(utc_ns.view('M8[ns]')).strftime('%Y-%m-%d'))
+    else:
+        time = utc_ns // 10**9
+    # Un solo constructor: time primero, sin insert() posterior
+    return pd.DataFrame(
+        {'time': time, **{c: arrays[c] for c in OHLCV_COLS if c in arrays}}
+    )
@@ -4,4 +4,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/ticks/(?P<ticker>\w+)/$', consumers.TickerConsumer.as_asgi()),
-]
\ No newline at end of file
+    re_path(r'ws/stream/$', consumers.StreamConsumer.as_asgi()),
+]
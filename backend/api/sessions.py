@@ -0,0 +1,247 @@
+"""
+Vectorized session bucketing for intraday bars.
+
+Bars are grouped into buckets defined by a `SessionTemplate` (timezone,
+regular-session open/close, optional shorter first bucket, holidays and
+half-days). Everything works on int64 nanosecond arrays, so a 60-day window
+of 5m bars is labelled and aggregated without any per-row Python.
+"""
+from dataclasses import dataclass, field, replace
+from datetime import date, time
+
+import numpy as np
+import pandas as pd
+
+NS_PER_MINUTE = 60 * 10**9
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+NO_BUCKET = np.iinfo(np.int64).min
+
+
+def _time_ns(t: time) -> int:
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 10**9
+
+
+def _day_ns(d: date) -> int:
+    return int(pd.Timestamp(d).value)
+
+
+@dataclass(frozen=True)
+class SessionTemplate:
+    """
+    Regular trading session, in local wall-clock time of `tz`.
+
+    - bucket_minutes: width of the buckets.
+    - first_bucket_minutes: optional length of the first (partial) bucket;
+      the following buckets are aligned to open + first_bucket_minutes.
+    - holidays: dates with no session at all.
+    - half_days: ((date, close time), ...) for early closes.
+    """
+    tz: str = 'America/Chicago'
+    open: time = time(8, 30)
+    close: time = time(15, 0)
+    bucket_minutes: int = 60
+    first_bucket_minutes: int = None
+    holidays: frozenset = field(default_factory=frozenset)
+    half_days: tuple = ()
+
+    def with_bucket(self, minutes: int, first_bucket_minutes: int = None):
+        return replace(
+            self, bucket_minutes=minutes, first_bucket_minutes=first_bucket_minutes
+        )
+
+
+# 08:30–09:00 CST half hour, then hourly buckets until the 15:00 close.
+CST_FIRST_HALF_HOUR = SessionTemplate(
+    tz='America/Chicago',
+    open=time(8, 30),
+    close=time(15, 0),
+    bucket_minutes=60,
+    first_bucket_minutes=30,
+)
+
+
+def to_utc_ns(values) -> np.ndarray:
+    """Datetime-like values (naive = UTC) → int64 UTC nanoseconds."""
+    dtype = getattr(values, 'dtype', None)
+    if isinstance(dtype, (np.dtype, pd.DatetimeTZDtype)) and dtype.kind == 'M':
+        # Already datetime64: skip the (slow) generic parser; with a timezone
+        # the int64 values are UTC already
+        idx = values if isinstance(values, pd.DatetimeIndex) else \
+            pd.DatetimeIndex(values)
+    else:
+        parsed = pd.to_datetime(values, utc=True, errors='coerce', cache=False)
+        idx = pd.DatetimeIndex(parsed).tz_localize(None)
+    return idx.as_unit('ns').asi8
+
+
+def local_ns(utc_ns: np.ndarray, tz: str) -> np.ndarray:
+    """UTC nanoseconds → local wall-clock nanoseconds in `tz` (DST aware)."""
+    idx = pd.DatetimeIndex(utc_ns.view('M8[ns]'))
+    idx = idx.tz_localize('UTC').tz_convert(tz)
+    return idx.tz_localize(None).as_unit('ns').asi8
+
+
+def bucket_labels(utc_ns: np.ndarray, template: SessionTemplate) -> np.ndarray:
+    """
+    Label each UTC timestamp with the UTC start of its session bucket.
+    Timestamps outside the session (or on holidays) get NO_BUCKET.
+    """
+    utc_ns = np.asarray(utc_ns, dtype=np.int64)
+    loc = local_ns(utc_ns, template.tz)
+    offset = loc - utc_ns
+
+    tod = loc % NS_PER_DAY
+    day = loc - tod
+
+    open_ns = _time_ns(template.open)
+    close_ns = _time_ns(template.close)
+    if template.half_days:
+        close_ns = np.full(len(loc), close_ns, dtype=np.int64)
+        hd_days = np.array([_day_ns(d) for d, _ in template.half_days], dtype=np.int64)
+        hd_close = np.array(
+            [_time_ns(t) for _, t in template.half_days], dtype=np.int64
+        )
+        order = np.argsort(hd_days)
+        hd_days, hd_close = hd_days[order], hd_close[order]
+        pos = np.clip(np.searchsorted(hd_days, day), 0, len(hd_days) - 1)
+        early = hd_days[pos] == day
+        close_ns[early] = hd_close[pos[early]]
+
+    in_session = (tod >= open_ns) & (tod < close_ns)
+    if template.holidays:
+        holidays = np.array([_day_ns(d) for d in template.holidays], dtype=np.int64)
+        in_session &= ~np.isin(day, holidays)
+
+    bucket = template.bucket_minutes * NS_PER_MINUTE
+    first = (template.first_bucket_minutes or 0) * NS_PER_MINUTE
+    # Bucket start relative to the open; the buckets after the first one
+    # are aligned to open + first
+    rel = tod - (open_ns + first)
+    in_first = rel < 0 if first else None
+    rel //= bucket
+    rel *= bucket
+    if first:
+        rel += first
+        rel[in_first] = 0
+
+    # The session never spans a DST switch, so the bar's own UTC offset
+    # also applies to its bucket start.
+    labels = day
+    labels += open_ns
+    labels += rel
+    labels -= offset
+    labels[~in_session] = NO_BUCKET
+    return labels
+
+
+def aggregate_ohlcv(utc_ns, open_, high, low, close, volume=None,
+                    template: SessionTemplate = CST_FIRST_HALF_HOUR) -> dict:
+    """
+    Aggregate OHLCV arrays into session buckets with first/max/min/last/sum
+    semantics. Rows outside the session or without open/close are dropped.
+    Returns a dict of arrays: 'time' (bucket start, UTC ns), 'open', 'high',
+    'low', 'close' and, if given, 'volume'.
+    """
+    utc_ns = np.asarray(utc_ns, dtype=np.int64)
+    arrays = [np.asarray(a, dtype=np.float64) for a in (open_, high, low, close)]
+    if volume is not None:
+        # Integer volume (base_arrays) has no NaN: summed as is
+        volume = np.asarray(volume)
+        if volume.dtype.kind not in 'iu':
+            volume = np.nan_to_num(volume.astype(np.float64)).astype(np.int64)
+        arrays.append(volume)
+    if len(utc_ns) > 1 and not np.all(utc_ns[1:] >= utc_ns[:-1]):
+        order = np.argsort(utc_ns, kind='stable')
+        utc_ns = utc_ns[order]
+        arrays = [a[order] for a in arrays]
+
+    labels = bucket_labels(utc_ns, template)
+    keep = (labels != NO_BUCKET) & ~(np.isnan(arrays[0]) | np.isnan(arrays[3]))
+    open_, high, low, close = (a[keep] for a in arrays[:4])
+    volume = arrays[4][keep] if volume is not None else None
+
+    labels = labels[keep]
+    if not len(labels):
+        out = {'time': labels, 'open': open_, 'high': high, 'low': low, 'close': close}
+        if volume is not None:
+            out['volume'] = volume
+        return out
+
+    starts = np.flatnonzero(labels[1:] != labels[:-1])
+    ends = np.append(starts, len(labels) - 1)
+    starts = np.insert(starts + 1, 0, 0)
+
+    out = {
+        'time': labels[starts],
+        'open': open_[starts],
+        'high': np.fmax.reduceat(high, starts),
+        'low': np.fmin.reduceat(low, starts),
+        'close': close[ends],
+    }
+    if volume is not None:
+        out['volume'] = np.add.reduceat(volume, starts).astype(np.int64, copy=False)
+    return out
+
+
+def session_bounds(days_ns, template: SessionTemplate):
+    """
+    UTC open and close of the session on each local calendar day (naive
+    midnights, int64 ns). Holidays get close == open (no session).
+    """
+    days_ns = np.asarray(days_ns, dtype=np.int64)
+    open_local = days_ns + _time_ns(template.open)
+    close_local = days_ns + _time_ns(template.close)
+    for d, t in template.half_days:
+        close_local[days_ns == _day_ns(d)] = _day_ns(d) + _time_ns(t)
+    if template.holidays:
+        holidays = np.array([_day_ns(d) for d in template.holidays], dtype=np.int64)
+        closed = np.isin(days_ns, holidays)
+        close_local[closed] = open_local[closed]
+
+    def to_utc(local):
+        idx = pd.DatetimeIndex(local.view('M8[ns]')).tz_localize(template.tz)
+        return idx.tz_convert('UTC').tz_localize(None).as_unit('ns').asi8
+
+    return to_utc(open_local), to_utc(close_local)
+
+
+class SessionClock:
+    """
+    Scalar counterpart of `bucket_labels` for live ticks: the session of the
+    current local day is resolved once (timezone, holidays, half-days) and
+    every timestamp of that day is labelled with integer arithmetic.
+    """
+
+    def __init__(self, template: SessionTemplate):
+        self.template = template
+        self.bucket = template.bucket_minutes * NS_PER_MINUTE
+        self.first = (template.first_bucket_minutes or 0) * NS_PER_MINUTE
+        self.day_start = self.day_end = 0
+        self.open = self.close = 0
+
+    def _load_day(self, utc_ns: int):
+        tz = self.template.tz
+        midnight = pd.Timestamp(utc_ns, tz='UTC').tz_convert(tz).normalize()
+        naive = midnight.tz_localize(None)
+        self.day_start = midnight.value
+        self.day_end = (naive + pd.Timedelta(days=1)).tz_localize(tz).value
+        opens, closes = session_bounds(np.array([naive.value]), self.template)
+        self.open, self.close = int(opens[0]), int(closes[0])
+
+    def in_session(self, utc_ns: int) -> bool:
+        if not self.day_start <= utc_ns < self.day_end:
+            self._load_day(utc_ns)
+        return self.open <= utc_ns < self.close
+
+    def label(self, utc_ns: int) -> int:
+        """UTC start of the bucket of `utc_ns`, or NO_BUCKET outside the session."""
+        if not self.in_session(utc_ns):
+            return NO_BUCKET
+        rel = utc_ns - self.open
+        if rel < self.first:
+            return self.open
+        return self.open + self.first + (rel - self.first) // self.bucket * self.bucket
+
+    def day_label(self, utc_ns: int) -> int:
+        """Local midnight (UTC ns) of the session day of `utc_ns`, or NO_BUCKET."""
+        return self.day_start if self.in_session(utc_ns) else NO_BUCKET
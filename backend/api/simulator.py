@@ -0,0 +1,296 @@
+"""
+Market replay simulator used by `manage.py start_ticker`.
+
+Historical candles of many tickers are replayed from one event loop:
+
+- each ticker's bars are turned into NumPy arrays once; the jittered
+  candles of a whole replay are computed in a few vectorized operations;
+- every ticker has its own emit rate (candles or ticks per second),
+  scheduled with a heap of due times instead of one sleeping task per ticker;
+- in tick mode each candle is replayed as many synthetic trades
+  (`bridge_ticks`), at up to thousands of ticks per second per symbol,
+  spread over the regular session of the bar's day; a `LiveBarAggregator`
+  turns them into live 1m/15m/1h/1d bars published as compact deltas;
+- all the messages due at the same moment are published together, with a
+  bounded number of concurrent `group_send` calls, so the Redis round trips
+  overlap instead of running one after the other;
+- published bars are also kept in the recent-bars buffer (api/livebuffer.py)
+  that new subscribers receive as a snapshot.
+"""
+import asyncio
+import heapq
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .resample import base_arrays
+from .sessions import CST_FIRST_HALF_HOUR, NS_PER_DAY, session_bounds
+from .wire import CLOSED_KEY, compact_bar, group_name, update_event
+
+JITTER = 0.0005
+TICKS_PER_CHUNK = 20_000
+# Streams further behind than this skip ahead instead of bursting to catch up
+MAX_LAG = 1.0
+
+
+@dataclass
+class CandleSeries:
+    """Historical bars of one ticker as arrays (time in UTC seconds)."""
+    symbol: str
+    time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def from_frame(cls, symbol: str, df: pd.DataFrame):
+        utc_ns, arrays = base_arrays(df, dropna=True)
+        volume = arrays.get('volume')
+        return cls(
+            symbol=symbol,
+            time=utc_ns // 10**9,
+            open=arrays['open'],
+            high=arrays['high'],
+            low=arrays['low'],
+            close=arrays['close'],
+            volume=np.zeros(len(utc_ns), dtype=np.int64) if volume is None else volume,
+        )
+
+    def jittered_arrays(self, rng: np.random.Generator, jitter: float = JITTER) -> dict:
+        """One replay: rounded OHLCV arrays with a random jitter on the close."""
+        close = np.round(self.close * (1 + rng.uniform(-jitter, jitter, len(self))), 2)
+        return {
+            'time': self.time,
+            'open': np.round(self.open, 2),
+            'high': np.round(np.maximum(self.high, close), 2),
+            'low': np.round(np.minimum(self.low, close), 2),
+            'close': close,
+            'volume': self.volume,
+        }
+
+    def jittered(self, rng: np.random.Generator, jitter: float = JITTER) -> list:
+        """One replay as candle dicts."""
+        return records(self.jittered_arrays(rng, jitter))
+
+
+def records(columns: dict) -> list:
+    """{name: array} → [{name: value}] with plain Python values."""
+    names = list(columns)
+    rows = zip(*(a.tolist() for a in columns.values()))
+    return [dict(zip(names, row)) for row in rows]
+
+
+def bridge_ticks(bars: dict, ticks: int, rng: np.random.Generator) -> dict:
+    """
+    Synthesize `ticks` trades inside every bar (all bars at once, arrays of
+    shape (bars, ticks)).
+
+    The path starts at the open, touches the high and the low at random
+    positions (in random order) and ends at the close; between those anchor
+    points it follows a Brownian bridge, clipped to [low, high]. Trade sizes
+    split the bar volume multinomially, so they add up to it exactly.
+
+    Returns the forming candle after each trade: open, running high/low,
+    close (= trade price), cumulative volume, plus `price` and `size`.
+    """
+    if ticks < 4:
+        raise ValueError(
+            'At least 4 ticks per bar are needed (open, high, low, close).'
+        )
+    n = len(bars['open'])
+    open_, high, low, close = (
+        bars[k][:, None] for k in ('open', 'high', 'low', 'close')
+    )
+
+    # Anchor positions: 0, high/low at random inner positions, ticks - 1
+    a = rng.integers(1, ticks - 1, n)
+    b = rng.integers(1, ticks - 2, n)
+    b += b >= a
+    inner = np.column_stack([np.minimum(a, b), np.maximum(a, b)])
+    high_first = rng.random(n) < 0.5
+    first = np.where(high_first[:, None], high, low)
+    second = np.where(high_first[:, None], low, high)
+    anchor_pos = np.hstack(
+        [np.zeros((n, 1), np.int64), inner, np.full((n, 1), ticks - 1)]
+    )
+    anchor_val = np.hstack([open_, first, second, close])
+
+    j = np.arange(ticks)[None, :]
+    segment = (j >= anchor_pos[:, 1:2]).astype(np.int64) + (j >= anchor_pos[:, 2:3])
+    left = np.take_along_axis(anchor_pos, segment, axis=1)
+    right = np.take_along_axis(anchor_pos, segment + 1, axis=1)
+    frac = (j - left) / (right - left)
+    left_val = np.take_along_axis(anchor_val, segment, axis=1)
+    right_val = np.take_along_axis(anchor_val, segment + 1, axis=1)
+
+    sigma = (high - low) * 0.5 / np.sqrt(ticks)
+    walk = np.cumsum(rng.standard_normal((n, ticks)), axis=1) * sigma
+    walk_left = np.take_along_axis(walk, left, axis=1)
+    walk_right = np.take_along_axis(walk, right, axis=1)
+    bridge = walk - walk_left - frac * (walk_right - walk_left)
+
+    price = left_val + (right_val - left_val) * frac + bridge
+    price = np.round(np.clip(price, low, high), 2)
+    size = rng.multinomial(bars['volume'], np.full(ticks, 1 / ticks))
+
+    return {
+        'time': np.repeat(bars['time'][:, None], ticks, axis=1),
+        'open': np.repeat(open_, ticks, axis=1),
+        'high': np.maximum.accumulate(price, axis=1),
+        'low': np.minimum.accumulate(price, axis=1),
+        'close': price,
+        'volume': np.cumsum(size, axis=1),
+        'price': price,
+        'size': size,
+    }
+
+
+def trade_times(bar_time: np.ndarray, ticks: int, template=CST_FIRST_HALF_HOUR):
+    """
+    UTC ns of `ticks` evenly spaced trades inside the regular session of each
+    daily bar (shape (bars, ticks)). The day is the UTC date of the bar's
+    midday, whatever midnight the data provider stamps daily bars with.
+    """
+    days = (bar_time * 10**9 + NS_PER_DAY // 2) // NS_PER_DAY * NS_PER_DAY
+    open_ns, close_ns = session_bounds(days, template)
+    frac = (np.arange(ticks) + 0.5) / ticks
+    return open_ns[:, None] + ((close_ns - open_ns)[:, None] * frac).astype(np.int64)
+
+
+@dataclass(order=True)
+class TickerStream:
+    """Replay state of one ticker (ordered by its next due time)."""
+    due: float
+    symbol: str = field(compare=False)
+    interval: float = field(compare=False)
+    series: CandleSeries = field(compare=False)
+    candles: list = field(default_factory=list, compare=False)
+    position: int = field(default=0, compare=False)
+
+    def next_message(self, rng) -> dict:
+        if self.position >= len(self.candles):
+            # Replay completed: start over with a fresh jitter
+            self.candles = self.series.jittered(rng)
+            self.position = 0
+        candle = self.candles[self.position]
+        self.position += 1
+        return candle
+
+
+@dataclass(order=True)
+class TickStream(TickerStream):
+    """
+    Replay of synthetic trades: `ticks_per_bar` messages per candle (see
+    `bridge_ticks`). Ticks are generated a chunk of bars at a time, so memory
+    stays bounded at high tick counts. Every tick carries its `trade_time`
+    (UTC seconds) inside the bar's session, used by the `aggregator`.
+    """
+    ticks_per_bar: int = field(default=100, compare=False)
+    bar_position: int = field(default=0, compare=False)
+    bars: dict = field(default=None, compare=False)
+    aggregator: object = field(default=None, compare=False)
+
+    def next_message(self, rng) -> dict:
+        if self.position >= len(self.candles):
+            if self.bars is None or self.bar_position >= len(self.series):
+                self.bars = self.series.jittered_arrays(rng)
+                self.bar_position = 0
+            chunk = max(1, TICKS_PER_CHUNK // self.ticks_per_bar)
+            stop = self.bar_position + chunk
+            bars = {k: v[self.bar_position:stop] for k, v in self.bars.items()}
+            ticks = bridge_ticks(bars, self.ticks_per_bar, rng)
+            trade_ns = trade_times(bars['time'], self.ticks_per_bar)
+            ticks['trade_time'] = np.round(trade_ns / 10**9, 3)
+            self.candles = records({k: v.ravel() for k, v in ticks.items()})
+            self.position = 0
+            self.bar_position = stop
+        tick = self.candles[self.position]
+        self.position += 1
+        return tick
+
+
+class MarketSimulator:
+    def __init__(self, channel_layer, streams, concurrency: int = 100, seed=None,
+                 buffer=None):
+        self.channel_layer = channel_layer
+        self.buffer = buffer
+        self.streams = list(streams)
+        self.concurrency = concurrency
+        self.rng = np.random.default_rng(seed)
+        self.sent = 0
+        self.late = 0
+
+    async def publish(self, updates):
+        """
+        Send [(ticker, interval, payload, bar)] with at most `concurrency` sends
+        in flight, and record the bars in the recent-bars buffer. `bar` is the
+        whole bar when `payload` is a delta, None when the payload is the bar.
+        """
+        # Serialized once here, forwarded as-is by every subscriber
+        messages = []
+        for ticker, interval, payload, bar in updates:
+            full = None if bar is None else compact_bar(bar, CLOSED_KEY in payload)
+            event = update_event(payload, ticker, interval, full=full)
+            messages.append((group_name(ticker, interval), event))
+        if self.buffer is not None:
+            await self.buffer.record([
+                (ticker, interval, payload if bar is None else bar)
+                for ticker, interval, payload, bar in updates
+            ])
+        for i in range(0, len(messages), self.concurrency):
+            chunk = messages[i:i + self.concurrency]
+            await asyncio.gather(*(
+                self.channel_layer.group_send(group, message)
+                for group, message in chunk
+            ))
+        self.sent += len(messages)
+
+    def due_messages(self, stream: TickerStream):
+        payload = stream.next_message(self.rng)
+        if not isinstance(stream, TickStream):
+            return [(stream.symbol, None, payload, None)]
+        # Publish time, for end-to-end latency measurements on the client
+        updates = [(stream.symbol, None, {**payload, 'ts': time.time()}, None)]
+        if stream.aggregator is not None:
+            trade_ns = round(payload['trade_time'] * 10**9)
+            for interval, delta, bar in stream.aggregator.update(
+                trade_ns, payload['price'], payload['size']
+            ):
+                updates.append((stream.symbol, interval, delta, bar))
+        return updates
+
+    async def run(self, duration: float = None):
+        started = time.monotonic()
+        heap = []
+        for stream in self.streams:
+            stream.due = started
+            heapq.heappush(heap, stream)
+
+        while heap:
+            now = time.monotonic()
+            if duration is not None and now - started >= duration:
+                return
+            if heap[0].due > now:
+                await asyncio.sleep(heap[0].due - now)
+                continue
+
+            messages = []
+            while heap and heap[0].due <= now:
+                stream = heapq.heappop(heap)
+                # Fast streams (intervals shorter than one pass of the loop)
+                # emit every message that came due since the previous pass
+                while stream.due <= now:
+                    messages.extend(self.due_messages(stream))
+                    stream.due += stream.interval
+                    if now - stream.due > MAX_LAG:
+                        self.late += 1
+                        stream.due = now + stream.interval
+                heapq.heappush(heap, stream)
+            await self.publish(messages)
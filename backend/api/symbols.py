@@ -0,0 +1,294 @@
+"""
+Local symbol universe for SymbolSearchView.
+
+The universe is loaded from a JSON snapshot (Finnhub /stock/symbol records:
+symbol, displaySymbol, description, type) and indexed in memory:
+
+- symbols: sorted keys searched with bisect (prefix lookups)
+- description words: sorted keys searched the same way
+- description trigrams: postings used for substring and fuzzy matches
+
+A daemon thread re-downloads the snapshot every SYMBOL_INDEX_REFRESH
+seconds and swaps in a new index; Finnhub search is only used on a miss.
+"""
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from django.conf import settings
+
+from .upstream import get_upstream_client
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED_SYMBOLS = {'APP'}
+MAX_RESULTS = 50
+FUZZY_MIN_SCORE = 0.5
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_EMPTY = np.empty(0, dtype=np.int32)
+
+
+def is_listed_symbol(item: dict) -> bool:
+    """Common stocks only: no '.' suffix, no Crypto, no excluded symbols."""
+    symbol = item.get("symbol", "")
+    return (
+        "." not in symbol
+        and item.get("type") != "Crypto"
+        and symbol not in EXCLUDED_SYMBOLS
+    )
+
+
+def _trigrams(text: str, pad: bool = True) -> set:
+    """
+    Character trigrams of `text`. Padding adds the word-boundary grams
+    (' ap', 'le ') the index stores and fuzzy matching scores; a substring
+    query must be searched without them ('pple' is inside 'apple').
+    """
+    if pad:
+        text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _prefix_range(keys: list, prefix: str):
+    lo = bisect_left(keys, prefix)
+    hi = bisect_left(keys, prefix + '\uffff', lo)
+    return lo, hi
+
+
+def _merge_keys(keys: list, ids: list, new: list):
+    """
+    Sorted (keys, ids) lists with the (key, id) pairs of `new` added. The
+    lists are copied: a published index keeps its own.
+    """
+    new.sort()
+    if not keys:
+        return [key for key, _ in new], [i for _, i in new]
+    keys, ids = list(keys), list(ids)
+    for key, i in new:
+        # New ids are the largest: after the equal keys already indexed
+        j = bisect_right(keys, key)
+        keys.insert(j, key)
+        ids.insert(j, i)
+    return keys, ids
+
+
+class SymbolIndex:
+    """
+    Search index over a list of symbol records. An index is never modified
+    once published: `merged_with` returns a new one that shares the
+    untouched postings.
+    """
+
+    def __init__(self, items=()):
+        self.items = []
+        self._known = set()
+        self._trigrams = {}
+        self._symbols, self._symbol_ids = [], []
+        self._words, self._word_ids = [], []
+        self._add(items)
+
+    def _add(self, items):
+        """Index the records of `items` not in the index yet (appended in order)."""
+        first = len(self.items)
+        for item in items:
+            symbol = item.get("symbol", "")
+            if symbol and symbol not in self._known and is_listed_symbol(item):
+                self._known.add(symbol)
+                self.items.append({
+                    "description": item.get("description", ""),
+                    "displaySymbol": item.get("displaySymbol", symbol),
+                    "symbol": symbol,
+                    "type": item.get("type", ""),
+                })
+        if len(self.items) == first:
+            return
+
+        symbol_keys = []
+        word_keys = []
+        trigrams = {}
+        for i in range(first, len(self.items)):
+            item = self.items[i]
+            symbol_keys.append((item["symbol"].upper(), i))
+            description = item["description"].lower()
+            for word in set(_WORD_RE.findall(description)):
+                word_keys.append((word, i))
+            for gram in _trigrams(description):
+                trigrams.setdefault(gram, []).append(i)
+        # New ids are larger than the indexed ones: postings stay sorted
+        for gram, ids in trigrams.items():
+            ids = np.array(ids, dtype=np.int32)
+            posting = self._trigrams.get(gram)
+            if posting is not None:
+                ids = np.concatenate([posting, ids])
+            self._trigrams[gram] = ids
+        self._symbols, self._symbol_ids = _merge_keys(
+            self._symbols, self._symbol_ids, symbol_keys
+        )
+        self._words, self._word_ids = _merge_keys(
+            self._words, self._word_ids, word_keys
+        )
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> list:
+        """
+        Ranked matches: exact symbol, symbol prefix, description word prefix,
+        description substring, then fuzzy (trigram similarity).
+        """
+        upper = query.strip().upper()
+        lower = upper.lower()
+        if not upper:
+            return []
+
+        ranked = []
+        seen = set()
+
+        def add(ids):
+            for i in ids:
+                if i not in seen:
+                    seen.add(i)
+                    ranked.append(i)
+
+        lo, hi = _prefix_range(self._symbols, upper)
+        add(self._symbol_ids[j] for j in range(lo, hi) if self._symbols[j] == upper)
+        # Shorter symbols first: 'AA' before 'AAPL' before 'AAPLW'
+        prefix = sorted(
+            range(lo, hi), key=lambda j: (len(self._symbols[j]), self._symbols[j])
+        )
+        add(self._symbol_ids[j] for j in prefix)
+
+        if ' ' not in lower:
+            lo, hi = _prefix_range(self._words, lower)
+            add(self._word_ids[j] for j in range(lo, min(hi, lo + limit)))
+
+        if len(ranked) < limit:
+            # Shorter queries have no inner trigram: only whole-word matches
+            grams = _trigrams(lower, pad=len(lower) < 3)
+            postings = [self._trigrams.get(g, _EMPTY) for g in grams]
+            if postings and all(len(posting) for posting in postings):
+                # Smallest posting list first, verified against the text
+                for i in min(postings, key=len):
+                    if len(ranked) >= limit:
+                        break
+                    if lower in self.items[i]["description"].lower():
+                        add((i,))
+
+            grams = _trigrams(lower)
+            if not ranked and grams:
+                postings = [self._trigrams.get(g, _EMPTY) for g in grams]
+                hits = np.concatenate(postings)
+                counts = np.bincount(hits, minlength=len(self.items))
+                candidates = np.flatnonzero(counts >= FUZZY_MIN_SCORE * len(grams))
+                order = np.argsort(-counts[candidates], kind='stable')
+                add(candidates[order[:limit]].tolist())
+
+        return [self.items[i] for i in ranked[:limit]]
+
+    def merged_with(self, items):
+        """New index with the records of `items` added; this one is left as is."""
+        index = SymbolIndex.__new__(SymbolIndex)
+        index.items = list(self.items)
+        index._known = set(self._known)
+        index._trigrams = dict(self._trigrams)
+        index._symbols, index._symbol_ids = self._symbols, self._symbol_ids
+        index._words, index._word_ids = self._words, self._word_ids
+        index._add(items)
+        return index
+
+
+def load_snapshot(path) -> list:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get("result", []) if isinstance(data, dict) else data
+
+
+def download_symbols(token: str, exchange: str = 'US') -> list:
+    return get_upstream_client().get_json(
+        "https://finnhub.io/api/v1/stock/symbol",
+        params={"exchange": exchange},
+        headers={"X-Finnhub-Token": token},
+        timeout=30,
+    )
+
+
+_index = None
+_index_lock = threading.Lock()
+_refresher = None
+
+
+def get_symbol_index():
+    """
+    Current index (None until the snapshot has been loaded). The first call
+    loads the snapshot file and starts the background refresh thread.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = settings.SYMBOL_SNAPSHOT_PATH
+                try:
+                    _index = SymbolIndex(load_snapshot(path))
+                    logger.info("Symbol index loaded: %d symbols", len(_index))
+                except (OSError, ValueError) as e:
+                    logger.warning("Symbol snapshot %s not loaded: %s", path, e)
+                    _index = SymbolIndex()
+                _start_refresher()
+    return _index if len(_index) else None
+
+
+def search_symbols(query: str) -> list:
+    """Local matches for `query` (blocking: may load the snapshot first)."""
+    index = get_symbol_index()
+    return index.search(query) if index is not None else []
+
+
+def add_symbols(items):
+    """Merge symbols found through the Finnhub fallback into the index."""
+    global _index
+    with _index_lock:
+        _index = (_index or SymbolIndex()).merged_with(items)
+
+
+def refresh_snapshot(token: str):
+    """Download the universe, write the snapshot and swap the index."""
+    global _index
+    items = download_symbols(token)
+    index = SymbolIndex(items)
+    path = settings.SYMBOL_SNAPSHOT_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index.items, f)
+    tmp.replace(path)
+    with _index_lock:
+        _index = index
+    logger.info("Symbol index refreshed: %d symbols", len(index))
+
+
+def _start_refresher():
+    global _refresher
+    interval = settings.SYMBOL_INDEX_REFRESH
+    if _refresher is not None or interval <= 0:
+        return
+
+    def run():
+        # A recent snapshot on disk is reused until it is `interval` old
+        try:
+            age = time.time() - settings.SYMBOL_SNAPSHOT_PATH.stat().st_mtime
+            time.sleep(max(0, interval - age))
+        except OSError:
+            pass
+        while True:
+            try:
+                refresh_snapshot(settings.FINNHUB_API_TOKEN)
+            except Exception as e:
+                logger.warning("Symbol index refresh failed: %s", e)
+            time.sleep(interval)
+
+    _refresher = threading.Thread(target=run, name='symbol-index', daemon=True)
+    _refresher.start()
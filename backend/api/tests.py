@@ -1,3 +1,331 @@
-from django.test import TestCase
+import gzip
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.db import DatabaseError
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from . import reports
+from .aggregator import LiveBarAggregator
+from .cache import OHLCVCache
+from .consumers import OutboundQueue
+from .downsample import lttb_indices, parse_time_param
+from .indicators import IndicatorSet, compute_indicators, parse_indicators
+from .middleware import CompressionMiddleware
+from .providers import SyntheticProvider, split_download
+from .resample import PERIOD_SPECS, derive_period
+from .simulator import bridge_ticks
+from .symbols import SymbolIndex
+from .views import aggregate_cst_onehour_first_halfhour
+
+ANCHOR = '2024-03-06'
+CHICAGO = 'America/Chicago'
+
+
+class SplitDownloadTests(SimpleTestCase):
+    def test_flat_frame_for_single_ticker(self):
+        grouped = SyntheticProvider(anchor=ANCHOR).download(
+            ['AAPL'], period='1mo', interval='1d'
+        )
+        flat = grouped.xs('AAPL', axis=1, level=-1)
+        frames = split_download(flat, ['AAPL'])
+        self.assertEqual(list(frames), ['AAPL'])
+        pd.testing.assert_frame_equal(
+            frames['AAPL'], split_download(grouped)['AAPL']
+        )
+        with self.assertRaises(ValueError):
+            split_download(flat, ['AAPL', 'MSFT'])
+
+
+class StreamingCompressionTests(SimpleTestCase):
+    def test_ndjson_stream_is_gzipped_chunk_by_chunk(self):
+        lines = [b'{"time":[%d],"close":[1.5]}\n' % i for i in range(200)]
+
+        def view(request):
+            return StreamingHttpResponse(
+                iter(lines), content_type='application/x-ndjson'
+            )
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(view)(request)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        parts = list(response.streaming_content)
+        self.assertGreater(len(parts), 1)
+        body = b''.join(parts)
+        self.assertEqual(gzip.decompress(body), b''.join(lines))
+        self.assertLess(len(body), len(b''.join(lines)) // 2)
+
+
+def bars_frame(start: str, count: int, value: float = 1.0) -> pd.DataFrame:
+    index = pd.date_range(start, periods=count, freq='min', tz='UTC')
+    return pd.DataFrame({'Close': np.full(count, value)}, index=index)
+
+
+class OHLCVCacheTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('api.cache.time')
+        self.clock = patcher.start().monotonic
+        self.clock.return_value = 0.0
+        self.addCleanup(patcher.stop)
+
+    def test_fresh_entry_is_served_without_fetching(self):
+        cache = OHLCVCache(max_bytes=10**6)
+        fetch = mock.Mock(return_value=bars_frame('2024-01-02 15:00', 5))
+        key = ('SPY', '1m', False)
+
+        first = cache.get_or_fetch(key, fetch)
+        self.clock.return_value = cache.ttl_for('1m') - 1
+        second = cache.get_or_fetch(key, fetch)
+
+        self.assertIs(first, second)
+        fetch.assert_called_once_with(None)
+        self.assertEqual((cache.hits, cache.misses, cache.refreshes), (1, 1, 0))
+
+    def test_expired_entry_refreshes_only_the_tail(self):
+        cache = OHLCVCache(max_bytes=10**6)
+        key = ('SPY', '1m', False)
+        cache.get_or_fetch(key, lambda start: bars_frame('2024-01-02 15:00', 5))
+        self.clock.return_value = cache.ttl_for('1m') + 1
+        tail = bars_frame('2024-01-02 15:04', 2, value=2.0)
+        fetch = mock.Mock(return_value=tail)
+
+        frame = cache.get_or_fetch(key, fetch)
+
+        fetch.assert_called_once_with(pd.Timestamp('2024-01-02 15:04', tz='UTC'))
+        self.assertEqual(len(frame), 6)
+        self.assertEqual(frame['Close'].tolist(), [1.0] * 4 + [2.0] * 2)
+        self.assertEqual(cache.refreshes, 1)
+
+    def test_evicts_least_recently_used(self):
+        size = bars_frame('2024-01-02', 100).memory_usage(index=True, deep=True).sum()
+        cache = OHLCVCache(max_bytes=int(size * 2.5))
+        keys = [(ticker, '1m', False) for ticker in ('A', 'B', 'C')]
+        cache.get_or_fetch(keys[0], lambda start: bars_frame('2024-01-02', 100))
+        cache.get_or_fetch(keys[1], lambda start: bars_frame('2024-01-02', 100))
+        cache.get_or_fetch(keys[0], mock.Mock())  # A is now the most recent
+
+        cache.get_or_fetch(keys[2], lambda start: bars_frame('2024-01-02', 100))
+
+        self.assertIsNotNone(cache.peek(keys[0]))
+        self.assertIsNone(cache.peek(keys[1]))
+        self.assertIsNotNone(cache.peek(keys[2]))
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+
+def reference_onehour(df: pd.DataFrame) -> pd.DataFrame:
+    """Original row-by-row 1h bucketing: 08:30-09:00 CST, then hourly to 15:00."""
+    cst = df.index.tz_convert(CHICAGO)
+    day = cst.normalize()
+    minutes = cst.hour * 60 + cst.minute
+    in_session = (minutes >= 8 * 60 + 30) & (minutes < 15 * 60)
+    bucket = np.where(
+        minutes < 9 * 60,
+        day + pd.Timedelta(hours=8, minutes=30),
+        day + pd.to_timedelta(cst.hour, 'h'),
+    )
+    work = df[in_session].copy()
+    work.columns = [c.lower() for c in work.columns]
+    work['_bucket'] = pd.DatetimeIndex(bucket[in_session]).tz_convert('UTC')
+    grouped = work.groupby('_bucket', as_index=False).agg(
+        open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+        close=('close', 'last'), volume=('volume', 'sum'),
+    )
+    grouped['time'] = grouped['_bucket'].astype('int64') // 10**9
+    return grouped[['time', 'open', 'high', 'low', 'close', 'volume']]
+
+
+class SessionAggregationTests(SimpleTestCase):
+    def test_onehour_matches_original_bucketing(self):
+        # Crosses the 2024-03-10 DST change
+        frame = SyntheticProvider(anchor='2024-03-15', days=18).frame('SPY', '5m')
+
+        out = aggregate_cst_onehour_first_halfhour(frame)
+
+        expected = reference_onehour(frame)
+        for column in ('time', 'volume'):
+            np.testing.assert_array_equal(
+                out[column].to_numpy(), expected[column].to_numpy()
+            )
+        for column in ('open', 'high', 'low', 'close'):
+            np.testing.assert_allclose(
+                out[column].to_numpy(), expected[column].to_numpy()
+            )
+
+
+class DownsampleTests(SimpleTestCase):
+    def test_parse_time_param(self):
+        self.assertEqual(parse_time_param('1700000000'), 1700000000)
+        self.assertEqual(parse_time_param('2024-01-31'), 1706659200)
+        self.assertIsNone(parse_time_param(''))
+        for value in ('inf', '-inf', 'nan', '1e30', 'yesterday', '99999-01-01'):
+            with self.assertRaises(ValueError, msg=value):
+                parse_time_param(value)
+
+    def test_lttb_keeps_at_most_threshold_points(self):
+        y = np.cumsum(np.random.default_rng(3).normal(size=1950))
+        for threshold in (1, 2, 3, 10, 1000):
+            keep = lttb_indices(y, threshold)
+            self.assertLessEqual(len(keep), threshold)
+            self.assertTrue(np.all(np.diff(keep) > 0))
+        keep = lttb_indices(y, 1000)
+        self.assertEqual(len(keep), 1000)
+        self.assertEqual((keep[0], keep[-1]), (0, len(y) - 1))
+
+
+class MarketDataParamTests(SimpleTestCase):
+    def assertBadRequest(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 400, params)
+        self.assertIn('error', response.json())
+
+    def test_invalid_params_are_400(self):
+        for path in ('/api/market-data', '/api/market-data/batch'):
+            for params in (
+                {'from': 'inf'}, {'from': '1e30'}, {'to': 'nan'}, {'limit': '0'},
+                {'mode': 'line', 'max_points': '2'},
+            ):
+                self.assertBadRequest(path, tickers='SPY', **params)
+
+
+class ReportsViewTests(SimpleTestCase):
+    def test_falls_back_to_live_fetch_without_store(self):
+        live = ([{'symbol': 'AAPL', 'upcoming': None, 'history': []}], ['NVDA'])
+        store = mock.patch(
+            'api.views.load_entries_from_store', side_effect=DatabaseError
+        )
+        fetch = mock.patch('api.views.fetch_earnings_concurrently', return_value=live)
+        with store, fetch:
+            response = self.client.get('/api/reports/')
+
+        self.assertEqual(response.status_code, 200)
+        symbols = [report['symbol'] for report in response.json()['past_reports']]
+        self.assertEqual(symbols, ['AAPL'])
+        self.assertEqual(response.json()['failed'], ['NVDA'])
+
+    def test_queued_tickers_get_their_own_timeout(self):
+        def fetch(symbol, hoy):
+            time.sleep(0.5 if symbol == 'SLOW' else 0.05)
+            return {'symbol': symbol, 'upcoming': None, 'history': []}
+
+        symbols = ['A', 'B', 'C', 'D', 'SLOW', 'E', 'F']
+        with mock.patch.object(reports, 'fetch_ticker_earnings', fetch), \
+                mock.patch.object(reports, '_reports_executor', ThreadPoolExecutor(2)):
+            results, failed = reports.fetch_earnings_concurrently(
+                symbols, None, timeout=0.1
+            )
+
+        self.assertEqual(failed, ['SLOW'])
+        self.assertEqual(len(results), 6)
+
+
+class SymbolIndexTests(SimpleTestCase):
+    items = [
+        {'symbol': 'AAPL', 'description': 'APPLE INC', 'type': 'Common Stock'},
+        {'symbol': 'MSFT', 'description': 'MICROSOFT CORP', 'type': 'Common Stock'},
+    ]
+
+    def test_mid_word_substring(self):
+        index = SymbolIndex(self.items)
+        for query, symbol in (('pple', 'AAPL'), ('rosof', 'MSFT')):
+            found = [item['symbol'] for item in index.search(query)]
+            self.assertEqual(found, [symbol])
+
+    def test_merge_matches_full_build(self):
+        extra = [{
+            'symbol': 'PAPL', 'description': 'PINEAPPLE FARMS', 'type': 'Common Stock',
+        }]
+        merged = SymbolIndex(self.items).merged_with(extra)
+        full = SymbolIndex(self.items + extra)
+        for query in ('AP', 'PAPL', 'apple', 'farms', 'neapp'):
+            self.assertEqual(merged.search(query), full.search(query), query)
+
+
+class BridgeTicksTests(SimpleTestCase):
+    def test_paths_hit_the_bar_extremes(self):
+        rng = np.random.default_rng(7)
+        n = 200
+        open_ = np.round(100 + rng.normal(0, 1, n), 2)
+        close = np.round(100 + rng.normal(0, 1, n), 2)
+        high = np.maximum(open_, close) + np.round(rng.uniform(0.01, 1, n), 2)
+        low = np.minimum(open_, close) - np.round(rng.uniform(0.01, 1, n), 2)
+        bars = {
+            'time': np.arange(n), 'open': open_, 'high': high, 'low': low,
+            'close': close, 'volume': rng.integers(100, 10_000, n),
+        }
+
+        ticks = bridge_ticks(bars, 16, rng)
+
+        np.testing.assert_allclose(ticks['price'][:, 0], open_)
+        np.testing.assert_allclose(ticks['price'][:, -1], close)
+        np.testing.assert_allclose(ticks['price'].max(axis=1), high)
+        np.testing.assert_allclose(ticks['price'].min(axis=1), low)
+        np.testing.assert_array_equal(ticks['size'].sum(axis=1), bars['volume'])
+        np.testing.assert_array_equal(ticks['volume'][:, -1], bars['volume'])
+
+    def test_needs_four_ticks(self):
+        columns = ('time', 'open', 'high', 'low', 'close', 'volume')
+        bars = {k: np.ones(1) for k in columns}
+        with self.assertRaises(ValueError):
+            bridge_ticks(bars, 3, np.random.default_rng(0))
+
+
+class OutboundQueueTests(SimpleTestCase):
+    def test_byte_rate_delays_next_flush_without_acks(self):
+        queue = OutboundQueue(rate=10, max_pending=4, window=8, max_bytes_rate=1000)
+        queue.push(('SPY', '1m', 1), {'time': 1})
+        queue.drain(0.0)
+
+        queue.sent(500, 0.0)
+
+        self.assertAlmostEqual(queue.delay(0.0), 0.5)
+        self.assertIsNone(queue.acked)
+
+    def test_pending_room_grows_with_subscriptions(self):
+        queue = OutboundQueue(rate=10, max_pending=4, window=8)
+        queue.set_streams(50)
+        for i in range(50):
+            queue.push((f'T{i}', '1m', 1), {'time': 1})
+        self.assertEqual((len(queue.pending), queue.dropped), (50, 0))
+
+
+class LiveDailyBarTests(SimpleTestCase):
+    def test_live_daily_bar_updates_last_historical_bar(self):
+        daily = SyntheticProvider(anchor=ANCHOR, days=30).frame('SPY', '1d')
+        # Yahoo's daily index may be naive or at exchange-local midnight
+        for frame in (daily, daily.tz_localize('America/New_York')):
+            history = derive_period(frame, PERIOD_SPECS['1d'])
+            tick = pd.Timestamp(f'{ANCHOR} 10:00', tz=CHICAGO).value
+
+            updates = LiveBarAggregator(['1d']).update(tick, 100.0, 10)
+
+            [(interval, delta, bar)] = updates
+            self.assertEqual(interval, '1d')
+            self.assertEqual(bar['time'], history['time'].iloc[-1])
+            self.assertEqual(delta['t'], history['time'].iloc[-1])
+
+
+class IndicatorTests(SimpleTestCase):
+    def test_incremental_matches_vectorized(self):
+        frame = SyntheticProvider(anchor=ANCHOR, days=20).frame('SPY', '5m')
+        series = derive_period(frame, PERIOD_SPECS['1h'])
+        specs = parse_indicators('sma:5,ema:5,rsi:5,macd:3:6:2,bb:5:2,atr:5,vwap')
+
+        expected = compute_indicators(series, specs, CHICAGO)
+
+        live = IndicatorSet(specs, CHICAGO)
+        rows = []
+        for bar in series.to_dict('records'):
+            values = live.update(bar['time'], bar)
+            rows.append({k: np.nan if v is None else v for k, v in values.items()})
+        incremental = pd.DataFrame(rows)
+        for column in expected.columns.drop('time'):
+            np.testing.assert_allclose(
+                incremental[column].to_numpy(dtype=np.float64),
+                expected[column].to_numpy(dtype=np.float64),
+                rtol=1e-9, err_msg=column,
+            )
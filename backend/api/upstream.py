@@ -0,0 +1,174 @@
+"""
+Shared client for upstream market-data APIs (Yahoo via the provider, Finnhub).
+
+- One keep-alive `requests.Session` per host, with a bounded connection pool
+  (Finnhub; Yahoo goes through yfinance and its own session, see `download`).
+- Single-flight: concurrent identical calls share one upstream request; the
+  followers wait for the leader's result (or exception).
+- Counters (`stats()`) show how many calls were made and coalesced.
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .metrics import Counter, Gauge, timed
+from .providers import get_provider
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class UpstreamClient:
+    def __init__(self, pool_size: int = 20, timeout: float = 10):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._flight = SingleFlight()
+
+    def session_for(self, url: str) -> requests.Session:
+        host = urlsplit(url).netloc
+        session = self._sessions.get(host)
+        if session is None:
+            with self._sessions_lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1, pool_maxsize=self.pool_size
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._sessions[host] = session
+        return session
+
+    def get_json(self, url: str, params: dict = None, headers: dict = None,
+                 timeout: float = None):
+        """
+        GET `url` and return the decoded JSON (shared between coalesced
+        callers: treat it as read-only). Raises requests exceptions.
+        """
+        def fetch():
+            response = self.session_for(url).get(
+                url, params=params, headers=headers, timeout=timeout or self.timeout
+            )
+            response.raise_for_status()
+            return response.json()
+
+        key = ('GET', url, _freeze(params or {}), _freeze(headers or {}))
+        with timed('upstream'):
+            return self._flight.do(key, fetch)
+
+    def download(self, tickers, **kwargs):
+        """
+        Coalesced `yf.download` (through the configured market-data provider).
+        Each caller gets its own shallow copy, so renaming/flattening columns
+        does not affect the others.
+
+        Yahoo traffic is not pooled by `session_for`: yfinance only accepts
+        curl_cffi sessions (it rejects a `requests.Session`) and already
+        reuses one process-wide session of its own for every call.
+        """
+        key = ('yf.download', _freeze(tickers), _freeze(kwargs))
+        with timed('upstream'):
+            data = self._flight.do(
+                key, lambda: get_provider().download(tickers, **kwargs)
+            )
+        return data.copy(deep=False)
+
+    def stats(self) -> dict:
+        return {
+            'executed': self._flight.executed,
+            'coalesced': self._flight.coalesced,
+            'in_flight': self._flight.in_flight,
+            'hosts': len(self._sessions),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_upstream_client() -> UpstreamClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = UpstreamClient(
+                    pool_size=settings.UPSTREAM_POOL_SIZE,
+                    timeout=settings.UPSTREAM_TIMEOUT,
+                )
+    return _client
+
+
+UPSTREAM_CALLS = Counter(
+    'upstream_calls_total',
+    'Upstream calls by outcome: executed or coalesced (single-flight)',
+    ['outcome'],
+    callback=lambda: {
+        ('executed',): get_upstream_client().stats()['executed'],
+        ('coalesced',): get_upstream_client().stats()['coalesced'],
+    },
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    'upstream_in_flight', 'Upstream calls currently running',
+    callback=lambda: get_upstream_client().stats()['in_flight'],
+)
@@ -1,8 +1,16 @@
 from django.urls import path
-from .views import MarketDataView, SymbolSearchView, ReportsView
+from .views import (
+    IndicatorsView,
+    MarketDataBatchView,
+    MarketDataView,
+    ReportsView,
+    SymbolSearchView,
+)
 
 urlpatterns = [
     path("market-data", MarketDataView.as_view(), name="market-data"),
+    path("market-data/batch", MarketDataBatchView.as_view(), name="market-data-batch"),
+    path("indicators", IndicatorsView.as_view(), name="indicators"),
     path("symbol-search", SymbolSearchView.as_view(), name="symbol-search"),
-    path('reports/', ReportsView.as_view(), name='reports'), 
+    path('reports/', ReportsView.as_view(), name='reports'),
 ]
@@ -1,205 +1,413 @@
-import math
+import asyncio
+import logging
 import requests
 from django.conf import settings
-from rest_framework.views import APIView
+from django.db import DatabaseError
+from django.http import HttpResponse
+from asgiref.sync import sync_to_async
 from rest_framework.response import Response
-import os
-import yfinance as yf
 import pandas as pd
-from datetime import datetime
-import locale
-
-FINNHUB_API_TOKEN = os.environ.get(
-    "FINNHUB_API_TOKEN", "d292e3pr01qhoen9cd70d292e3pr01qhoen9cd7g"
+from datetime import date, datetime
+from .async_api import AsyncAPIView, run_blocking
+from .barstore import get_bar_store
+from .cache import get_ohlcv_cache
+from .downsample import downsample, parse_time_param, slice_series
+from .indicators import compute_indicators, parse_indicators
+from .metrics import CONTENT_TYPE, REGISTRY, timed
+from .providers import split_download
+from .renderers import SERIES_RENDERERS
+from .reports import (
+    build_response,
+    fetch_earnings_concurrently,
+    load_entries_from_store,
+    reports_budget,
 )
+from .resample import BASE_SERIES, base_arrays, derive_period, get_period_spec
+from .sessions import CST_FIRST_HALF_HOUR, SessionTemplate, aggregate_ohlcv
+from .symbols import add_symbols, is_listed_symbol, search_symbols
+from .upstream import get_upstream_client
+
+logger = logging.getLogger(__name__)
+
+FINNHUB_API_TOKEN = settings.FINNHUB_API_TOKEN
+
 
 def get_yfinance_params(period: str):
     """
-    Translate our period string to yfinance params.
-    For '1h' we purposely fetch 5m / 60d to aggregate server-side
-    into: 8:30–9:00 (half hour) then hourly buckets in CST.
+    Translate our period string to the yfinance params of its base series.
+    Periods sharing a base ('15m'/'1h' on 5m/60d, '1d'/'1w' on daily/max)
+    are derived locally from the same cached download, see api/resample.py.
     """
-    if period == '1m':
-        return {'period': '7d', 'interval': '1m'}
-    elif period == '15m':
-        return {'period': '60d', 'interval': '15m'}
-    elif period == '1h':
-        # Use 5m to allow custom CST bucketing; 60d is the max for 5m on Yahoo
-        return {'period': '60d', 'interval': '5m'}
-    elif period == '1d':
-        return {'period': '5y', 'interval': '1d'}
-    elif period == '1w':
-        return {'period': 'max', 'interval': '1wk'}
-    else:
-        return {'period': '5y', 'interval': '1d'}
+    return BASE_SERIES[get_period_spec(period).base]
 
 
-def _to_cst(ts_series: pd.Series) -> pd.Series:
+def aggregate_cst_onehour_first_halfhour(df: pd.DataFrame,
+                                         template: SessionTemplate = CST_FIRST_HALF_HOUR
+                                         ) -> pd.DataFrame:
     """
-    Ensure tz-aware series in America/Chicago (handles both tz-aware and naive).
+    Input df: columns include a datetime-like index or 'Datetime'/'datetime' column,
+              and OHLC (+ optional 'Volume'/'volume').
+    Output: DataFrame with columns: time (UTC seconds), open, high, low, close, [volume]
+
+    By default buckets are 8:30–9:00 CST and then hourly until the close;
+    pass another `SessionTemplate` for other bucket widths / sessions.
     """
-    s = pd.to_datetime(ts_series, utc=True, errors='coerce')
-    # s is now tz-aware UTC; convert to America/Chicago (CST/CDT as appropriate)
-    return s.dt.tz_convert('America/Chicago')
+    # 1) Shared normalization: int64 UTC nanoseconds + float64 / int64 arrays
+    utc_ns, arrays = base_arrays(df)
+
+    # 2) Vectorized CST session bucketing + OHLCV aggregation
+    out = aggregate_ohlcv(
+        utc_ns, arrays['open'], arrays['high'], arrays['low'], arrays['close'],
+        arrays.get('volume'), template=template,
+    )
+
+    # 3) Bucket start in UTC seconds
+    out['time'] //= 10**9
+    # Arrays freshly built by aggregate_ohlcv: no copy needed
+    return pd.DataFrame(out, copy=False)
 
 
-def _bucket_start_cst(ts_cst: pd.Timestamp) -> pd.Timestamp:
+def download_ohlcv(ticker: str, yf_params: dict, start=None) -> pd.DataFrame:
     """
-    Given a tz-aware Timestamp in America/Chicago, return the bucket start:
-      - If 08:30–08:59 → 08:30
-      - If 09:00–14:59 → hour start (09:00, 10:00, ..., 14:00)
-      - Else → NaT (outside regular session)
+    Download OHLCV bars from Yahoo with flattened columns and the datetime
+    in the index. With `start` only bars from that moment on are requested
+    (used by the cache to refresh the tail).
     """
-    if ts_cst.tz is None:
-        return pd.NaT
+    kwargs = {
+        'interval': yf_params['interval'], 'auto_adjust': False, 'progress': False,
+    }
+    if start is None:
+        kwargs['period'] = yf_params['period']
+    else:
+        kwargs['start'] = start
+    data = get_upstream_client().download(ticker, **kwargs)
+
+    # yfinance returns columns like ('Open','High','Low','Close','Adj Close','Volume')
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    return data
 
-    day = ts_cst.normalize()  # midnight, same tz
-    open_ = day + pd.Timedelta(hours=8, minutes=30)
-    nine  = day + pd.Timedelta(hours=9)
-    close = day + pd.Timedelta(hours=15)
 
-    if ts_cst < open_ or ts_cst >= close:
-        return pd.NaT
-    if ts_cst < nine:
-        return open_
-    # truncate to the hour
-    hour_start = day + pd.Timedelta(hours=ts_cst.hour)
-    return hour_start
+def download_ohlcv_many(tickers, yf_params: dict, start=None) -> dict:
+    """
+    `download_ohlcv` for many tickers with one grouped `yf.download` call,
+    split per ticker → {ticker: frame}; tickers without data are left out.
+    """
+    kwargs = {
+        'interval': yf_params['interval'], 'auto_adjust': False, 'progress': False,
+    }
+    if start is None:
+        kwargs['period'] = yf_params['period']
+    else:
+        kwargs['start'] = start
+    data = get_upstream_client().download(list(tickers), **kwargs)
+    if data.empty:
+        return {}
+    return split_download(data, tickers)
+
 
+def get_cached_ohlcv(ticker: str, yf_params: dict, start=None,
+                     end=None) -> pd.DataFrame:
+    """
+    Cached `download_ohlcv` keyed by (ticker, interval, auto_adjust).
+    The returned frame is shared: do not modify it in place.
 
-def aggregate_cst_onehour_first_halfhour(df: pd.DataFrame) -> pd.DataFrame:
+    With the bar store enabled (api/barstore.py) the series comes from disk
+    instead, and `start` / `end` (UTC seconds) can reach history older
+    than the download period.
     """
-    Input df: columns include a datetime-like index or 'Datetime'/'datetime' column,
-              and OHLC (+ optional 'Volume'/'volume').
-    Output: DataFrame with columns: time (UTC seconds), open, high, low, close, [volume]
+    key = (ticker, yf_params['interval'], False)
+    store = get_bar_store()
+    if store is not None:
+        return store.get_or_fetch(
+            key,
+            lambda since: download_ohlcv(ticker, yf_params, start=since),
+            period=yf_params['period'], start=start, end=end,
+        )
+    return get_ohlcv_cache().get_or_fetch(
+        key,
+        lambda start: download_ohlcv(ticker, yf_params, start=start),
+        period=yf_params['period'],
+    )
+
+
+def get_cached_ohlcv_many(tickers, yf_params: dict, start=None, end=None) -> dict:
     """
-    # 1) Build a proper datetime column (tz-aware UTC)
-    if 'Datetime' in df.columns:
-        dt_utc = pd.to_datetime(df['Datetime'], utc=True, errors='coerce')
-    elif 'datetime' in df.columns:
-        dt_utc = pd.to_datetime(df['datetime'], utc=True, errors='coerce')
+    Batch `get_cached_ohlcv`: cached series are served as-is, the rest
+    come from one grouped download (plus one for the expired tails).
+    Returns {ticker: frame}, empty frames for tickers without data.
+    """
+    interval = yf_params['interval']
+
+    def fetch_many(keys, start):
+        frames = download_ohlcv_many([key[0] for key in keys], yf_params, start=start)
+        return {(ticker, interval, False): frame for ticker, frame in frames.items()}
+
+    keys = [(ticker, interval, False) for ticker in tickers]
+    store = get_bar_store()
+    if store is not None:
+        frames = store.get_or_fetch_many(
+            keys, fetch_many, period=yf_params['period'], start=start, end=end,
+        )
     else:
-        # If datetime lives in the index:
-        if isinstance(df.index, pd.DatetimeIndex):
-            # Make sure index is UTC
-            if df.index.tz is None:
-                dt_utc = pd.to_datetime(df.index, utc=True)
-            else:
-                dt_utc = df.index.tz_convert('UTC')
-        else:
-            raise ValueError("No datetime column or DatetimeIndex found.")
-
-    # 2) Convert to CST (auto DST handling)
-    dt_cst = dt_utc.dt.tz_convert('America/Chicago')
-
-    # 3) Compute bucket starts (CST)
-    buckets_cst = dt_cst.apply(_bucket_start_cst)
-    mask = buckets_cst.notna()
-
-    if not mask.any():
-        return pd.DataFrame(columns=['time', 'open', 'high', 'low', 'close', 'volume'])
-
-    # 4) Group by bucket (convert bucket to UTC to be unambiguous)
-    buckets_utc = buckets_cst[mask].dt.tz_convert('UTC')
-
-    work = df.loc[mask].copy()
-    work['_bucket_utc'] = buckets_utc.values
-
-    # Normalize column names to lower-case for OHLC
-    work.columns = [str(c).lower() for c in work.columns]
-
-    # Volume might be 'volume' or absent
-    has_volume = 'volume' in work.columns
-
-    agg_dict = {
-        'open':  ('open',  'first'),
-        'high':  ('high',  'max'),
-        'low':   ('low',   'min'),
-        'close': ('close', 'last'),
+        frames = get_ohlcv_cache().get_or_fetch_many(
+            keys, fetch_many, period=yf_params['period'],
+        )
+    return {key[0]: frames[key] for key in keys}
+
+
+def _positive_int_param(request, name: str):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    number = int(value)
+    if number <= 0:
+        raise ValueError(f"'{name}' must be a positive integer")
+    return number
+
+
+def _max_points_param(request, mode: str):
+    max_points = _positive_int_param(request, 'max_points')
+    # LTTB always keeps the first and last bar plus one per bucket
+    if mode == 'line' and max_points is not None and max_points < 3:
+        raise ValueError("'max_points' must be at least 3 with mode=line")
+    return max_points
+
+
+def build_market_data(ticker: str, period_str: str, start=None, end=None,
+                      limit=None, max_points=None, mode='ohlc'):
+    """
+    Blocking part of MarketDataView: cached download + local resampling,
+    range slicing and downsampling. Returns None when Yahoo has no data.
+    """
+    data = get_cached_ohlcv(ticker, get_yfinance_params(period_str), start, end)
+    if data.empty:
+        return None
+    return shape_series(data, period_str, start, end, limit, max_points, mode)
+
+
+def shape_series(data: pd.DataFrame, period_str: str, start=None, end=None,
+                 limit=None, max_points=None, mode='ohlc') -> pd.DataFrame:
+    """Cached base frame → the chart series of `period_str`."""
+    # Resample / roll up locally from the shared base series
+    with timed('transform'):
+        historical_data = derive_period(data, get_period_spec(period_str))
+        historical_data = slice_series(historical_data, start, end, limit)
+        if max_points:
+            historical_data = downsample(historical_data, max_points, mode)
+    return historical_data
+
+
+def build_market_data_batch(tickers, period_str: str, start=None, end=None,
+                            limit=None, max_points=None, mode='ohlc') -> dict:
+    """
+    Blocking part of MarketDataBatchView for one chunk of tickers: grouped
+    download of the ones not cached, then the same shaping as
+    build_market_data. Returns {ticker: series or None (no data)}.
+    """
+    frames = get_cached_ohlcv_many(tickers, get_yfinance_params(period_str), start, end)
+    return {
+        ticker: None if frame.empty else
+        shape_series(frame, period_str, start, end, limit, max_points, mode)
+        for ticker, frame in frames.items()
     }
-    if has_volume:
-        agg_dict['volume'] = ('volume', 'sum')
-
-    grouped = (
-        work
-        .groupby('_bucket_utc', as_index=False)
-        .agg(**agg_dict)
-        .sort_values('_bucket_utc')
-    )
 
-    # 5) Bucket start in UTC seconds
-    grouped['time'] = (grouped['_bucket_utc'].view('int64') // 10**9).astype(int)
 
-    cols = ['time', 'open', 'high', 'low', 'close']
-    if has_volume:
-        cols.append('volume')
+def build_indicators(ticker: str, period_str: str, specs, start=None, end=None,
+                     limit=None):
+    """
+    Blocking part of IndicatorsView: indicators over the whole cached series
+    (so the first bars of a range are already warmed up), then the range.
+    """
+    data = get_cached_ohlcv(ticker, get_yfinance_params(period_str))
+    if data.empty:
+        return None
+    with timed('transform'):
+        series = derive_period(data, get_period_spec(period_str))
+    with timed('indicators'):
+        values = compute_indicators(series, specs, CST_FIRST_HALF_HOUR.tz)
+    return slice_series(values, start, end, limit)
 
-    return grouped[cols]
 
 # VISTAS
 
-class MarketDataView(APIView):
-    def get(self, request):
+class MarketDataView(AsyncAPIView):
+    # Records JSON by default; columns / msgpack / arrow via Accept or ?format=,
+    # ndjson / msgpack-stream stream long histories in chunks
+    renderer_classes = SERIES_RENDERERS
+
+    async def get(self, request):
         ticker = request.query_params.get("ticker", "SPY").upper()
         period_str = request.query_params.get('period', '1d')
 
-        yf_params = get_yfinance_params(period_str)
-        print(f"Fetching data for Ticker: {ticker}, Period: {period_str}...")
+        logger.info("Fetching data for ticker %s, period %s", ticker, period_str)
+
+        # Optional range / size: ?from=&to= (epoch seconds or ISO date, `to`
+        # exclusive so older pages chain on the first loaded bar), ?limit=
+        # (most recent N bars of the range), ?max_points= (&mode=line for LTTB)
+        mode = request.query_params.get('mode', 'ohlc')
+        try:
+            start = parse_time_param(request.query_params.get('from'))
+            end = parse_time_param(request.query_params.get('to'))
+            limit = _positive_int_param(request, 'limit')
+            max_points = _max_points_param(request, mode)
+        except ValueError as e:
+            return Response({"error": f"Invalid query parameter: {e}"}, status=400)
 
         try:
-            data = yf.download(
-                ticker,
-                period=yf_params['period'],
-                interval=yf_params['interval'],
-                auto_adjust=False,
-                progress=False,
+            historical_data = await run_blocking(
+                build_market_data, ticker, period_str, start, end, limit, max_points,
+                mode,
+            )
+        except asyncio.TimeoutError:
+            raise
+        except Exception:
+            logger.exception("Market data failed for %s %s", ticker, period_str)
+            return Response(
+                {"error": "An unexpected server error occurred."}, status=500
             )
 
-            if data.empty:
-                return Response(
-                    {"error": f"No data found for ticker: {ticker} with specified period."},
-                    status=404
-                )
+        if historical_data is None:
+            return Response(
+                {"error": f"No data found for ticker: {ticker} with specified period."},
+                status=404
+            )
+        return Response(historical_data)
+
 
-            # yfinance returns columns like ('Open','High','Low','Close','Adj Close','Volume')
-            if isinstance(data.columns, pd.MultiIndex):
-                data.columns = data.columns.get_level_values(0)
+class MarketDataBatchView(AsyncAPIView):
+    """
+    Several tickers of one period in a single round trip (watchlists,
+    multi-chart layouts): ?tickers=SPY,QQQ,IWM&period=1h, plus the same
+    range / size params and formats as /api/market-data.
 
-            data.reset_index(inplace=True)  # bring Datetime to columns
+    Tickers are fetched in chunks of MARKET_DATA_BATCH_CHUNK, one grouped
+    upstream download per chunk, and the chunks run in parallel.
 
-            # --- Custom CST aggregation ONLY for 1h ---
-            if period_str == '1h':
-                out = aggregate_cst_onehour_first_halfhour(data)
-                return Response(out.to_dict('records'))
+        {"period": "1h", "series": {"SPY": [...], "QQQ": [...]},
+         "missing": ["XXXX"], "failed": []}
 
-            # --- Default shaping (as you had) ---
-            cols = [c.lower() for c in data.columns]
-            data.columns = cols
+    `missing`: no data upstream; `failed`: their chunk's download failed.
+    """
+    renderer_classes = SERIES_RENDERERS
+
+    async def get(self, request):
+        tickers = []
+        for ticker in request.query_params.get("tickers", "").split(','):
+            ticker = ticker.strip().upper()
+            if ticker and ticker not in tickers:
+                tickers.append(ticker)
+        period_str = request.query_params.get('period', '1d')
 
-            if 'datetime' in data.columns:
-                data['time'] = pd.to_datetime(data['datetime']).apply(
-                    lambda d: int(pd.Timestamp(d).tz_localize('UTC').timestamp())
-                    if pd.Timestamp(d).tzinfo is None
-                    else int(pd.Timestamp(d).tz_convert('UTC').timestamp())
+        if not tickers:
+            return Response(
+                {"error": "No tickers requested (?tickers=SPY,QQQ)"}, status=400
+            )
+        max_tickers = settings.MARKET_DATA_BATCH_MAX_TICKERS
+        if len(tickers) > max_tickers:
+            return Response(
+                {"error": f"Too many tickers (max {max_tickers})"}, status=400
+            )
+        mode = request.query_params.get('mode', 'ohlc')
+        try:
+            start = parse_time_param(request.query_params.get('from'))
+            end = parse_time_param(request.query_params.get('to'))
+            limit = _positive_int_param(request, 'limit')
+            max_points = _max_points_param(request, mode)
+        except ValueError as e:
+            return Response({"error": f"Invalid query parameter: {e}"}, status=400)
+
+        logger.info(
+            "Fetching batch data for %d tickers, period %s", len(tickers), period_str
+        )
+
+        size = settings.MARKET_DATA_BATCH_CHUNK
+        chunks = [tickers[i:i + size] for i in range(0, len(tickers), size)]
+        results = await asyncio.gather(*(
+            run_blocking(
+                build_market_data_batch, chunk, period_str, start, end, limit,
+                max_points, mode,
+            )
+            for chunk in chunks
+        ), return_exceptions=True)
+
+        series, missing, failed = {}, [], []
+        errors = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, BaseException):
+                logger.error(
+                    "Batch chunk %s..%s failed", chunk[0], chunk[-1], exc_info=result
                 )
-            elif 'date' in data.columns:
-                data['time'] = pd.to_datetime(data['date']).dt.strftime('%Y-%m-%d')
+                errors.append(result)
+                failed.extend(chunk)
+                continue
+            for ticker in chunk:
+                if result.get(ticker) is None:
+                    missing.append(ticker)
+                else:
+                    series[ticker] = result[ticker]
+
+        if len(errors) == len(chunks):
+            # Ningún bloque respondió: mismo error que la vista individual
+            if any(isinstance(e, asyncio.TimeoutError) for e in errors):
+                raise asyncio.TimeoutError
+            return Response(
+                {"error": "An unexpected server error occurred."}, status=500
+            )
+        return Response({
+            "period": period_str, "series": series, "missing": missing,
+            "failed": failed,
+        })
 
-            base_cols = ['time', 'open', 'high', 'low', 'close']
-            if 'volume' in data.columns:
-                base_cols.append('volume')
 
-            historical_data = data[base_cols]
-            return Response(historical_data.to_dict('records'))
+class IndicatorsView(AsyncAPIView):
+    """
+    Technical indicators of a chart series, aligned with /api/market-data:
+    ?ticker=SPY&period=1h&indicators=sma:20,rsi:14,macd,bb:20:2,atr:14,vwap
+    (see api/indicators.py), with the same ?from=&to=&limit= and formats.
+    """
+    renderer_classes = SERIES_RENDERERS
 
-        except Exception as e:
-            print(f"ERROR: {e}")
-            return Response({"error": "An unexpected server error occurred."}, status=500)
+    async def get(self, request):
+        ticker = request.query_params.get("ticker", "SPY").upper()
+        period_str = request.query_params.get('period', '1d')
+
+        try:
+            specs = parse_indicators(request.query_params.get('indicators', ''))
+            start = parse_time_param(request.query_params.get('from'))
+            end = parse_time_param(request.query_params.get('to'))
+            limit = _positive_int_param(request, 'limit')
+        except ValueError as e:
+            return Response({"error": f"Invalid query parameter: {e}"}, status=400)
+        if not specs:
+            return Response(
+                {"error": "No indicators requested (?indicators=sma:20,...)"},
+                status=400,
+            )
+
+        try:
+            values = await run_blocking(
+                build_indicators, ticker, period_str, specs, start, end, limit
+            )
+        except asyncio.TimeoutError:
+            raise
+        except Exception:
+            logger.exception("Indicators failed for %s %s", ticker, period_str)
+            return Response(
+                {"error": "An unexpected server error occurred."}, status=500
+            )
+
+        if values is None:
+            return Response(
+                {"error": f"No data found for ticker: {ticker} with specified period."},
+                status=404
+            )
+        return Response(values)
 
 
 # VISTA NUEVA PARA BÚSQUEDA DE SÍMBOLOS
-class SymbolSearchView(APIView):
-    def get(self, request):
+class SymbolSearchView(AsyncAPIView):
+    async def get(self, request):
         # 1. Obtener el término de búsqueda de la URL (?q=...)
         query = request.query_params.get("q", "")
 
@@ -208,27 +416,35 @@ class SymbolSearchView(APIView):
             # Devolvemos una lista vacía para no hacer llamadas innecesarias a la API
             return Response({"result": []})
 
-        print(f"Buscando símbolos para: '{query}'")
+        # 3. Índice local en memoria (snapshot de Finnhub). La primera carga y
+        # la búsqueda se hacen en el pool para no bloquear el loop
+        local_results = await run_blocking(search_symbols, query)
+        if local_results:
+            return Response({"count": len(local_results), "result": local_results})
+
+        # 4. Sin coincidencias locales: respaldo con la API de Finnhub
+        print(f"Buscando símbolos en Finnhub para: '{query}'")
 
         try:
             url = "https://finnhub.io/api/v1/search"
             params = {"q": query}
             headers = {"X-Finnhub-Token": FINNHUB_API_TOKEN}
 
-            response = requests.get(url, params=params, headers=headers)
-            response.raise_for_status()  # Lanza un error para códigos 4xx/5xx
-
-            # La API de Finnhub devuelve un objeto con una clave 'result' que contiene la lista
-            data = response.json()
+            # Cliente compartido: conexión keep-alive y búsquedas idénticas
+            # simultáneas resueltas con una sola llamada (lanza error en 4xx/5xx)
+            # La API de Finnhub devuelve un objeto con una clave 'result' que
+            # contiene la lista
+            data = await run_blocking(
+                get_upstream_client().get_json, url, params=params, headers=headers
+            )
 
-            # Filtramos para devolver solo los símbolos de acciones comunes para limpiar los resultados
+            # Filtramos para devolver solo los símbolos de acciones comunes para
+            # limpiar los resultados
             filtered_results = [
-                item
-                for item in data.get("result", [])
-                if "." not in item.get("symbol", "")
-                and item.get("type") != "Crypto"
-                and item.get("symbol") != "APP"
+                item for item in data.get("result", []) if is_listed_symbol(item)
             ]
+            if filtered_results:
+                await run_blocking(add_symbols, filtered_results, timeout=None)
 
             return Response(
                 {"count": len(filtered_results), "result": filtered_results}
@@ -240,114 +456,40 @@ class SymbolSearchView(APIView):
             return Response(
                 {"error": f"Error al contactar la API de Finnhub: {e}"}, status=500
             )
-        
-MESES_ES = {
-    1: "Enero", 2: "Febrero", 3: "Marzo", 4: "Abril", 5: "Mayo", 6: "Junio",
-    7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
-}
-
-def format_date_es(dt_object):
-    """Formatea una fecha al estilo 'Julio 20 - 2025'."""
-    if not isinstance(dt_object, (datetime, pd.Timestamp)):
-        return None
-    month_name = MESES_ES.get(dt_object.month, '')
-    return f"{month_name} {dt_object.day} - {dt_object.year}"
 
-def to_float_or_none(value):
-    """Convierte un valor a float de forma segura, devolviendo None si falla o es NaN."""
-    if value is None or (isinstance(value, float) and math.isnan(value)):
-        return None
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return None
 
-class ReportsView(APIView):
-    # Lista de compañías que generan reportes de ganancias
-    STOCK_LIST = ['NVDA', 'AAPL', 'META', 'AMZN', 'TSLA', 'NFLX', 'PLTR', 'BAC', 'CVX', 'XOM']
-
-    def get(self, request):
-        all_reports_data = []
-        hoy = datetime.now()
-
-        for ticker_symbol in self.STOCK_LIST:
-            try:
-                print(f"Obteniendo datos de reportes para {ticker_symbol}...")
-                ticker = yf.Ticker(ticker_symbol)
-
-                if not isinstance(ticker.info, dict) or 'symbol' not in ticker.info:
-                    print(f" --> No se pudo obtener información básica para {ticker_symbol}. Saltando.")
-                    continue
-                
-                upcoming_report_date_obj = None
-                
-                # Intento #1: Usar ticker.calendar
-                calendar = ticker.calendar
-                if isinstance(calendar, pd.DataFrame) and not calendar.empty and 'Earnings Date' in calendar.columns:
-                    earnings_date = calendar['Earnings Date'][0]
-                    if isinstance(earnings_date, pd.Timestamp):
-                        upcoming_report_date_obj = earnings_date.to_pydatetime()
-                
-                # Intento #2: Usar ticker.info como respaldo
-                if not upcoming_report_date_obj and 'earningsTimestamp' in ticker.info:
-                    timestamp = ticker.info['earningsTimestamp']
-                    if timestamp:
-                        upcoming_report_date_obj = datetime.fromtimestamp(timestamp)
-                
-                upcoming_report_str = None
-                if upcoming_report_date_obj and upcoming_report_date_obj > hoy:
-                    upcoming_report_str = format_date_es(upcoming_report_date_obj)
-
-                # Obtener y formatear el historial de reportes
-                earnings_history = ticker.earnings_dates
-                past_reports = []
-                if isinstance(earnings_history, pd.DataFrame) and not earnings_history.empty:
-                    # Nos aseguramos de que las columnas clave existan antes de dropear NAs
-                    required_cols = ['Reported EPS', 'EPS Estimate']
-                    if all(col in earnings_history.columns for col in required_cols):
-                        history_df = earnings_history.dropna(subset=required_cols, how='any').sort_index(ascending=False)
-                        for date, row in history_df.head(10).iterrows():
-                            eps_estimate = to_float_or_none(row.get('EPS Estimate'))
-                            eps_actual = to_float_or_none(row.get('Reported EPS'))
-                            surprise_percent = None
-                            
-                            if eps_estimate is not None and eps_actual is not None and eps_estimate != 0:
-                                surprise_percent = ((eps_actual - eps_estimate) / abs(eps_estimate)) * 100
-
-                            past_reports.append({
-                                'date': format_date_es(date.to_pydatetime()),
-                                'eps_estimate': eps_estimate,
-                                'eps_actual': eps_actual,
-                                'surprise_percent': surprise_percent
-                            })
-                
-                if upcoming_report_str or past_reports:
-                    all_reports_data.append({
-                        'symbol': ticker_symbol,
-                        'upcoming_report_date': upcoming_report_str,
-                        'last_report': past_reports[0] if past_reports else None,
-                        'previous_reports': past_reports[1:] if len(past_reports) > 1 else []
-                    })
-
-            except Exception as e:
-                print(f"Error obteniendo datos para {ticker_symbol}: {e}")
-        
-        # Separamos los datos para la respuesta final
-        upcoming_final = [report for report in all_reports_data if report['upcoming_report_date']]
-        
-        # Para ordenar, necesitamos convertir la fecha de string a objeto datetime de nuevo
-        def sort_key_date(item):
-            try:
-                # El locale debe estar configurado para que '%B' funcione con nombres en español
-                locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-                return datetime.strptime(item['upcoming_report_date'], '%B %d - %Y')
-            except (ValueError, locale.Error):
-                # Fallback por si el locale o el formato fallan
-                return datetime.max
-
-        upcoming_final.sort(key=sort_key_date)
-        
-        return Response({
-            'upcoming_reports': upcoming_final,
-            'past_reports': all_reports_data
-        })
\ No newline at end of file
+class ReportsView(AsyncAPIView):
+    # Lista de compañías que generan reportes de ganancias (REPORTS_WATCHLIST)
+    STOCK_LIST = settings.REPORTS_WATCHLIST
+
+    async def get(self, request):
+        # Los datos se precalculan con `manage.py refresh_earnings`; aquí solo
+        # se leen de la base de datos
+        try:
+            entries = await sync_to_async(load_entries_from_store)(
+                self.STOCK_LIST, date.today()
+            )
+        except DatabaseError as e:
+            # p. ej. migraciones sin aplicar: se sirve en vivo en lugar de un 500
+            logger.warning("Earnings store not available, fetching live: %s", e)
+            entries = None
+        if entries is not None:
+            return Response(build_response(entries))
+
+        # Base de datos vacía o no disponible (aún no se ha ejecutado el
+        # refresco): en vivo, en el pool de upstream para no frenar al resto
+        # de peticiones
+        budget = reports_budget(len(self.STOCK_LIST))
+        results, failed = await run_blocking(
+            fetch_earnings_concurrently, self.STOCK_LIST, datetime.now(),
+            timeout=budget + settings.UPSTREAM_REQUEST_TIMEOUT,
+        )
+        entries = [
+            (data['symbol'], data['upcoming'], data['history']) for data in results
+        ]
+        return Response(build_response(entries, failed))
+
+
+async def metrics(request):
+    """Métricas del proceso en formato Prometheus (api/metrics.py)."""
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,160 @@
+"""
+WebSocket wire format for live updates.
+
+Publishers encode every update once (`update_event`): the group event
+carries the payload already serialized as JSON text and as msgpack bytes.
+Consumers never re-serialize it; they only splice the per-connection
+sequence number around the pre-encoded payload:
+
+    JSON     {"type": "ticker.update", "seq": N, "payload": {...}}
+    msgpack  the same map, sent as a binary frame
+
+Frames of the multiplexed stream also name the ticker and interval
+they belong to. Interval streams (bars aggregated from live ticks, see
+api/aggregator.py) carry compact deltas: short keys and only the fields
+that changed,
+
+    {"t": 1750000000, "c": 101.25, "v": 1200}      still forming
+    {"t": 1750000000, "x": 1}                      bar closed
+
+When the publisher computes indicators (api/indicators.py), deltas also
+carry the values that changed under "i": {"t": ..., "c": 101.25, "i":
+{"sma_20": 100.9731}}.
+
+When a connection conflates several deltas of the same bar into one frame,
+or dropped an earlier one, the frame carries the whole bar in the same
+short form instead. Clients choose msgpack by offering the `msgpack` WebSocket
+subprotocol (`new WebSocket(url, ['msgpack'])`); otherwise frames are JSON
+text.
+"""
+import json
+import re
+
+import msgpack
+
+MSGPACK_SUBPROTOCOL = 'msgpack'
+JSON_SUBPROTOCOL = 'json'
+
+# Nombres de grupo válidos para channels: ASCII, dígitos, '-', '_' y '.'
+TICKER_RE = re.compile(r'^[A-Z0-9._-]{1,32}$')
+
+
+# Claves cortas de los deltas de barras; 'x' = barra cerrada
+DELTA_KEYS = {
+    'time': 't', 'open': 'o', 'high': 'h', 'low': 'l', 'close': 'c', 'volume': 'v',
+}
+CLOSED_KEY = 'x'
+INDICATORS_KEY = 'i'
+
+
+def group_name(ticker: str, interval: str = None) -> str:
+    """Channel-layer group of a ticker's raw stream or of one of its intervals."""
+    return f'ticker_{ticker}' if interval is None else f'ticker_{ticker}_{interval}'
+
+
+def encode_payload(payload) -> dict:
+    return {
+        'json': json.dumps(payload, separators=(',', ':')),
+        'msgpack': msgpack.packb(payload, use_bin_type=True),
+    }
+
+
+def payload_time(payload) -> int:
+    if not isinstance(payload, dict):
+        return None
+    return payload.get('time', payload.get(DELTA_KEYS['time']))
+
+
+def compact_bar(bar: dict, closed: bool = False) -> dict:
+    """Whole bar in the short delta form."""
+    compact = {short: bar[name] for name, short in DELTA_KEYS.items()}
+    if closed:
+        compact[CLOSED_KEY] = 1
+    if bar.get('indicators'):
+        compact[INDICATORS_KEY] = bar['indicators']
+    return compact
+
+
+def update_event(payload: dict, ticker: str = None, interval: str = None,
+                 event_type: str = 'ticker_update', full: dict = None) -> dict:
+    """
+    Channel-layer group event for `payload`, encoded once for every subscriber.
+    For deltas, `full` is the whole bar, sent instead when deltas are conflated.
+    """
+    event = {
+        'type': event_type,
+        'ticker': ticker,
+        'interval': interval,
+        'time': payload_time(payload),
+        **encode_payload(payload),
+    }
+    if full is not None:
+        encoded = encode_payload(full)
+        event['full_json'], event['full_msgpack'] = encoded['json'], encoded['msgpack']
+    return event
+
+
+def full_event(event: dict) -> dict:
+    """
+    The event with the whole bar as payload, for deltas that replace or
+    follow an update the connection never sent (a delta alone would miss
+    the fields only that update carried). Other events are returned as-is.
+    """
+    if 'full_json' not in event:
+        return event
+    return {**event, 'json': event['full_json'], 'msgpack': event['full_msgpack']}
+
+
+def ensure_encoded(event: dict) -> dict:
+    """Events from older publishers carry the raw dict in 'message'."""
+    if 'json' in event:
+        return event
+    payload = event['message']
+    return {
+        'type': event['type'],
+        'ticker': event.get('ticker'),
+        'interval': event.get('interval'),
+        'time': payload_time(payload),
+        **encode_payload(payload),
+    }
+
+
+def json_frame(frame_type: str, seq: int, payload_json: str, extra: dict = None) -> str:
+    head = f'"type":"{frame_type}","seq":{seq}'
+    if extra:
+        head += ',' + json.dumps(extra, separators=(',', ':'))[1:-1]
+    return f'{{{head},"payload":{payload_json}}}'
+
+
+def msgpack_frame(frame_type: str, seq: int, payload_msgpack: bytes,
+                  extra: dict = None) -> bytes:
+    pack = msgpack.packb
+    extra = extra or {}
+    parts = [
+        bytes([0x80 | (3 + len(extra))]),  # fixmap
+        pack('type'), pack(frame_type),
+        pack('seq'), pack(seq),
+    ]
+    for key, value in extra.items():
+        parts += [pack(key), pack(value)]
+    parts += [pack('payload'), payload_msgpack]
+    return b''.join(parts)
+
+
+def encode_control(message: dict, binary: bool):
+    """Control frames (subscribed, error...) in the connection's format."""
+    if binary:
+        return {'bytes_data': msgpack.packb(message, use_bin_type=True)}
+    return {'text_data': json.dumps(message)}
+
+
+def decode_control(text_data=None, bytes_data=None):
+    """Client control message (JSON text or msgpack) → dict, or None."""
+    try:
+        if bytes_data is not None:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            data = json.loads(text_data or '')
+    except (ValueError, msgpack.UnpackException):
+        return None
+    return data if isinstance(data, dict) else None
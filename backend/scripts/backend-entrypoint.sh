@@ -0,0 +1,9 @@
+#!/bin/sh
+# backend-entrypoint.sh
+
+set -e
+
+# Create / update the tables (earnings reports) before serving requests
+python manage.py migrate --noinput
+
+exec daphne -b 0.0.0.0 -p 8000 trade_charts.asgi:application
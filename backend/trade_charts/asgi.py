@@ -13,4 +13,4 @@ application = ProtocolTypeRouter({
             api.routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "api.middleware.ServerTimingMiddleware",
+    "api.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -147,4 +149,82 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 
-ASGI_APPLICATION = 'trade_charts.asgi.application'
\ No newline at end of file
+ASGI_APPLICATION = 'trade_charts.asgi.application'
+
+# Cache en memoria de series OHLCV (ver api/cache.py)
+MARKET_DATA_CACHE_MAX_BYTES = int(
+    os.environ.get("MARKET_DATA_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+
+# Almacén de barras en disco (api/barstore.py; `manage.py backfill` lo
+# carga): historia servida desde archivos mapeados en memoria y compartida
+# entre procesos. Opcional: activado, sustituye a la caché LRU en memoria
+# (MARKET_DATA_CACHE_MAX_BYTES) y el directorio debe ser persistente (un
+# volumen en Docker). Vacío (por defecto) = desactivado
+BAR_STORE_DIR = os.environ.get("BAR_STORE_DIR", "")
+
+# /api/market-data/batch: tickers por petición y por descarga agrupada
+# (los bloques se descargan en paralelo)
+MARKET_DATA_BATCH_MAX_TICKERS = int(os.environ.get("MARKET_DATA_BATCH_MAX_TICKERS", 100))
+MARKET_DATA_BATCH_CHUNK = int(os.environ.get("MARKET_DATA_BATCH_CHUNK", 20))
+
+# Formatos en streaming (?format=ndjson / msgpack-stream): barras por bloque
+MARKET_DATA_STREAM_CHUNK = int(os.environ.get("MARKET_DATA_STREAM_CHUNK", 5000))
+
+# Reportes de ganancias (ReportsView)
+REPORTS_WATCHLIST = [
+    symbol.strip().upper()
+    for symbol in os.environ.get(
+        "REPORTS_WATCHLIST", "NVDA,AAPL,META,AMZN,TSLA,NFLX,PLTR,BAC,CVX,XOM"
+    ).split(",")
+    if symbol.strip()
+]
+REPORTS_MAX_WORKERS = int(os.environ.get("REPORTS_MAX_WORKERS", 16))
+REPORTS_TICKER_TIMEOUT = float(os.environ.get("REPORTS_TICKER_TIMEOUT", 10))
+
+# Búsqueda de símbolos: índice local + Finnhub como respaldo (api/symbols.py)
+FINNHUB_API_TOKEN = os.environ.get(
+    "FINNHUB_API_TOKEN", "d292e3pr01qhoen9cd70d292e3pr01qhoen9cd7g"
+)
+SYMBOL_SNAPSHOT_PATH = Path(
+    os.environ.get("SYMBOL_SNAPSHOT_PATH", BASE_DIR / "data" / "symbols.json")
+)
+SYMBOL_INDEX_REFRESH = int(os.environ.get("SYMBOL_INDEX_REFRESH", 24 * 60 * 60))
+
+# Cliente compartido para Yahoo / Finnhub (api/upstream.py)
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 20))
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", 10))
+# Vistas async: hilos para el trabajo bloqueante y tiempo máximo por petición
+UPSTREAM_MAX_WORKERS = int(os.environ.get("UPSTREAM_MAX_WORKERS", 32))
+UPSTREAM_REQUEST_TIMEOUT = float(os.environ.get("UPSTREAM_REQUEST_TIMEOUT", 30))
+
+# Proveedor de datos de mercado: Yahoo o sintético/offline (api/providers.py)
+MARKET_DATA_PROVIDER = os.environ.get(
+    "MARKET_DATA_PROVIDER", "api.providers.YahooProvider"
+)
+
+# WebSocket: mensajes por segundo por conexión (el cliente elige con
+# ?max_rate=, dentro de [WS_MIN_RATE, WS_MAX_RATE]), barras pendientes como
+# máximo entre envíos (y al menos 2 por suscripción), bytes por segundo por
+# conexión (haya acks o no) y frames sin ack antes de bajar la tasa
+# (api/consumers.py)
+WS_DEFAULT_MAX_RATE = float(os.environ.get("WS_DEFAULT_MAX_RATE", 10))
+WS_MIN_RATE = float(os.environ.get("WS_MIN_RATE", 1))
+WS_MAX_RATE = float(os.environ.get("WS_MAX_RATE", 60))
+WS_MAX_PENDING_BARS = int(os.environ.get("WS_MAX_PENDING_BARS", 32))
+WS_MAX_BYTES_RATE = int(os.environ.get("WS_MAX_BYTES_RATE", 512 * 1024))
+WS_ACK_WINDOW = int(os.environ.get("WS_ACK_WINDOW", 64))
+# Endpoint multiplexado ws/stream/: intervalos disponibles y suscripciones
+# (ticker, intervalo) por conexión
+WS_INTERVALS = ["1m", "15m", "1h", "1d"]
+WS_MAX_SUBSCRIPTIONS = int(os.environ.get("WS_MAX_SUBSCRIPTIONS", 200))
+# Indicadores calculados en vivo con las barras de cada intervalo, p. ej.
+# "sma:20,ema:50,rsi:14,vwap" (api/indicators.py); vacío = ninguno
+WS_INDICATORS = os.environ.get("WS_INDICATORS", "")
+
+# Últimas barras de cada stream en vivo, enviadas como snapshot al conectar
+# (api/livebuffer.py): Redis (compartido entre procesos) o en memoria
+LIVE_BUFFER_BACKEND = os.environ.get(
+    "LIVE_BUFFER_BACKEND", "api.livebuffer.RedisBarBuffer"
+)
+LIVE_BUFFER_SIZE = int(os.environ.get("LIVE_BUFFER_SIZE", 500))